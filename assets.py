@@ -0,0 +1,228 @@
+"""
+Self-hosted, fingerprinted static assets for the page
+Third-party libraries (Leaflet, Chart.js, Font Awesome) and the logo are
+vendored into a local directory once, on a machine with network access:
+
+    python assets.py vendor --output vendor/
+
+The inline <style> and <script> blocks of the page are split out into an
+"app" package. Every package is served under a content-hashed prefix,
+/assets/<package>-<hash>/<path>, so its files can be cached as immutable and
+relative references (Leaflet's marker images, Font Awesome's webfonts) keep
+working unchanged. Packages that have not been vendored fall back to their
+CDN URLs.
+
+main.py builds the bundle in memory. For a sidecar (e.g. nginx gzip_static /
+brotli_static), write the same files with .gz and .br siblings:
+
+    python assets.py build --vendor vendor/ --output dist/
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import urllib.request
+
+try:
+    import brotli
+except ImportError:  # Only gzip siblings are written
+    brotli = None
+
+# URL prefix the bundle is served under (see main.py)
+ASSET_PREFIX = '/assets/'
+
+# Cache-Control for fingerprinted files: their URL changes with their content
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Local path of every vendored file within its package, and where it comes from.
+# The URLs are the ones the page references when a package is not vendored.
+VENDOR_FILES = {
+    'leaflet': {
+        path: f'https://unpkg.com/leaflet@1.9.4/dist/{path}'
+        for path in ('leaflet.css', 'leaflet.js', 'images/layers.png', 'images/layers-2x.png',
+                     'images/marker-icon.png', 'images/marker-icon-2x.png', 'images/marker-shadow.png')
+    },
+    'chartjs': {
+        'chart.umd.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.js'
+    },
+    'fontawesome': {
+        path: f'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/{path}'
+        for path in ['css/all.min.css'] + [
+            f'webfonts/fa-{face}.{ext}'
+            for face in ('brands-400', 'regular-400', 'solid-900', 'v4compatibility')
+            for ext in ('woff2', 'ttf')
+        ]
+    },
+    'logo': {
+        'logo.jpg': 'https://assets.spaceappschallenge.org/media/images/1000120948.2e16d0ba.fill-300x250.jpg'
+    }
+}
+
+# Text formats worth compressing; images and woff2 are compressed already
+COMPRESSIBLE_SUFFIXES = ('.css', '.js', '.html', '.json', '.svg', '.ttf')
+
+_INLINE_STYLE = re.compile(r'<style>(.*?)</style>', re.DOTALL)
+_INLINE_SCRIPT = re.compile(r'<script>(.*?)</script>', re.DOTALL)
+
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('font/ttf', '.ttf')
+
+
+def mimetype(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def compressible(path):
+    return path.endswith(COMPRESSIBLE_SUFFIXES)
+
+
+def fingerprint(files):
+    """Short content hash of a package's {path: bytes}"""
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        digest.update(path.encode() + b'\0' + hashlib.sha256(files[path]).digest())
+    return digest.hexdigest()[:12]
+
+
+class AssetBundle:
+    """The page with asset references rewritten, and every asset file
+
+    files maps URL paths below ASSET_PREFIX to their bytes.
+    """
+
+    def __init__(self, html, files, packages):
+        self.html = html
+        self.files = files
+        self.packages = packages
+
+
+def read_package(vendor_dir, package):
+    """{path: bytes} of a vendored package, or None unless every file is present"""
+    files = {}
+    for path in VENDOR_FILES[package]:
+        try:
+            with open(os.path.join(vendor_dir, package, path), 'rb') as f:
+                files[path] = f.read()
+        except FileNotFoundError:
+            return None
+    return files
+
+
+def split_inline(html):
+    """Move the page's inline <style> and <script> blocks into app.css / app.js
+
+    Returns the page with placeholders in their place and the package files.
+    Blocks stay in document order, so scripts run after the libraries they use.
+    """
+    styles, scripts = [], []
+
+    def take_style(match):
+        styles.append(match.group(1).strip())
+        return '<link rel="stylesheet" href="@app@/app.css" />' if len(styles) == 1 else ''
+
+    def take_script(match):
+        scripts.append(match.group(1).strip())
+        return '<script src="@app@/app.js"></script>' if len(scripts) == 1 else ''
+
+    html = _INLINE_SCRIPT.sub(take_script, _INLINE_STYLE.sub(take_style, html))
+    files = {}
+    if styles:
+        files['app.css'] = ('\n\n'.join(styles) + '\n').encode()
+    if scripts:
+        files['app.js'] = ('\n;\n'.join(scripts) + '\n').encode()
+    return html, files
+
+
+def build_bundle(html, vendor_dir=None, prefix=ASSET_PREFIX):
+    """AssetBundle of a rendered page and the packages found in vendor_dir"""
+    html, app_files = split_inline(html)
+    packages = {'app': app_files}
+    for package in VENDOR_FILES:
+        files = read_package(vendor_dir, package) if vendor_dir else None
+        if files is not None:
+            packages[package] = files
+
+    bundle_files, roots = {}, {}
+    for package, files in packages.items():
+        root = f'{package}-{fingerprint(files)}'
+        roots[package] = root
+        for path, data in files.items():
+            bundle_files[f'{root}/{path}'] = data
+        for path, url in VENDOR_FILES.get(package, {}).items():
+            html = html.replace(url, f'{prefix}{root}/{path}')
+    html = html.replace('@app@', prefix + roots['app'])
+    return AssetBundle(html, bundle_files, roots)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_bundle(bundle, output):
+    """Write the page, assets and their .gz / .br siblings for a static server"""
+    files = dict(bundle.files)
+    files['index.html'] = bundle.html.encode()
+    for name, data in files.items():
+        path = os.path.join(output, name)
+        _write(path, data)
+        if compressible(name):
+            _write(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write(path + '.br', brotli.compress(data, quality=11))
+    _write(os.path.join(output, 'manifest.json'),
+           json.dumps({package: ASSET_PREFIX + root for package, root in bundle.packages.items()},
+                      indent=2).encode())
+    return len(files)
+
+
+def vendor(output):
+    """Download every vendored file, skipping those already present"""
+    fetched = 0
+    for package, files in VENDOR_FILES.items():
+        for path, url in files.items():
+            target = os.path.join(output, package, path)
+            if os.path.exists(target):
+                continue
+            with urllib.request.urlopen(url, timeout=60) as response:
+                _write(target, response.read())
+            fetched += 1
+            print(f'{package}/{path} <- {url}')
+    return fetched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Vendor and bundle the static assets of the page')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    vendor_command = commands.add_parser('vendor', help='Download third-party assets')
+    vendor_command.add_argument('--output', default='vendor', help='Vendor directory (STATIC_VENDOR_DIR)')
+
+    build_command = commands.add_parser('build', help='Write the fingerprinted bundle for a static server')
+    build_command.add_argument('--vendor', default='vendor', help='Vendor directory')
+    build_command.add_argument('--output', required=True, help='Output directory')
+
+    args = parser.parse_args(argv)
+    if args.command == 'vendor':
+        print(f'Fetched {vendor(args.output)} files into {args.output}')
+    else:
+        from main import HTML_TEMPLATE, app
+        from flask import render_template_string
+        with app.app_context():
+            bundle = build_bundle(render_template_string(HTML_TEMPLATE), args.vendor)
+        missing = [package for package in VENDOR_FILES if package not in bundle.packages]
+        if missing:
+            print(f'Not vendored, served from CDNs: {", ".join(missing)}')
+        count = write_bundle(bundle, args.output)
+        print(f'Wrote {count} files into {args.output}')
+
+
+if __name__ == '__main__':
+    main()
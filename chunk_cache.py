@@ -0,0 +1,136 @@
+"""
+Content-addressed on-disk chunk cache for remote granules
+Chunks are keyed by a hash of (dataset, variable, chunk coordinates, version)
+and written atomically, so several Flask workers can share one directory.
+The least recently used chunks are evicted once the cache exceeds its byte
+budget.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Eviction is still safe without it, just not exclusive
+    fcntl = None
+
+# Evict down to this fraction of the budget so eviction does not run on every write
+LOW_WATERMARK = 0.9
+
+
+class ChunkCache:
+    """Directory of .npy chunks with LRU eviction under a byte budget"""
+
+    def __init__(self, root, max_bytes=2 * 2**30):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = self._scan_size()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'bytesSaved': 0,
+            'bytesWritten': 0,
+            'evictions': 0,
+            'bytesEvicted': 0
+        }
+
+    @staticmethod
+    def key(dataset, variable, chunk, version):
+        """Content address of a chunk"""
+        identity = json.dumps([dataset, variable, [str(c) for c in chunk], version])
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f'{key}.npy')
+
+    def _entries(self):
+        """(mtime, size, path) for every chunk on disk"""
+        entries = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.npy'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:  # Evicted by another worker
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def get(self, dataset, variable, chunk, version):
+        """Cached chunk as an array, or None"""
+        path = self._path(self.key(dataset, variable, chunk, version))
+        try:
+            values = np.load(path)
+            # mtime doubles as last access time for LRU, since atime is often disabled
+            os.utime(path)
+        except (FileNotFoundError, ValueError, EOFError):
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+        with self._lock:
+            self.stats['hits'] += 1
+            self.stats['bytesSaved'] += values.nbytes
+        return values
+
+    def put(self, dataset, variable, chunk, version, values):
+        path = self._path(self.key(dataset, variable, chunk, version))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, values)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += size
+            self.stats['bytesWritten'] += size
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used chunks until under the low watermark"""
+        lock_file = open(os.path.join(self.root, '.evict.lock'), 'a')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Other workers write here too, so start from the real size on disk
+            entries = sorted(self._entries())
+            size = sum(entry[1] for entry in entries)
+            target = self.max_bytes * LOW_WATERMARK
+            evicted = evicted_bytes = 0
+            for _, entry_size, path in entries:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                size -= entry_size
+                evicted += 1
+                evicted_bytes += entry_size
+        finally:
+            lock_file.close()
+
+        with self._lock:
+            self._size = size
+            self.stats['evictions'] += evicted
+            self.stats['bytesEvicted'] += evicted_bytes
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats, size=self._size, maxBytes=self.max_bytes)
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRatio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
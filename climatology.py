@@ -0,0 +1,336 @@
+"""
+Climatology engine for Will It Rain On My Parade?
+Loads a gridded daily historical dataset and computes exceedance probabilities
+for the condition thresholds shown on the condition cards.
+"""
+
+import os
+import operator
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from spatial import make_grid
+
+try:
+    import xarray as xr
+except ImportError:  # NetCDF/Zarr loading is optional; .npz always works
+    xr = None
+
+# Every year is laid out on a 366-day (leap year) calendar so that a given
+# calendar date always maps to the same day-of-year index. Feb 29 is NaN in
+# non-leap years.
+DAYS_PER_YEAR = 366
+FEB_29 = 59
+
+# Number of days covered by each time range option in the UI
+TIME_RANGE_DAYS = {
+    'day': 1,
+    'week': 7,
+    'month': 30,
+    'season': 91
+}
+
+# Thresholds behind the condition cards: (variable, comparison, threshold)
+CONDITIONS = {
+    'hot': ('tmax', operator.gt, 90.0),          # °F
+    'cold': ('tmin', operator.lt, 32.0),         # °F
+    'windy': ('wind', operator.gt, 25.0),        # mph
+    'wet': ('precip', operator.gt, 1.0),         # inches/day
+    'uncomfortable': ('heat_index', operator.gt, 90.0)  # °F
+}
+
+VARIABLES = ('tmax', 'tmin', 'wind', 'precip', 'rh', 'heat_index')
+
+# Source variable names accepted for each internal variable (MERRA-2 / IMERG style)
+VARIABLE_ALIASES = {
+    'tmax': ('tmax', 'T2MMAX', 't2m_max'),
+    'tmin': ('tmin', 'T2MMIN', 't2m_min'),
+    'wind': ('wind', 'SPEEDMAX', 'wind_max'),
+    'precip': ('precip', 'PRECTOTCORR', 'precipitation', 'precipitationCal'),
+    'rh': ('rh', 'RH2M', 'relative_humidity')
+}
+
+
+def date_to_doy(date):
+    """Map a date to its index on the 366-day calendar"""
+    doy = date.timetuple().tm_yday - 1
+    is_leap = date.year % 4 == 0 and (date.year % 100 != 0 or date.year % 400 == 0)
+    if not is_leap and date.month > 2:
+        doy += 1
+    return doy
+
+
+def doy_to_date(doy, year):
+    """Date of a 366-day calendar index in a year, or None for Feb 29 of a non-leap year"""
+    day = datetime(2000, 1, 1) + timedelta(days=int(doy))  # 2000 is a leap year
+    try:
+        return day.replace(year=year)
+    except ValueError:
+        return None
+
+
+def window_length(time_range):
+    """Days in a named time range, or a custom length given as a number of days"""
+    if isinstance(time_range, int) or (isinstance(time_range, str) and time_range.isdigit()):
+        return min(max(int(time_range), 1), DAYS_PER_YEAR)
+    return TIME_RANGE_DAYS.get(time_range, 1)
+
+
+def window_bounds(date, time_range):
+    """First day-of-year index and length of a time range starting at date"""
+    if isinstance(date, str):
+        date = datetime.strptime(date, '%Y-%m-%d')
+    elif not hasattr(date, 'timetuple'):
+        raise TypeError(f'Expected a YYYY-MM-DD string or a date, got {date!r}')
+    return date_to_doy(date), window_length(time_range)
+
+
+def window_days(date, time_range):
+    """Day-of-year indices covered by a time range starting at date"""
+    start, length = window_bounds(date, time_range)
+    return (start + np.arange(length)) % DAYS_PER_YEAR
+
+
+def heat_index(temperature, humidity):
+    """NWS heat index in °F from °F and % relative humidity
+
+    Steadman's simple formula, switching to the Rothfusz regression (with
+    the low- and high-humidity adjustments) where the result reaches 80°F,
+    as in the NWS algorithm. Works elementwise on whole arrays.
+    """
+    t = np.asarray(temperature, dtype=np.float32)
+    rh = np.asarray(humidity, dtype=np.float32)
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+
+    rothfusz = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+                - 6.83783e-3 * t * t - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+                + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+    dry = (rh < 13) & (t >= 80) & (t <= 112)
+    rothfusz -= np.where(dry, (13 - rh) / 4 * np.sqrt(np.maximum(17 - np.abs(t - 95), 0) / 17), 0)
+    humid = (rh > 85) & (t >= 80) & (t <= 87)
+    rothfusz += np.where(humid, (rh - 85) / 10 * (87 - t) / 5, 0)
+
+    return np.where((simple + t) / 2 >= 80, rothfusz, simple)
+
+
+def dew_point(temperature, humidity):
+    """Dew point in °F from °F and % relative humidity (Magnus formula)"""
+    celsius = (np.asarray(temperature, dtype=np.float32) - 32) * 5 / 9
+    gamma = np.log(np.clip(humidity, 1, 100) / 100) + 17.625 * celsius / (243.04 + celsius)
+    return 243.04 * gamma / (17.625 - gamma) * 9 / 5 + 32
+
+
+def humidex(temperature, humidity):
+    """Environment Canada humidex from the dew point, on the °F scale
+
+    Expressed in °F (like the heat index) so the 'uncomfortable' threshold
+    keeps its units whichever index is selected.
+    """
+    dew_kelvin = (dew_point(temperature, humidity) - 32) * 5 / 9 + 273.15
+    vapour_pressure = 6.11 * np.exp(5417.7530 * (1 / 273.16 - 1 / dew_kelvin))
+    return temperature + 0.5555 * (vapour_pressure - 10) * 9 / 5
+
+
+# Indices available for the derived 'heat_index' variable behind 'uncomfortable'
+DISCOMFORT_INDICES = {
+    'heat_index': heat_index,
+    'humidex': humidex
+}
+
+DISCOMFORT_INDEX = os.environ.get('DISCOMFORT_INDEX', 'heat_index')
+
+
+def discomfort_index(temperature, humidity, method=None):
+    """Apparent temperature in °F by the configured (or given) index"""
+    method = method or DISCOMFORT_INDEX
+    if method not in DISCOMFORT_INDICES:
+        raise ValueError(f'Unknown discomfort index {method}; use one of {", ".join(DISCOMFORT_INDICES)}')
+    return DISCOMFORT_INDICES[method](temperature, humidity).astype(np.float32)
+
+
+def convert_units(values, units, name):
+    """Convert source units to °F, mph, inches/day and %"""
+    units = (units or '').strip()
+    if name in ('tmax', 'tmin'):
+        if units == 'K':
+            return (values - 273.15) * 9 / 5 + 32
+        if units in ('degC', 'C', 'celsius'):
+            return values * 9 / 5 + 32
+    elif name == 'wind':
+        if units in ('m s-1', 'm/s'):
+            return values * 2.23694
+    elif name == 'precip':
+        if units in ('kg m-2 s-1',):
+            return values * 86400 / 25.4
+        if units in ('mm', 'mm/day', 'mm day-1', 'kg m-2'):
+            return values / 25.4
+    elif name == 'rh':
+        if units in ('1', 'fraction'):
+            return values * 100
+    return values
+
+
+class Climatology:
+    """Daily historical record on a rectilinear lat/lon grid
+
+    Each variable is a float32 array shaped (years, 366, lat, lon). The
+    'heat_index' variable is derived from tmax and rh by the discomfort
+    index (heat index or humidex) unless the source already carries it.
+    """
+
+    def __init__(self, lat, lon, years, variables, source='synthetic', discomfort=None):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.years = np.asarray(years, dtype=np.int32)
+        self.variables = variables
+        self.source = source
+        self.discomfort = discomfort or DISCOMFORT_INDEX
+        self.grid = make_grid(self.lat, self.lon)
+        if 'heat_index' not in self.variables:
+            tmax, rh = self.variables['tmax'], self.variables['rh']
+            derived = np.empty(tmax.shape, dtype=np.float32)
+            # One year at a time bounds the temporaries of the regression
+            for y in range(tmax.shape[0]):
+                derived[y] = discomfort_index(tmax[y], rh[y], self.discomfort)
+            self.variables['heat_index'] = derived
+
+    @property
+    def shape(self):
+        return (len(self.years), DAYS_PER_YEAR, len(self.lat), len(self.lon))
+
+    def cell_index(self, lat, lon):
+        """Nearest (row, column) of the grid for a point"""
+        i, j = self.grid.nearest_rows_columns(lat, lon)
+        return int(i), int(j)
+
+    def cell_series(self, name, i, j, days=None):
+        """All years of a variable at one cell, shaped (years, days)"""
+        values = self.variables[name]
+        if days is None:
+            return values[:, :, i, j]
+        return values[:, days, i, j]
+
+    def exceedance_probabilities(self, lat, lon, date, time_range, conditions):
+        """Percentage of historical days in the window meeting each condition"""
+        i, j = self.cell_index(lat, lon)
+        days = window_days(date, time_range)
+        result = {}
+        for condition in conditions:
+            if condition not in CONDITIONS:
+                continue
+            name, compare, threshold = CONDITIONS[condition]
+            samples = self.cell_series(name, i, j, days)
+            valid = ~np.isnan(samples)
+            total = int(valid.sum())
+            hits = int((compare(samples, threshold) & valid).sum())
+            result[condition] = {
+                'probability': 100.0 * hits / total if total else 0.0,
+                'count': hits,
+                'samples': total
+            }
+        return result
+
+    def save(self, path):
+        """Save as a compressed .npz that load_dataset can read back"""
+        np.savez_compressed(
+            path, lat=self.lat, lon=self.lon, years=self.years,
+            **{name: self.variables[name] for name in VARIABLES if name != 'heat_index'}
+        )
+
+
+def synthetic_dataset(first_year=2005, n_years=20, resolution=10.0, seed=2025):
+    """Small deterministic stand-in for a MERRA-2/IMERG daily record"""
+    rng = np.random.default_rng(seed)
+    lat = np.arange(-90 + resolution / 2, 90, resolution)
+    lon = np.arange(-180 + resolution / 2, 180, resolution)
+    years = np.arange(first_year, first_year + n_years)
+    shape = (n_years, DAYS_PER_YEAR, len(lat), len(lon))
+
+    doy = np.arange(DAYS_PER_YEAR, dtype=np.float32)[None, :, None, None]
+    lat4 = lat.astype(np.float32)[None, None, :, None]
+    lon4 = lon.astype(np.float32)[None, None, None, :]
+
+    # Seasonal cycle peaks in July in the north and January in the south
+    season = np.cos(2 * np.pi * (doy - 200) / DAYS_PER_YEAR) * np.sign(lat4)
+    mean_temp = 85 - 0.75 * np.abs(lat4) + 4 * np.sin(np.radians(lon4))
+    amplitude = 2 + 0.5 * np.abs(lat4)
+    tmax = mean_temp + amplitude * season + 9 + 6 * rng.standard_normal(shape, dtype=np.float32)
+    tmin = tmax - 15 - 4 * np.abs(rng.standard_normal(shape, dtype=np.float32))
+
+    rh = 60 + 20 * np.sin(np.radians(lon4)) * np.cos(np.radians(lat4)) + 10 * season
+    rh = np.clip(rh + 12 * rng.standard_normal(shape, dtype=np.float32), 5, 100)
+
+    wind = (10 + 0.15 * np.abs(lat4)) * rng.weibull(2.0, shape).astype(np.float32)
+
+    wet_day = rng.random(shape, dtype=np.float32) < 0.3
+    precip = np.where(wet_day, rng.gamma(0.8, 0.4, shape).astype(np.float32), 0)
+
+    leap = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+    variables = {}
+    for name, values in (('tmax', tmax), ('tmin', tmin), ('wind', wind),
+                         ('precip', precip), ('rh', rh)):
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        values[~leap, FEB_29] = np.nan
+        variables[name] = values
+
+    return Climatology(lat, lon, years, variables, source='synthetic')
+
+
+def _calendar_cube(values, times):
+    """Rearrange a (time, lat, lon) daily array onto the (years, 366) calendar"""
+    times = np.asarray(times, dtype='datetime64[D]')
+    years_of = times.astype('datetime64[Y]').astype(int) + 1970
+    years = np.unique(years_of)
+    doy = np.array([date_to_doy(t.astype(datetime)) for t in times])
+    cube = np.full((len(years), DAYS_PER_YEAR) + values.shape[1:], np.nan, dtype=np.float32)
+    cube[np.searchsorted(years, years_of), doy] = values
+    return years, cube
+
+
+def find_variable(ds, name):
+    """Name of the source variable in an xarray dataset for an internal variable"""
+    aliases = VARIABLE_ALIASES[name]
+    source = next((a for a in aliases if a in ds.variables), None)
+    if source is None:
+        raise KeyError(f'Dataset has no variable for {name} (tried {aliases})')
+    return source
+
+
+def _load_xarray(path):
+    """Load a NetCDF or Zarr daily dataset through xarray"""
+    if xr is None:
+        raise RuntimeError('xarray is required to read NetCDF/Zarr datasets')
+    if path.rstrip('/').endswith('.zarr'):
+        ds = xr.open_zarr(path)
+    else:
+        ds = xr.open_dataset(path)
+
+    lat_name = 'lat' if 'lat' in ds.coords else 'latitude'
+    lon_name = 'lon' if 'lon' in ds.coords else 'longitude'
+    if ds[lat_name].ndim != 1 or ds[lon_name].ndim != 1:
+        # Cubes are (years, 366, lat, lon): swath / curvilinear data must be
+        # regridded onto 1-D axes first
+        raise ValueError(f'{path} has 2-D coordinates; regrid it onto latitude/longitude axes')
+    ds = ds.sortby(lat_name)
+
+    variables = {}
+    years = None
+    for name in VARIABLE_ALIASES:
+        array = ds[find_variable(ds, name)].transpose('time', lat_name, lon_name)
+        values = convert_units(array.values.astype(np.float32), array.attrs.get('units'), name)
+        years, variables[name] = _calendar_cube(values, ds['time'].values)
+
+    return Climatology(ds[lat_name].values, ds[lon_name].values, years, variables, source=path)
+
+
+def load_dataset(path=None):
+    """Load the configured dataset, falling back to the synthetic fixture"""
+    path = path or os.environ.get('CLIMATOLOGY_PATH')
+    if not path:
+        return synthetic_dataset()
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            variables = {name: data[name] for name in VARIABLE_ALIASES}
+            return Climatology(data['lat'], data['lon'], data['years'], variables, source=path)
+    return _load_xarray(path)
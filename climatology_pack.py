@@ -0,0 +1,242 @@
+"""
+Memory-mapped climatology pack
+A single versioned binary file holding the grid, the quantized daily record,
+the exceedance index, the day-of-year window sums, the sorted-sample (ECDF)
+index and the co-occurrence bitsets. Arrays are page aligned and read
+through mmap with zero copies, so forked Flask workers share the page cache
+and a cold process only has to parse a small JSON header before answering.
+
+Layout:
+    magic (8 bytes) | version (uint32) | header length (uint32) | JSON header
+    ... padding to 4096 ... | array 0 | padding | array 1 | ...
+
+Build with:
+    python climatology_pack.py build --output climatology.pack
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+
+from climatology import Climatology, VARIABLES, load_dataset
+from cooccurrence import CooccurrenceIndex, build_cooccurrence
+from ecdf_index import EcdfIndex, build_ecdf_index
+from exceedance_index import ExceedanceIndex, build_index, load_index
+from window_sums import WindowSums, build_window_sums
+
+PACK_MAGIC = b'CLIMPACK'
+PACK_VERSION = 3
+ALIGNMENT = 4096
+
+# Quantized variables use int16 with this value reserved for missing data
+FILL_VALUE = np.iinfo(np.int16).min
+QUANT_LEVELS = 2 * np.iinfo(np.int16).max
+
+_PREAMBLE = struct.Struct('<8sII')
+
+
+class QuantizedArray:
+    """Read-only int16 array that dequantizes to float32 on indexing"""
+
+    def __init__(self, raw, scale, add_offset):
+        self.raw = raw
+        self.scale = np.float32(scale)
+        self.add_offset = np.float32(add_offset)
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    def __getitem__(self, key):
+        raw = np.asarray(self.raw[key])
+        values = raw.astype(np.float32) * self.scale + self.add_offset
+        values[raw == FILL_VALUE] = np.nan
+        return values
+
+
+def _quantization(values):
+    """Scale and offset mapping the finite range of values onto int16"""
+    low, high = float(np.nanmin(values)), float(np.nanmax(values))
+    scale = (high - low) / QUANT_LEVELS or 1.0
+    return scale, (high + low) / 2
+
+
+def _quantize(values, scale, add_offset):
+    stored = np.rint((values - add_offset) / scale)
+    stored[np.isnan(values)] = FILL_VALUE
+    return stored.astype(np.int16)
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_pack(path, climate, index=None, sums=None, ecdf=None, bits=None):
+    """Write a climatology and all of its precomputed indexes as a pack file"""
+    index = index or build_index(climate)
+    sums = sums or build_window_sums(climate)
+    ecdf = ecdf or build_ecdf_index(climate)
+    bits = bits or build_cooccurrence(climate)
+    arrays = [
+        ('lat', climate.lat, None),
+        ('lon', climate.lon, None),
+        ('years', climate.years, None)
+    ]
+    for name in VARIABLES:
+        arrays.append((name, climate.variables[name], _quantization(climate.variables[name])))
+    arrays.append(('index.counts', index.counts, None))
+    arrays.append(('index.samples', index.samples, None))
+    arrays.append(('sums.sum', sums.sums, None))
+    arrays.append(('sums.sumsq', sums.sums_sq, None))
+    arrays.append(('sums.count', sums.counts, None))
+    # Quantization is monotonic, so sorted samples stay sorted
+    for name in ecdf.variables:
+        samples = ecdf.sorted_samples[name]
+        arrays.append((f'ecdf.{name}', samples, _quantization(samples)))
+    arrays.append(('bits.conditions', bits.bits, None))
+    arrays.append(('bits.valid', bits.valid, None))
+
+    # Lay out every array on a page boundary after the header
+    entries = {}
+    offset = 0
+    for name, values, quantization in arrays:
+        dtype = np.dtype(np.int16) if quantization else values.dtype
+        entries[name] = {
+            'offset': offset,
+            'dtype': dtype.newbyteorder('<').str,
+            'shape': list(values.shape)
+        }
+        if quantization:
+            entries[name]['scale'], entries[name]['add_offset'] = quantization
+        offset = _align(offset + dtype.itemsize * int(np.prod(values.shape)))
+
+    header = json.dumps({
+        'created': datetime.now().isoformat(),
+        'source': climate.source,
+        'discomfort': climate.discomfort,
+        'conditions': list(index.conditions),
+        'sumVariables': list(sums.variables),
+        'ecdfVariables': list(ecdf.variables),
+        'bitConditions': list(bits.conditions),
+        'arrays': entries
+    }).encode()
+    data_start = _align(_PREAMBLE.size + len(header))
+
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(PACK_MAGIC, PACK_VERSION, len(header)))
+        f.write(header)
+        for name, values, quantization in arrays:
+            f.seek(data_start + entries[name]['offset'])
+            if quantization:
+                # One slice at a time to keep memory flat on large records
+                for y in range(values.shape[0]):
+                    f.write(_quantize(values[y], *quantization).tobytes())
+            else:
+                f.write(np.ascontiguousarray(values, dtype=entries[name]['dtype']).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+class ClimatologyPack:
+    """Zero-copy view over a pack file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_length = _PREAMBLE.unpack_from(self._mmap)
+        if magic != PACK_MAGIC:
+            raise ValueError(f'{path} is not a climatology pack')
+        if version != PACK_VERSION:
+            raise ValueError(f'Unsupported climatology pack version {version} in {path}')
+        self.header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_length])
+        self._data_start = _align(_PREAMBLE.size + header_length)
+
+    def array(self, name):
+        """Raw view of a stored array, backed directly by the mapping"""
+        entry = self.header['arrays'][name]
+        return np.ndarray(
+            tuple(entry['shape']), dtype=np.dtype(entry['dtype']),
+            buffer=self._mmap, offset=self._data_start + entry['offset']
+        )
+
+    def variable(self, name):
+        entry = self.header['arrays'][name]
+        return QuantizedArray(self.array(name), entry['scale'], entry['add_offset'])
+
+    def climatology(self):
+        variables = {name: self.variable(name) for name in VARIABLES}
+        return Climatology(
+            self.array('lat'), self.array('lon'), self.array('years'),
+            variables, source=self.header['source'], discomfort=self.header.get('discomfort')
+        )
+
+    def exceedance_index(self):
+        return ExceedanceIndex(
+            self.header['conditions'], self.array('lat'), self.array('lon'),
+            self.array('years'), self.array('index.counts'), self.array('index.samples')
+        )
+
+    def window_sums(self):
+        """Window sums, or None for packs written before they were added"""
+        if 'sums.sum' not in self.header['arrays']:
+            return None
+        return WindowSums(
+            self.header['sumVariables'], self.array('lat'), self.array('lon'), self.array('years'),
+            self.array('sums.sum'), self.array('sums.sumsq'), self.array('sums.count')
+        )
+
+    def ecdf_index(self):
+        """ECDF index, or None for packs written before it was added"""
+        if 'ecdfVariables' not in self.header:
+            return None
+        return EcdfIndex(
+            self.header['ecdfVariables'], self.array('lat'), self.array('lon'), self.array('years'),
+            {name: self.variable(f'ecdf.{name}') for name in self.header['ecdfVariables']}
+        )
+
+    def cooccurrence(self):
+        """Co-occurrence bitsets, or None for packs written before they were added"""
+        if 'bitConditions' not in self.header:
+            return None
+        return CooccurrenceIndex(
+            self.header['bitConditions'], self.array('lat'), self.array('lon'), self.array('years'),
+            self.array('bits.conditions'), self.array('bits.valid')
+        )
+
+
+def open_pack(path):
+    return ClimatologyPack(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or inspect a climatology pack')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Pack a dataset and its exceedance index')
+    build.add_argument('--dataset', help='NetCDF/Zarr/.npz dataset (default: CLIMATOLOGY_PATH)')
+    build.add_argument('--index', help='Prebuilt exceedance index (built if omitted)')
+    build.add_argument('--output', required=True, help='Pack file to write')
+
+    info = commands.add_parser('info', help='Print a pack header')
+    info.add_argument('pack')
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        climate = load_dataset(args.dataset)
+        index = load_index(args.index) if args.index else None
+        write_pack(args.output, climate, index)
+        print(f'Wrote {args.output} ({os.path.getsize(args.output) / 2**20:.1f} MiB)')
+    else:
+        print(json.dumps(open_pack(args.pack).header, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Columnar binary exports: Arrow IPC, Parquet and NetCDF
+A ColumnTable describes the columns of an export and yields its rows as
+row groups of NumPy arrays, so millions of rows are written a group at a
+time with bounded memory. Arrow and Parquet are streamed straight to the
+client as each group is encoded; NetCDF (HDF5) needs a seekable file, so it
+is appended to a temporary file group by group and then streamed from disk.
+String columns (locations, dates, period labels) are dictionary encoded:
+rows hold int32 indices into a label list.
+
+pyarrow is needed for Arrow and Parquet, netCDF4 for NetCDF.
+"""
+
+import io
+import os
+import tempfile
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Arrow and Parquet exports are optional
+    pa = pq = None
+
+try:
+    import netCDF4
+except ImportError:  # NetCDF export is optional
+    netCDF4 = None
+
+# Export format by file extension: (MIME type, required module)
+EXPORT_FORMATS = {
+    'arrow': ('application/vnd.apache.arrow.stream', 'pyarrow'),
+    'parquet': ('application/vnd.apache.parquet', 'pyarrow'),
+    'nc': ('application/x-netcdf', 'netCDF4')
+}
+
+PARQUET_COMPRESSION = 'zstd'
+
+# Bytes per read when streaming a finished NetCDF file
+FILE_CHUNK_BYTES = 1 << 20
+
+
+class ColumnTable:
+    """Schema and row groups of a columnar export
+
+    columns is a list of (name, dtype); labels maps the dictionary-encoded
+    columns to their label lists; groups() returns an iterable of
+    {name: 1-D array} row groups; attributes are file-level metadata.
+    """
+
+    def __init__(self, columns, groups, labels=None, attributes=None):
+        self.columns = [(name, np.dtype(dtype)) for name, dtype in columns]
+        self.groups = groups
+        self.labels = {name: [str(label) for label in values] for name, values in (labels or {}).items()}
+        self.attributes = {key: str(value) for key, value in (attributes or {}).items()}
+
+
+def available_formats():
+    """Extensions whose writer's dependency is installed"""
+    installed = {'pyarrow': pa is not None, 'netCDF4': netCDF4 is not None}
+    return [fmt for fmt, (_, module) in EXPORT_FORMATS.items() if installed[module]]
+
+
+def require(fmt):
+    """Raise RuntimeError unless fmt can be written here"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format: {fmt}')
+    if fmt not in available_formats():
+        raise RuntimeError(f'{EXPORT_FORMATS[fmt][1]} is required for .{fmt} exports')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain
+
+    tell() keeps counting across drains, so writers that record offsets
+    (the Parquet footer) see one continuous file.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def arrow_schema(table):
+    fields = []
+    for name, dtype in table.columns:
+        if name in table.labels:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.from_numpy_dtype(dtype)))
+    metadata = {key.encode(): value.encode() for key, value in table.attributes.items()}
+    return pa.schema(fields, metadata=metadata or None)
+
+
+def _record_batches(table, schema):
+    """Row groups as record batches; numeric columns are wrapped without copying"""
+    dictionaries = {name: pa.array(labels, type=pa.string()) for name, labels in table.labels.items()}
+    for group in table.groups():
+        arrays = []
+        for name, dtype in table.columns:
+            values = np.ascontiguousarray(group[name], dtype=np.int32 if name in dictionaries else dtype)
+            if name in dictionaries:
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(values), dictionaries[name]))
+            else:
+                arrays.append(pa.array(values))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def stream_arrow(table):
+    """Arrow IPC stream bytes, one record batch per row group"""
+    require('arrow')
+    sink = _ChunkSink()
+    schema = arrow_schema(table)
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema) as writer:
+        for batch in _record_batches(table, schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_parquet(table):
+    """Parquet file bytes, one row group per row group of the table"""
+    require('parquet')
+    sink = _ChunkSink()
+    schema = arrow_schema(table)
+    with pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression=PARQUET_COMPRESSION) as writer:
+        for batch in _record_batches(table, schema):
+            writer.write_table(pa.Table.from_batches([batch]), row_group_size=batch.num_rows)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def write_netcdf(table, path):
+    """Append every row group along an unlimited 'row' dimension"""
+    require('nc')
+    with netCDF4.Dataset(path, 'w', format='NETCDF4') as ds:
+        ds.setncatts(table.attributes)
+        ds.createDimension('row', None)
+        variables = {}
+        for name, dtype in table.columns:
+            if name in table.labels:
+                # Label lists get their own dimension; rows hold indices into them
+                dimension = f'{name}_label'
+                ds.createDimension(dimension, len(table.labels[name]))
+                ds.createVariable(dimension, str, (dimension,))[:] = np.array(table.labels[name], dtype=object)
+                variables[name] = ds.createVariable(name, 'i4', ('row',), zlib=True)
+                variables[name].long_name = f'index into {name}_label'
+            else:
+                variables[name] = ds.createVariable(name, dtype, ('row',), zlib=True)
+        rows = 0
+        for group in table.groups():
+            count = len(group[table.columns[0][0]])
+            for name, variable in variables.items():
+                variable[rows:rows + count] = group[name]
+            rows += count
+
+
+def stream_netcdf(table):
+    """NetCDF file bytes, written to a temporary file and streamed from disk"""
+    require('nc')
+    handle, path = tempfile.mkstemp(suffix='.nc')
+    os.close(handle)
+    try:
+        write_netcdf(table, path)
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(FILE_CHUNK_BYTES)
+                if not data:
+                    break
+                yield data
+    finally:
+        os.remove(path)
+
+
+WRITERS = {'arrow': stream_arrow, 'parquet': stream_parquet, 'nc': stream_netcdf}
+
+
+def stream_table(table, fmt):
+    """Byte chunks of a table in the given export format"""
+    require(fmt)
+    return WRITERS[fmt](table)
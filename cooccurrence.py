@@ -0,0 +1,104 @@
+"""
+Co-occurrence bitsets for combined conditions
+For every condition, cell and day-of-year one bit per historical year marks
+whether that day met the condition. "Hot AND humid", "windy OR wet" and
+conditional probabilities over a window are then bitwise ops and a popcount
+on a few bytes per day, with no pass over the raw record.
+"""
+
+import numpy as np
+
+from climatology import CONDITIONS, DAYS_PER_YEAR, window_bounds
+from spatial import make_grid
+
+
+# Set bits per byte value, for NumPy releases without np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def _popcount(bits):
+    """Set bits in a uint8 array"""
+    counts = np.bitwise_count(bits) if hasattr(np, 'bitwise_count') else _BYTE_POPCOUNT[bits]
+    return int(counts.sum(dtype=np.int64))
+
+
+class CooccurrenceIndex:
+    """bits[c, cell, d] packs, one bit per year (np.packbits order), whether
+    condition c was met on day-of-year d; valid[c, cell, d] marks years where
+    the variable behind condition c has a sample on that day.
+    """
+
+    def __init__(self, conditions, lat, lon, years, bits, valid, grid=None):
+        self.conditions = tuple(conditions)
+        self.years = np.asarray(years, dtype=np.int32)
+        self.grid = grid or make_grid(lat, lon)
+        self.bits = bits
+        self.valid = valid
+        self._position = {condition: k for k, condition in enumerate(self.conditions)}
+
+    def window_bits(self, cell, start, length, conditions):
+        """(conditions, days, bytes) hit and valid bitsets"""
+        days = (start + np.arange(length)) % DAYS_PER_YEAR
+        rows = np.array([self._position[condition] for condition in conditions], dtype=np.intp)
+        return self.bits[rows[:, None], cell, days], self.valid[rows[:, None], cell, days]
+
+    def combine(self, lat, lon, date, time_range, conditions):
+        """Joint, union and pairwise conditional probabilities over a window
+
+        "all" and "any" are percentages of the (year, day) samples where
+        every condition's variable is present; the conditional entry for
+        (a, b) is P(a | b) over days where b was met and a is present. None
+        unless at least two of the conditions are indexed.
+        """
+        conditions = [c for c in conditions if c in self._position]
+        if len(conditions) < 2:
+            return None
+        cell = int(self.grid.nearest(lat, lon))
+        start, length = window_bounds(date, time_range)
+        hits, valid = self.window_bits(cell, start, length, conditions)
+        joint_valid = np.bitwise_and.reduce(valid, axis=0)
+        samples = _popcount(joint_valid)
+
+        def share(count, total):
+            return {
+                'probability': 100.0 * count / total if total else 0.0,
+                'count': count,
+                'samples': total
+            }
+
+        conditional = []
+        for a, first in enumerate(conditions):
+            for b, given in enumerate(conditions):
+                if a != b:
+                    joint = _popcount(hits[a] & hits[b])
+                    conditional.append(dict(share(joint, _popcount(hits[b] & valid[a])),
+                                            condition=first, given=given))
+        return {
+            'conditions': conditions,
+            'all': share(_popcount(np.bitwise_and.reduce(hits, axis=0)), samples),
+            'any': share(_popcount(np.bitwise_or.reduce(hits, axis=0) & joint_valid), samples),
+            'conditional': conditional
+        }
+
+
+def _pack_years(mask):
+    """(years, 366, lat, lon) booleans -> (cells, 366, bytes) year bitsets"""
+    mask = mask.reshape(mask.shape[:2] + (-1,)).transpose(2, 1, 0)
+    return np.packbits(mask, axis=-1)
+
+
+def build_cooccurrence(climate, conditions=None):
+    """Pack the per-day outcome of every condition into year bitsets"""
+    conditions = tuple(conditions or CONDITIONS)
+    cells = len(climate.lat) * len(climate.lon)
+    shape = (len(conditions), cells, DAYS_PER_YEAR, (len(climate.years) + 7) // 8)
+    bits = np.empty(shape, dtype=np.uint8)
+    valid = np.empty(shape, dtype=np.uint8)
+    for k, condition in enumerate(conditions):
+        name, compare, threshold = CONDITIONS[condition]
+        values = climate.variables[name][:]
+        # NaN compares False, so missing days never count as hits
+        bits[k] = _pack_years(compare(values, threshold))
+        valid[k] = _pack_years(~np.isnan(values))
+    return CooccurrenceIndex(conditions, climate.lat, climate.lon, climate.years, bits, valid,
+                             grid=climate.grid)
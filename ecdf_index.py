@@ -0,0 +1,125 @@
+"""
+Sorted-sample (empirical CDF) index for custom thresholds
+Every (cell, day-of-year) keeps its samples over all years in ascending
+order, so the share of a window above or below any threshold is one binary
+search per day instead of a rescan of the record. The exceedance index
+(exceedance_index.py) stays the fast path for the default thresholds.
+"""
+
+import operator
+
+import numpy as np
+
+from climatology import CONDITIONS, DAYS_PER_YEAR, window_bounds
+from spatial import make_grid
+
+# Variables that some condition compares against a threshold
+ECDF_VARIABLES = tuple(dict.fromkeys(name for name, _, _ in CONDITIONS.values()))
+
+# searchsorted side for each operator, and whether hits are the samples above
+_SEARCH = {
+    operator.gt: ('right', True),
+    operator.ge: ('left', True),
+    operator.lt: ('left', False),
+    operator.le: ('right', False)
+}
+
+
+class EcdfIndex:
+    """sorted_samples[v][cell, d] holds variable v on day-of-year d over all
+    years in ascending order, with missing samples (NaN) last.
+
+    Arrays may be NumPy arrays or pack QuantizedArrays; only the elements
+    probed by the search are read.
+    """
+
+    def __init__(self, variables, lat, lon, years, sorted_samples, grid=None):
+        self.variables = tuple(variables)
+        self.years = np.asarray(years, dtype=np.int32)
+        self.grid = grid or make_grid(lat, lon)
+        self.sorted_samples = sorted_samples
+
+    def _search(self, name, cell, days, threshold, side):
+        """np.searchsorted(row, threshold, side) for every (cell, day) row at once
+
+        cell and days broadcast against each other, e.g. cells[:, None] with
+        days for every cell of a region.
+        """
+        array = self.sorted_samples[name]
+        width = array.shape[-1]
+        shape = np.broadcast_shapes(np.shape(cell), np.shape(days))
+        low = np.zeros(shape, dtype=np.intp)
+        high = np.full(shape, width, dtype=np.intp)
+        # Each round at least halves every interval
+        for _ in range(width.bit_length()):
+            active = low < high
+            middle = (low + high) // 2
+            values = array[cell, days, np.minimum(middle, width - 1)]
+            # NaN compares False, so missing samples act as +inf
+            below = values < threshold if side == 'left' else values <= threshold
+            low = np.where(active & below, middle + 1, low)
+            high = np.where(active & ~below, middle, high)
+        return low
+
+    def daily_counts(self, cell, days, condition, threshold=None):
+        """Per-day (hits, valid samples) of a condition on the given days-of-year"""
+        name, compare, default = CONDITIONS[condition]
+        threshold = default if threshold is None else threshold
+        side, above = _SEARCH[compare]
+        valid = self._search(name, cell, days, np.inf, 'right')
+        count = self._search(name, cell, days, threshold, side)
+        return (valid - count if above else count), valid
+
+    def window_counts(self, cell, start, length, condition, threshold=None):
+        """(hits, valid samples) of a condition over [start, start + length)"""
+        days = (start + np.arange(length)) % DAYS_PER_YEAR
+        hits, valid = self.daily_counts(cell, days, condition, threshold)
+        return int(hits.sum()), int(valid.sum())
+
+    def all_windows(self, cell, length, condition, threshold=None):
+        """(hits, valid samples) of the windows starting on each of the 366 days"""
+        hits, valid = self.daily_counts(cell, np.arange(DAYS_PER_YEAR), condition, threshold)
+        return circular_window_sums(hits, length), circular_window_sums(valid, length)
+
+    def lookup(self, lat, lon, date, time_range, conditions, thresholds=None):
+        """Same result shape as ExceedanceIndex.lookup, at any thresholds"""
+        thresholds = thresholds or {}
+        cell = int(self.grid.nearest(lat, lon))
+        start, length = window_bounds(date, time_range)
+        result = {}
+        for condition in conditions:
+            if condition not in CONDITIONS:
+                continue
+            threshold = thresholds.get(condition, CONDITIONS[condition][2])
+            count, total = self.window_counts(cell, start, length, condition, threshold)
+            result[condition] = {
+                'probability': 100.0 * count / total if total else 0.0,
+                'count': count,
+                'samples': total,
+                'threshold': threshold
+            }
+        return result
+
+
+def circular_window_sums(daily, length):
+    """Totals of every length-day window of a 366-day series, wrapping past Dec 31"""
+    doubled = np.concatenate([daily, daily])
+    cumulative = np.concatenate([[0], np.cumsum(doubled, dtype=np.int64)])
+    starts = np.arange(len(daily))
+    return cumulative[starts + length] - cumulative[starts]
+
+
+def sort_samples(values):
+    """(years, 366, lat, lon) cube -> (cells, 366, years) sorted along years"""
+    values = np.asarray(values, dtype=np.float32)
+    samples = values.reshape(values.shape[:2] + (-1,)).transpose(2, 1, 0)
+    return np.sort(samples, axis=-1)
+
+
+def build_ecdf_index(climate, variables=ECDF_VARIABLES):
+    """Sort every variable's samples per cell and day-of-year"""
+    return EcdfIndex(
+        variables, climate.lat, climate.lon, climate.years,
+        {name: sort_samples(climate.variables[name][:]) for name in variables},
+        grid=climate.grid
+    )
@@ -0,0 +1,203 @@
+"""
+Precomputed day-of-year exceedance index
+Stores cumulative exceedance counts along the 366-day calendar so the
+probability for any window is the difference of two indexed reads.
+
+Build offline with:
+    python exceedance_index.py build --output climatology_index.npz
+and fold in newly appended years with:
+    python exceedance_index.py update --index climatology_index.npz --dataset new_years.nc
+"""
+
+import argparse
+
+import numpy as np
+
+from climatology import CONDITIONS, DAYS_PER_YEAR, load_dataset, window_bounds
+from spatial import make_grid
+
+INDEX_VERSION = 2
+
+# Cumulative counts are stored as uint16: one year contributes at most 366
+# samples per cell, so this holds up to 179 years of record
+MAX_YEARS = np.iinfo(np.uint16).max // DAYS_PER_YEAR
+
+
+class ExceedanceIndex:
+    """Cumulative exceedance counts per condition, day-of-year and grid cell
+
+    counts[c, d, i, j] is the number of historical (year, day) samples before
+    day-of-year d that met condition c, and samples[c, d, i, j] the number of
+    samples where the variable behind condition c was present. Both carry a
+    leading zero row, so the window [s, e) is counts[:, e] - counts[:, s].
+    """
+
+    def __init__(self, conditions, lat, lon, years, counts, samples, grid=None):
+        self.conditions = tuple(conditions)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.years = np.asarray(years, dtype=np.int32)
+        self.counts = counts
+        self.samples = samples
+        self.grid = grid or make_grid(self.lat, self.lon)
+        # Views with the spatial axes flattened to the grid's cell ids
+        self._counts = counts.reshape(counts.shape[:2] + (-1,))
+        self._samples = samples.reshape(samples.shape[:2] + (-1,))
+        self._position = {condition: k for k, condition in enumerate(self.conditions)}
+
+    def window_counts(self, cells, start, length):
+        """Exceedance counts and sample sizes, one row per condition
+
+        cells are flat grid cell ids; cells and start may be scalars or
+        broadcastable arrays. Windows running past Dec 31 wrap to Jan 1.
+        """
+        start = np.asarray(start)
+        end = start + length
+        wrap = end > DAYS_PER_YEAR
+        end = np.where(wrap, end - DAYS_PER_YEAR, end)
+
+        hits = self._counts[:, end, cells].astype(np.int32) - self._counts[:, start, cells]
+        hits += np.where(wrap, self._counts[:, DAYS_PER_YEAR, cells], 0)
+        total = self._samples[:, end, cells].astype(np.int32) - self._samples[:, start, cells]
+        total += np.where(wrap, self._samples[:, DAYS_PER_YEAR, cells], 0)
+        return hits, total
+
+    def lookup(self, lat, lon, date, time_range, conditions):
+        """Same result as Climatology.exceedance_probabilities, from the index"""
+        cell = int(self.grid.nearest(lat, lon))
+        start, length = window_bounds(date, time_range)
+        hits, totals = self.window_counts(cell, start, length)
+        result = {}
+        for condition in conditions:
+            if condition not in self._position:
+                continue
+            count = int(hits[self._position[condition]])
+            total = int(totals[self._position[condition]])
+            result[condition] = {
+                'probability': 100.0 * count / total if total else 0.0,
+                'count': count,
+                'samples': total
+            }
+        return result
+
+    def lookup_many(self, lats, lons, starts, length, conditions, method='nearest'):
+        """Vectorized lookup for arrays of points and window start days
+
+        method is 'nearest', 'bilinear' or 'idw' (see spatial.py); the
+        interpolated modes blend the probabilities of surrounding cells.
+        Returns (probabilities, samples): probabilities has one row per
+        requested condition and one column per point; samples is the
+        smallest sample size behind any of a point's probabilities.
+        """
+        rows = [self._position[condition] for condition in conditions]
+        cells, weights = self.grid.weights(lats, lons, method)
+        hits, total = self.window_counts(cells, np.asarray(starts)[..., None], length)
+        probabilities = 100.0 * hits[rows] / np.maximum(total[rows], 1)
+        # Without conditions, the smallest sample size of any condition
+        samples = total[rows or slice(None)].min(axis=(0, -1))
+        return (probabilities * weights).sum(axis=-1), samples
+
+    def save(self, path):
+        """Write the index as an uncompressed .npz"""
+        np.savez(
+            path, version=INDEX_VERSION, conditions=np.array(self.conditions),
+            lat=self.lat, lon=self.lon, years=self.years,
+            counts=self.counts, samples=self.samples
+        )
+
+
+def _daily_counts(climate, year_indices, conditions):
+    """Per-day exceedance and valid sample counts summed over the given years"""
+    shape = (len(conditions), DAYS_PER_YEAR, len(climate.lat), len(climate.lon))
+    counts = np.zeros(shape, dtype=np.uint16)
+    samples = np.zeros(shape, dtype=np.uint16)
+    # One year at a time keeps peak memory at a single (366, lat, lon) slice
+    for y in year_indices:
+        for k, condition in enumerate(conditions):
+            name, compare, threshold = CONDITIONS[condition]
+            values = climate.variables[name][y]
+            valid = ~np.isnan(values)
+            samples[k] += valid
+            counts[k] += compare(values, threshold) & valid
+    return counts, samples
+
+
+def _cumulative(daily, axis):
+    """Prefix sums along the day axis with a leading zero row"""
+    shape = list(daily.shape)
+    shape[axis] += 1
+    result = np.zeros(shape, dtype=np.uint16)
+    target = [slice(None)] * len(shape)
+    target[axis] = slice(1, None)
+    np.cumsum(daily, axis=axis, dtype=np.uint16, out=result[tuple(target)])
+    return result
+
+
+def build_index(climate, conditions=None):
+    """Build the exceedance index for every year in a climatology"""
+    conditions = tuple(conditions or CONDITIONS)
+    if len(climate.years) > MAX_YEARS:
+        raise ValueError(f'Exceedance index holds at most {MAX_YEARS} years')
+    counts, samples = _daily_counts(climate, range(len(climate.years)), conditions)
+    return ExceedanceIndex(
+        conditions, climate.lat, climate.lon, climate.years,
+        _cumulative(counts, axis=1), _cumulative(samples, axis=1)
+    )
+
+
+def append_years(index, climate):
+    """Fold years from climate that the index has not seen yet into it"""
+    if climate.lat.shape != index.lat.shape or climate.lon.shape != index.lon.shape:
+        raise ValueError('Dataset grid does not match the index grid')
+    new = np.flatnonzero(~np.isin(climate.years, index.years))
+    if len(new) == 0:
+        return index
+    if len(index.years) + len(new) > MAX_YEARS:
+        raise ValueError(f'Exceedance index holds at most {MAX_YEARS} years')
+
+    counts, samples = _daily_counts(climate, new, index.conditions)
+    return ExceedanceIndex(
+        index.conditions, index.lat, index.lon,
+        np.sort(np.concatenate([index.years, climate.years[new]])),
+        index.counts + _cumulative(counts, axis=1),
+        index.samples + _cumulative(samples, axis=1)
+    )
+
+
+def load_index(path):
+    """Load an index written by ExceedanceIndex.save"""
+    with np.load(path) as data:
+        if int(data['version']) != INDEX_VERSION:
+            raise ValueError(f'Unsupported exceedance index version in {path}')
+        return ExceedanceIndex(
+            [str(c) for c in data['conditions']], data['lat'], data['lon'],
+            data['years'], data['counts'], data['samples']
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or update the exceedance index')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Build the index from a full dataset')
+    build.add_argument('--dataset', help='NetCDF/Zarr/.npz dataset (default: CLIMATOLOGY_PATH)')
+    build.add_argument('--output', required=True, help='Index file to write')
+
+    update = commands.add_parser('update', help='Append new years to an existing index')
+    update.add_argument('--index', required=True, help='Index file to update in place')
+    update.add_argument('--dataset', required=True, help='Dataset containing the new years')
+
+    args = parser.parse_args(argv)
+    climate = load_dataset(args.dataset)
+    if args.command == 'build':
+        index = build_index(climate)
+        index.save(args.output)
+    else:
+        index = append_years(load_index(args.index), climate)
+        index.save(args.index)
+    print(f'Indexed {len(index.years)} years ({index.years[0]}-{index.years[-1]}) '
+          f'on a {len(index.lat)}x{len(index.lon)} grid')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Offline gazetteer for the location field
+Loads a GeoNames-style dump (e.g. cities15000.txt) into a sorted name index
+for type-ahead prefix search and exact name resolution, with no external
+geocoding service. Country names for 'Paris, France' style queries come from
+a GeoNames countryInfo.txt style table (ISO, ISO3, ISO-Numeric, fips,
+Country columns).
+"""
+
+import bisect
+import os
+import unicodedata
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cities.tsv')
+DEFAULT_COUNTRIES_PATH = os.path.join(os.path.dirname(DEFAULT_PATH), 'countries.tsv')
+
+# GeoNames column positions
+NAME, ASCII_NAME, ALTERNATE_NAMES, LATITUDE, LONGITUDE = 1, 2, 3, 4, 5
+COUNTRY_CODE, ADMIN1, POPULATION = 8, 10, 14
+# countryInfo.txt column positions
+ISO, ISO3, COUNTRY_NAME = 0, 1, 4
+
+# Short prefixes match huge ranges of the index, so their top results are
+# precomputed; longer prefixes rank their whole index range by population
+PRECOMPUTED_PREFIX = 2
+MAX_RESULTS = 20
+
+
+def normalize(text):
+    """Case-fold and strip accents so 'Zürich' and 'zurich' share a key"""
+    text = unicodedata.normalize('NFKD', text.strip().casefold())
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+class Gazetteer:
+    """Places held in parallel arrays plus a sorted (key, place) name index
+
+    country_names maps normalized country names and ISO3 codes to the ISO
+    code used in countries.
+    """
+
+    def __init__(self, names, countries, admin1, lat, lon, population, aliases, country_names=None):
+        self.names = names
+        self.countries = countries
+        self.admin1 = admin1
+        self.country_names = country_names or {}
+        self.lat = np.asarray(lat, dtype=np.float32)
+        self.lon = np.asarray(lon, dtype=np.float32)
+        self.population = np.asarray(population, dtype=np.int64)
+
+        # Sorted keys with the place each one points to; a place appears
+        # once per distinct name or alternate name
+        pairs = sorted({(normalize(alias), place) for place, alias in aliases if alias.strip()})
+        self._keys = [key for key, _ in pairs]
+        self._places = np.array([place for _, place in pairs], dtype=np.int32)
+
+        # Population rank of every index entry (0 = most populous place), so
+        # the top places of any key range are its smallest distinct ranks
+        self._by_population = np.argsort(-self.population, kind='stable').astype(np.int32)
+        rank_of = np.empty(len(self.population), dtype=np.int32)
+        rank_of[self._by_population] = np.arange(len(self.population), dtype=np.int32)
+        self._ranks = rank_of[self._places]
+
+        self._top = {}
+        for key, place in pairs:
+            for length in range(1, min(PRECOMPUTED_PREFIX, len(key)) + 1):
+                self._top.setdefault(key[:length], set()).add(place)
+        for prefix, places in self._top.items():
+            self._top[prefix] = self._rank(places)[:MAX_RESULTS]
+
+    def __len__(self):
+        return len(self.names)
+
+    def _rank(self, places):
+        """Places ordered by descending population"""
+        places = np.fromiter(places, dtype=np.int32)
+        return places[np.argsort(-self.population[places], kind='stable')].tolist()
+
+    def _range(self, key):
+        """Slice of the sorted index whose keys start with key"""
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_left(self._keys, key + '\uffff', start)
+        return start, end
+
+    def place(self, k):
+        return {
+            'name': self.names[k],
+            'country': self.countries[k],
+            'admin1': self.admin1[k],
+            'lat': round(float(self.lat[k]), 5),
+            'lon': round(float(self.lon[k]), 5),
+            'population': int(self.population[k])
+        }
+
+    def search(self, prefix, limit=10):
+        """Type-ahead: most populous places with a name starting with prefix"""
+        key = normalize(prefix)
+        limit = max(1, min(limit, MAX_RESULTS))
+        if not key:
+            return []
+        if len(key) <= PRECOMPUTED_PREFIX:
+            places = self._top.get(key, [])
+        else:
+            start, end = self._range(key)
+            places = self._by_population[self._smallest_ranks(self._ranks[start:end], limit)].tolist()
+        return [self.place(k) for k in places[:limit]]
+
+    @staticmethod
+    def _smallest_ranks(ranks, count):
+        """The count smallest distinct values of ranks, in linear time
+
+        A place can own several keys in one range, so partition a few times
+        more values than needed and widen until enough distinct ones remain.
+        """
+        k = 4 * count
+        while k < len(ranks):
+            smallest = np.unique(np.partition(ranks, k - 1)[:k])
+            if len(smallest) >= count:
+                return smallest[:count]
+            k *= 4
+        return np.unique(ranks)[:count]
+
+    def resolve(self, query):
+        """Exact name lookup, optionally qualified as 'Name, Qualifier'
+
+        The qualifier is a country code ('FR'), country name ('France'),
+        ISO3 code ('FRA') or first-level region code ('NY').
+        """
+        name, _, qualifier = query.partition(',')
+        key, qualifier = normalize(name), normalize(qualifier)
+        start, end = bisect.bisect_left(self._keys, key), bisect.bisect_right(self._keys, key)
+        places = self._rank(set(self._places[start:end].tolist()))
+        if qualifier:
+            country = self.country_names.get(qualifier, '').casefold()
+            places = [k for k in places
+                      if qualifier in (self.countries[k].casefold(), self.admin1[k].casefold())
+                      or self.countries[k].casefold() == country]
+        return self.place(places[0]) if places else None
+
+
+def load_countries(path):
+    """{normalized country name or ISO3 code: ISO code} from a countryInfo.txt style table"""
+    country_names = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) <= COUNTRY_NAME:
+                continue
+            country_names[normalize(fields[ISO3])] = fields[ISO]
+            country_names[normalize(fields[COUNTRY_NAME])] = fields[ISO]
+    return country_names
+
+
+def load_gazetteer(path=None, min_population=0, countries_path=None):
+    """Read a GeoNames tab-separated dump and, when present, its country table"""
+    path = path or os.environ.get('GAZETTEER_PATH') or DEFAULT_PATH
+    countries_path = countries_path or os.environ.get('GAZETTEER_COUNTRIES_PATH') or DEFAULT_COUNTRIES_PATH
+    names, countries, admin1, lat, lon, population, aliases = [], [], [], [], [], [], []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) <= POPULATION:
+                continue
+            people = int(fields[POPULATION] or 0)
+            if people < min_population:
+                continue
+            place = len(names)
+            names.append(fields[NAME])
+            countries.append(fields[COUNTRY_CODE])
+            admin1.append(fields[ADMIN1])
+            lat.append(float(fields[LATITUDE]))
+            lon.append(float(fields[LONGITUDE]))
+            population.append(people)
+            aliases.append((place, fields[NAME]))
+            aliases.append((place, fields[ASCII_NAME]))
+            aliases.extend((place, alias) for alias in fields[ALTERNATE_NAMES].split(','))
+    try:
+        country_names = load_countries(countries_path)
+    except FileNotFoundError:  # Only country codes are accepted as qualifiers
+        country_names = {}
+    return Gazetteer(names, countries, admin1, lat, lon, population, aliases, country_names)
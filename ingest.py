@@ -0,0 +1,198 @@
+"""
+Ingest pipeline: daily granules -> point-major columnar store
+Source granules are one file per day (space-first). Each worker streams all
+days through a generator for one spatial block and transposes them into a
+(block_lat, block_lon, years, 366) array, so a cell's full series becomes one
+contiguous read (see point_store.py). Blocks are written atomically and
+skipped on restart, which makes an interrupted run resumable.
+
+    python ingest.py --granules 'granules/MERRA2_*.nc4' --output store/ --workers 8
+    python ingest.py --output store/            # synthetic / CLIMATOLOGY_PATH record
+"""
+
+import argparse
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+from climatology import (
+    DAYS_PER_YEAR, DISCOMFORT_INDEX, DISCOMFORT_INDICES, VARIABLES, convert_units, date_to_doy,
+    discomfort_index, find_variable, load_dataset
+)
+from point_store import block_path, read_manifest, write_manifest
+
+try:
+    import xarray as xr
+except ImportError:  # Only needed for NetCDF granules
+    xr = None
+
+_GRANULE_DATE = re.compile(r'(\d{4})(\d{2})(\d{2})')
+
+
+class NetcdfGranules:
+    """Daily NetCDF granules (one time step each) matched by a glob pattern"""
+
+    def __init__(self, pattern):
+        if xr is None:
+            raise RuntimeError('xarray is required to read NetCDF granules')
+        self.paths = sorted(glob.glob(pattern))
+        if not self.paths:
+            raise FileNotFoundError(f'No granules match {pattern}')
+        self.days = [datetime(*map(int, _GRANULE_DATE.findall(os.path.basename(p))[-1]))
+                     for p in self.paths]
+        with xr.open_dataset(self.paths[0]) as ds:
+            self._lat_name = 'lat' if 'lat' in ds.coords else 'latitude'
+            self._lon_name = 'lon' if 'lon' in ds.coords else 'longitude'
+            self.lat = ds[self._lat_name].values
+            self.lon = ds[self._lon_name].values
+
+    def read(self, k, names, rows, cols):
+        """Block of each variable on day k; only the block is read from disk"""
+        values = {}
+        with xr.open_dataset(self.paths[k]) as ds:
+            for name in names:
+                array = ds[find_variable(ds, name)].isel(
+                    {self._lat_name: rows, self._lon_name: cols}
+                ).squeeze(drop=True)
+                values[name] = convert_units(array.values.astype(np.float32),
+                                             array.attrs.get('units'), name)
+        return values
+
+
+class ClimatologyGranules:
+    """Daily slices of an already loaded record (synthetic, .npz or pack)"""
+
+    def __init__(self, climate):
+        self.climate = climate
+        self.lat = climate.lat
+        self.lon = climate.lon
+        self.days = []
+        self._positions = []
+        for y, year in enumerate(climate.years):
+            for day in np.arange(f'{year}-01-01', f'{year + 1}-01-01', dtype='datetime64[D]'):
+                day = day.astype(datetime)
+                self.days.append(day)
+                self._positions.append((y, date_to_doy(day)))
+
+    def read(self, k, names, rows, cols):
+        y, doy = self._positions[k]
+        return {name: self.climate.variables[name][y, doy, rows, cols] for name in names}
+
+
+# Granule source of the current worker process, set by _init_worker
+_source = None
+
+
+def _open_source(spec):
+    kind, location = spec
+    if kind == 'netcdf':
+        return NetcdfGranules(location)
+    return ClimatologyGranules(load_dataset(location))
+
+
+def _init_worker(spec):
+    global _source
+    _source = _open_source(spec)
+
+
+def iter_block_days(source, names, rows, cols, discomfort=None):
+    """Stream (year, day-of-year, values) for one block across every granule
+
+    heat_index is derived here from the block's tmax and rh, so the chosen
+    discomfort index is baked into the store and everything built from it.
+    """
+    base_names = [name for name in names if name != 'heat_index']
+    if 'heat_index' in names:
+        base_names = sorted(set(base_names) | {'tmax', 'rh'})
+    for k, day in enumerate(source.days):
+        values = source.read(k, base_names, rows, cols)
+        if 'heat_index' in names:
+            values['heat_index'] = discomfort_index(values['tmax'], values['rh'], discomfort)
+        yield day.year, date_to_doy(day), values
+
+
+def ingest_block(root, block_row, block_col):
+    """Transpose every day of one block into point-major arrays and save them"""
+    manifest = read_manifest(root)
+    block_lat, block_lon = manifest['block']
+    years = manifest['years']
+    rows = slice(block_row * block_lat, min((block_row + 1) * block_lat, len(manifest['lat'])))
+    cols = slice(block_col * block_lon, min((block_col + 1) * block_lon, len(manifest['lon'])))
+    shape = (rows.stop - rows.start, cols.stop - cols.start, len(years), DAYS_PER_YEAR)
+
+    # Missing days (Feb 29 of non-leap years, gaps in the record) stay NaN
+    cubes = {name: np.full(shape, np.nan, dtype=np.float32) for name in manifest['variables']}
+    year_index = {year: y for y, year in enumerate(years)}
+    for year, doy, values in iter_block_days(_source, manifest['variables'], rows, cols,
+                                             manifest.get('discomfort')):
+        for name, cube in cubes.items():
+            cube[:, :, year_index[year], doy] = values[name]
+
+    for name, cube in cubes.items():
+        path = block_path(root, name, block_row, block_col)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, cube)
+        os.replace(tmp_path, path)
+    return block_row, block_col
+
+
+def pending_blocks(root):
+    """Blocks that still lack an output file for some variable"""
+    manifest = read_manifest(root)
+    block_lat, block_lon = manifest['block']
+    n_rows = -(-len(manifest['lat']) // block_lat)
+    n_cols = -(-len(manifest['lon']) // block_lon)
+    return [
+        (r, c) for r in range(n_rows) for c in range(n_cols)
+        if not all(os.path.exists(block_path(root, name, r, c)) for name in manifest['variables'])
+    ]
+
+
+def ingest(spec, root, block=(32, 32), workers=None, discomfort=None):
+    """Run (or resume) the ingest of a granule source into a point store"""
+    discomfort = discomfort or DISCOMFORT_INDEX
+    source = _open_source(spec)
+    years = sorted({day.year for day in source.days})
+    if os.path.exists(os.path.join(root, 'store.json')):
+        manifest = read_manifest(root)
+        if (manifest['years'] != years or manifest['block'] != list(block)
+                or manifest.get('discomfort', 'heat_index') != discomfort):
+            raise ValueError(f'{root} holds a different ingest; remove it or use the same options')
+    else:
+        write_manifest(root, source.lat, source.lon, years, VARIABLES, block, discomfort)
+    del source
+
+    blocks = pending_blocks(root)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(spec,)) as pool:
+        futures = [pool.submit(ingest_block, root, r, c) for r, c in blocks]
+        for done, future in enumerate(as_completed(futures), 1):
+            block_row, block_col = future.result()
+            print(f'[{done}/{len(blocks)}] block {block_row},{block_col}')
+    return len(blocks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Re-chunk daily granules into a point-major store')
+    parser.add_argument('--granules', help='Glob of daily NetCDF granules (default: load_dataset record)')
+    parser.add_argument('--dataset', help='Dataset for load_dataset when --granules is not given')
+    parser.add_argument('--output', required=True, help='Store directory (resumed if it exists)')
+    parser.add_argument('--block', type=int, nargs=2, default=(32, 32), metavar=('LAT', 'LON'))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--discomfort', choices=sorted(DISCOMFORT_INDICES), default=None,
+                        help='Index behind the uncomfortable condition (default: DISCOMFORT_INDEX or heat_index)')
+    args = parser.parse_args(argv)
+
+    spec = ('netcdf', args.granules) if args.granules else ('climatology', args.dataset)
+    count = ingest(spec, args.output, tuple(args.block), args.workers, args.discomfort)
+    print(f'Ingested {count} blocks into {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,14 +4,37 @@ Team: CodeExploitrz
 Single-file Flask application with embedded HTML, CSS, and JavaScript
 """
 
-from flask import Flask, render_template_string, jsonify, request, send_file
+from flask import Flask, Response, render_template_string, jsonify, request
 import json
 import csv
 import io
+import hashlib
+import os
 from datetime import datetime, timedelta
-import random
 import math
 
+import numpy as np
+
+from climatology import (
+    CONDITIONS, DAYS_PER_YEAR, doy_to_date, load_dataset, window_bounds, window_length
+)
+from assets import IMMUTABLE, build_bundle, compressible, mimetype as asset_mimetype
+from climatology_pack import open_pack
+from columnar import EXPORT_FORMATS, ColumnTable, available_formats, require, stream_table
+from cooccurrence import build_cooccurrence
+from ecdf_index import build_ecdf_index
+from exceedance_index import build_index, load_index
+from gazetteer import load_gazetteer
+from point_store import PointStore
+from precompressed import PrecompressedBody
+from regions import RegionMaskCache
+from response_encoding import JSON, encode, json_bytes, negotiate
+from result_cache import ResultCache
+from singleflight import SingleFlight
+from tiles import TileRenderer, valid_tile
+from trends import SIGNIFICANCE_LEVEL, UNITS, linear_trend, window_aggregate
+from window_sums import build_window_sums
+
 app = Flask(__name__)
 
 # HTML Template with embedded CSS and JavaScript
@@ -269,6 +292,18 @@ HTML_TEMPLATE = """
             color: var(--text-secondary);
         }
 
+        .threshold-input {
+            width: 3.5rem;
+            margin: 0 0.15rem;
+            padding: 0 0.2rem;
+            background: var(--primary-bg);
+            border: 1px solid var(--border-color);
+            border-radius: 4px;
+            color: var(--text-primary);
+            font-size: 0.85rem;
+            text-align: center;
+        }
+
         .results-section {
             display: none;
         }
@@ -512,7 +547,8 @@ HTML_TEMPLATE = """
 
                 <div class="form-group">
                     <label><i class="fas fa-map-marker-alt"></i> Location</label>
-                    <input type="text" id="locationInput" class="form-control" placeholder="Enter city or coordinates">
+                    <input type="text" id="locationInput" class="form-control" placeholder="Enter city or coordinates" list="locationSuggestions" autocomplete="off">
+                    <datalist id="locationSuggestions"></datalist>
                     <small style="color: var(--text-secondary); display: block; margin-top: 0.5rem;">
                         Or click on the map to select a location
                     </small>
@@ -539,27 +575,27 @@ HTML_TEMPLATE = """
                         <div class="condition-card" data-condition="hot">
                             <div class="condition-icon">🔥</div>
                             <div class="condition-label">Very Hot</div>
-                            <div class="condition-desc">&gt;90°F</div>
+                            <div class="condition-desc">&gt;<input type="number" class="threshold-input" data-condition="hot" value="90" step="any">°F</div>
                         </div>
                         <div class="condition-card" data-condition="cold">
                             <div class="condition-icon">❄️</div>
                             <div class="condition-label">Very Cold</div>
-                            <div class="condition-desc">&lt;32°F</div>
+                            <div class="condition-desc">&lt;<input type="number" class="threshold-input" data-condition="cold" value="32" step="any">°F</div>
                         </div>
                         <div class="condition-card" data-condition="windy">
                             <div class="condition-icon">🌬️</div>
                             <div class="condition-label">Very Windy</div>
-                            <div class="condition-desc">&gt;25 mph</div>
+                            <div class="condition-desc">&gt;<input type="number" class="threshold-input" data-condition="windy" value="25" step="any"> mph</div>
                         </div>
                         <div class="condition-card" data-condition="wet">
                             <div class="condition-icon">🌧️</div>
                             <div class="condition-label">Very Wet</div>
-                            <div class="condition-desc">&gt;1 inch</div>
+                            <div class="condition-desc">&gt;<input type="number" class="threshold-input" data-condition="wet" value="1" step="any"> inch</div>
                         </div>
                         <div class="condition-card" data-condition="uncomfortable">
                             <div class="condition-icon">😓</div>
                             <div class="condition-label">Uncomfortable</div>
-                            <div class="condition-desc">High humidity</div>
+                            <div class="condition-desc">HI &gt;<input type="number" class="threshold-input" data-condition="uncomfortable" value="90" step="any">°F</div>
                         </div>
                     </div>
                 </div>
@@ -568,10 +604,14 @@ HTML_TEMPLATE = """
                     <button class="btn btn-primary" onclick="analyzeWeather()">
                         <i class="fas fa-search"></i> Analyze Weather
                     </button>
+                    <button class="btn btn-secondary" onclick="findBestDates()">
+                        <i class="fas fa-calendar-check"></i> Best Dates
+                    </button>
                     <button class="btn btn-secondary" onclick="resetForm()">
                         <i class="fas fa-redo"></i> Reset
                     </button>
                 </div>
+                <div id="bestDates"></div>
             </div>
 
             <div class="card">
@@ -625,6 +665,15 @@ HTML_TEMPLATE = """
                 </div>
                 <canvas id="weatherChart"></canvas>
             </div>
+
+            <div class="chart-container">
+                <div class="chart-title">
+                    <i class="fas fa-chart-line"></i>
+                    Year-by-Year Record
+                </div>
+                <canvas id="yearlyChart"></canvas>
+                <div class="probability-details" id="yearlyTrend"></div>
+            </div>
         </div>
 
          NASA Data Sources 
@@ -667,6 +716,7 @@ HTML_TEMPLATE = """
         // Global variables
         let map;
         let marker;
+        let probabilityOverlay;
         let selectedConditions = [];
         let currentResults = null;
 
@@ -698,6 +748,22 @@ HTML_TEMPLATE = """
             document.getElementById('dateInput').value = today;
         }
 
+        // Suggest place names from the offline gazetteer while typing
+        let suggestTimer;
+        document.getElementById('locationInput').addEventListener('input', function() {
+            clearTimeout(suggestTimer);
+            const query = this.value.trim();
+            if (query.length < 2 || /^[-\\d.,\\s]+$/.test(query)) return;
+
+            suggestTimer = setTimeout(async () => {
+                const response = await fetch(`/api/geocode?q=${encodeURIComponent(query)}&limit=8`);
+                const data = await response.json();
+                document.getElementById('locationSuggestions').innerHTML = data.results
+                    .map(place => `<option value="${place.name}, ${place.country}">`)
+                    .join('');
+            }, 150);
+        });
+
         // Handle condition card selection
         document.querySelectorAll('.condition-card').forEach(card => {
             card.addEventListener('click', function() {
@@ -712,6 +778,22 @@ HTML_TEMPLATE = """
             });
         });
 
+        // Editing a threshold should not toggle its card
+        document.querySelectorAll('.threshold-input').forEach(input => {
+            input.addEventListener('click', event => event.stopPropagation());
+        });
+
+        // Thresholds the user changed from the card defaults
+        function customThresholds() {
+            const thresholds = {};
+            document.querySelectorAll('.threshold-input').forEach(input => {
+                if (input.value !== '' && input.value !== input.defaultValue) {
+                    thresholds[input.dataset.condition] = parseFloat(input.value);
+                }
+            });
+            return thresholds;
+        }
+
         // Analyze weather function
         async function analyzeWeather() {
             const location = document.getElementById('locationInput').value;
@@ -736,17 +818,23 @@ HTML_TEMPLATE = """
                 const response = await fetch('/api/analyze', {
                     method: 'POST',
                     headers: {
-                        'Content-Type': 'application/json'
+                        'Content-Type': 'application/json',
+                        'Accept': 'application/x-float32-frame, application/json;q=0.9'
                     },
                     body: JSON.stringify({
                         location: location,
                         date: date,
                         timeRange: timeRange,
-                        conditions: selectedConditions
+                        conditions: selectedConditions,
+                        thresholds: customThresholds()
                     })
                 });
 
-                const data = await response.json();
+                const data = await readResults(response);
+                if (!response.ok) {
+                    alert(data.error || 'Error analyzing weather data. Please try again.');
+                    return;
+                }
                 currentResults = data;
                 displayResults(data);
             } catch (error) {
@@ -757,6 +845,146 @@ HTML_TEMPLATE = """
             }
         }
 
+        // Float32 frames carry a JSON header followed by the chart series as
+        // raw little-endian buffers, viewed in place as Float32Arrays
+        async function readResults(response) {
+            if (!(response.headers.get('Content-Type') || '').startsWith('application/x-float32-frame')) {
+                return response.json();
+            }
+            const buffer = await response.arrayBuffer();
+            const length = new DataView(buffer).getUint32(0, true);
+            const header = new TextDecoder().decode(new Uint8Array(buffer, 4, length));
+            return JSON.parse(header, (key, value) =>
+                value && value.dtype === 'float32'
+                    ? new Float32Array(buffer, value.offset, value.length)
+                    : value
+            );
+        }
+
+        // Typed arrays serialize as plain lists in uploads and downloads,
+        // trimmed to float32 precision
+        function plainArrays(key, value) {
+            return ArrayBuffer.isView(value) ? Array.from(value, v => +v.toPrecision(7)) : value;
+        }
+
+        // Rank every start day of the year for the selected conditions
+        async function findBestDates() {
+            const location = document.getElementById('locationInput').value;
+            if (!location || selectedConditions.length === 0) {
+                alert('Please enter a location and select at least one weather condition');
+                return;
+            }
+            const response = await fetch('/api/best-dates', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    location: location,
+                    timeRange: document.getElementById('timeRange').value,
+                    conditions: selectedConditions,
+                    thresholds: customThresholds(),
+                    year: new Date(document.getElementById('dateInput').value || Date.now()).getFullYear(),
+                    spacing: 7,
+                    top: 5
+                })
+            });
+            const data = await response.json();
+            if (!response.ok) {
+                alert(data.error || 'Error ranking dates. Please try again.');
+                return;
+            }
+            document.getElementById('bestDates').innerHTML = `
+                <div class="probability-details" style="margin-top: 1rem;">
+                    Lowest historical risk (${data.conditions.join(', ')}):
+                    ${data.dates.map(d => `
+                        <div><a href="#" onclick="document.getElementById('dateInput').value = '${d.date}'; return false;">${d.date}</a>
+                        &ndash; ${d.score}%</div>
+                    `).join('')}
+                </div>
+            `;
+        }
+
+        // Per-year window values across the record with their linear trends
+        async function createYearlyChart(data) {
+            const params = new URLSearchParams({
+                location: data.location,
+                date: data.date,
+                timeRange: data.timeRange || 'day'
+            });
+            const response = await fetch(`/api/series?${params}`);
+            if (!response.ok) return;
+            const series = await response.json();
+
+            if (window.yearlyChartInstance) {
+                window.yearlyChartInstance.destroy();
+            }
+            const trend = series.trends.tmax;
+            window.yearlyChartInstance = new Chart(document.getElementById('yearlyChart'), {
+                data: {
+                    labels: series.years,
+                    datasets: [
+                        {
+                            type: 'line',
+                            label: 'Max temperature (°F)',
+                            data: series.series.tmax,
+                            borderColor: '#ef4444',
+                            yAxisID: 'y'
+                        },
+                        {
+                            type: 'line',
+                            label: 'Trend',
+                            data: trend.fitted,
+                            borderColor: '#f59e0b',
+                            borderDash: [6, 4],
+                            pointRadius: 0,
+                            yAxisID: 'y'
+                        },
+                        {
+                            type: 'bar',
+                            label: 'Precipitation (inches)',
+                            data: series.series.precip,
+                            backgroundColor: '#3b82f680',
+                            yAxisID: 'y1'
+                        }
+                    ]
+                },
+                options: {
+                    responsive: true,
+                    plugins: { legend: { labels: { color: '#f1f5f9' } } },
+                    scales: {
+                        y: { position: 'left', ticks: { color: '#94a3b8' }, grid: { color: '#334155' } },
+                        y1: { position: 'right', ticks: { color: '#94a3b8' }, grid: { drawOnChartArea: false } },
+                        x: { ticks: { color: '#94a3b8' }, grid: { color: '#334155' } }
+                    }
+                }
+            });
+            document.getElementById('yearlyTrend').innerHTML = Object.entries(series.trends)
+                .map(([name, t]) => `${name}: ${t.slopePerDecade > 0 ? '+' : ''}${t.slopePerDecade} ${series.units[name]}/decade ` +
+                    `(p = ${t.pValue}${t.significant ? ', significant' : ''})`)
+                .join(' &middot; ') + ` &mdash; ${series.years[0]}&ndash;${series.years[series.years.length - 1]}`;
+        }
+
+        // Index of a date on the 366-day calendar the tiles are keyed by
+        function dayOfYear(date) {
+            const [, month, day] = date.split('-').map(Number);
+            return Math.round((Date.UTC(2000, month - 1, day) - Date.UTC(2000, 0, 1)) / 86400000);
+        }
+
+        // Overlay the probability of the first selected condition on the map
+        function updateOverlay(data) {
+            if (probabilityOverlay) {
+                map.removeLayer(probabilityOverlay);
+            }
+            const condition = data.probabilities.length ? data.probabilities[0].condition : null;
+            if (!condition) return;
+            const timeRange = encodeURIComponent(data.timeRange || 'day');
+            probabilityOverlay = L.tileLayer(
+                `/api/tiles/${condition}/${dayOfYear(data.date)}/{z}/{x}/{y}.png?timeRange=${timeRange}`,
+                { opacity: 0.7, maxZoom: 18, maxNativeZoom: 12 }
+            ).addTo(map);
+        }
+
         // Display results
         function displayResults(data) {
             const resultsContent = document.getElementById('resultsContent');
@@ -801,6 +1029,35 @@ HTML_TEMPLATE = """
             });
 
             html += '</div>';
+
+            // Joint and union of the selected conditions
+            if (data.combined) {
+                const names = data.combined.conditions.join(', ');
+                html += '<div class="probability-grid" style="margin-top: 1rem;">';
+                [['all', 'All of', 'AND'], ['any', 'Any of', 'OR']].forEach(([key, title, op]) => {
+                    const probability = Math.round(data.combined[key].probability);
+                    const color = getProbabilityColor(probability);
+                    html += `
+                        <div class="probability-card">
+                            <div class="probability-header">
+                                <div class="probability-title">${title}: ${names}</div>
+                                <div class="probability-value" style="color: ${color};">${probability}%</div>
+                            </div>
+                            <div class="probability-bar">
+                                <div class="probability-fill" style="width: ${probability}%; background: ${color};"></div>
+                            </div>
+                            <div class="probability-details">
+                                ${data.combined[key].count} of ${data.combined[key].samples} historical days (${op})
+                            </div>
+                        </div>
+                    `;
+                });
+                html += '</div><div class="probability-details" style="margin-top: 0.5rem;">' +
+                    data.combined.conditional
+                        .map(c => `P(${c.condition} | ${c.given}) = ${Math.round(c.probability)}%`)
+                        .join(' &middot; ') +
+                    '</div>';
+            }
             resultsContent.innerHTML = html;
 
             // Show results section
@@ -809,6 +1066,8 @@ HTML_TEMPLATE = """
             // Create charts
             createProbabilityChart(data);
             createWeatherChart(data);
+            createYearlyChart(data);
+            updateOverlay(data);
 
             // Scroll to results
             document.getElementById('results').scrollIntoView({ behavior: 'smooth' });
@@ -970,13 +1229,19 @@ HTML_TEMPLATE = """
         async function downloadCSV() {
             if (!currentResults) return;
 
-            const response = await fetch('/api/download/csv', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify(currentResults)
-            });
+            // Stored results are exported by id; re-upload only if it expired
+            let response = currentResults.exports
+                ? await fetch(currentResults.exports.csv)
+                : null;
+            if (!response || !response.ok) {
+                response = await fetch('/api/download/csv', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify(currentResults, plainArrays)
+                });
+            }
 
             const blob = await response.blob();
             const url = window.URL.createObjectURL(blob);
@@ -990,7 +1255,7 @@ HTML_TEMPLATE = """
         async function downloadJSON() {
             if (!currentResults) return;
 
-            const dataStr = JSON.stringify(currentResults, null, 2);
+            const dataStr = JSON.stringify(currentResults, plainArrays, 2);
             const blob = new Blob([dataStr], { type: 'application/json' });
             const url = window.URL.createObjectURL(blob);
             const a = document.createElement('a');
@@ -1008,8 +1273,12 @@ HTML_TEMPLATE = """
             document.querySelectorAll('.condition-card').forEach(card => {
                 card.classList.remove('active');
             });
+            document.querySelectorAll('.threshold-input').forEach(input => {
+                input.value = input.defaultValue;
+            });
             
             selectedConditions = [];
+            document.getElementById('bestDates').innerHTML = '';
             
             if (marker) {
                 map.removeLayer(marker);
@@ -1029,25 +1298,223 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Memory-mapped climatology pack (see climatology_pack.py). Opened at import
+# so workers forked from a preloading server share the same mapping.
+pack = open_pack(os.environ['CLIMATOLOGY_PACK']) if os.environ.get('CLIMATOLOGY_PACK') else None
+
+# Historical record used for all analyses, loaded on first use
+climatology = None
+
+def get_climatology():
+    """Load the climatology dataset once per process"""
+    global climatology
+    if climatology is None:
+        climatology = pack.climatology() if pack else load_dataset()
+    return climatology
+
+# Point-major store written by ingest.py (POINT_STORE_PATH), where a cell's
+# whole record is one contiguous read
+point_store = None
+
+def get_point_store():
+    """Open the point store once per process, or None when not configured"""
+    global point_store
+    path = os.environ.get('POINT_STORE_PATH')
+    if point_store is None and path:
+        point_store = PointStore(path)
+    return point_store
+
+# Day-of-year prefix sums for chart aggregates, from the pack when it has
+# them or built from the climatology on first use
+window_sums = None
+
+def get_window_sums():
+    """Load or build the window sums once per process"""
+    global window_sums
+    if window_sums is None:
+        window_sums = pack.window_sums() if pack else None
+        if window_sums is None:
+            window_sums = build_window_sums(get_climatology())
+    return window_sums
+
+# Sorted samples per cell and day-of-year for user-chosen thresholds, from
+# the pack when it has them or built from the climatology on first use
+ecdf_index = None
+
+def get_ecdf_index():
+    """Load or build the ECDF index once per process"""
+    global ecdf_index
+    if ecdf_index is None:
+        ecdf_index = pack.ecdf_index() if pack else None
+        if ecdf_index is None:
+            ecdf_index = build_ecdf_index(get_climatology())
+    return ecdf_index
+
+# Per-day year bitsets of every condition for combined probabilities
+cooccurrence = None
+
+def get_cooccurrence():
+    """Load or build the co-occurrence bitsets once per process"""
+    global cooccurrence
+    if cooccurrence is None:
+        cooccurrence = pack.cooccurrence() if pack else None
+        if cooccurrence is None:
+            cooccurrence = build_cooccurrence(get_climatology())
+    return cooccurrence
+
+# Precomputed exceedance counts, loaded from EXCEEDANCE_INDEX_PATH when built
+# offline (see exceedance_index.py) or built from the climatology on first use
+exceedance_index = None
+
+def get_exceedance_index():
+    """Load or build the exceedance index once per process"""
+    global exceedance_index
+    if exceedance_index is None:
+        path = os.environ.get('EXCEEDANCE_INDEX_PATH')
+        if pack:
+            exceedance_index = pack.exceedance_index()
+        elif path and os.path.exists(path):
+            exceedance_index = load_index(path)
+        else:
+            exceedance_index = build_index(get_climatology())
+    return exceedance_index
+
+# Probability map tiles, cached on disk under TILE_CACHE_DIR when set (and
+# pre-seeded with python tiles.py seed)
+tile_renderer = None
+
+def get_tile_renderer():
+    """Create the tile renderer once per process"""
+    global tile_renderer
+    if tile_renderer is None:
+        tile_renderer = TileRenderer(get_exceedance_index(), os.environ.get('TILE_CACHE_DIR'))
+    return tile_renderer
+
+# Rasterized bbox / polygon / route masks keyed by geometry hash
+region_masks = RegionMaskCache(max_entries=int(os.environ.get('REGION_CACHE_SIZE', 256)))
+
+# Analysis results keyed by grid cell and window (see result_cache.py). Set
+# ANALYSIS_CACHE_DB to share a SQLite tier between workers.
+analysis_cache = ResultCache(
+    max_entries=int(os.environ.get('ANALYSIS_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('ANALYSIS_CACHE_TTL', 3600)),
+    disk_path=os.environ.get('ANALYSIS_CACHE_DB')
+)
+
+# Finished results kept under short-lived ids, so exports are a GET of
+# /api/results/<id>.<fmt> instead of re-uploading the result. Set
+# RESULT_STORE_DB to share them between workers.
+result_store = ResultCache(
+    max_entries=int(os.environ.get('RESULT_STORE_SIZE', 1024)),
+    ttl=float(os.environ.get('RESULT_STORE_TTL', 1800)),
+    disk_path=os.environ.get('RESULT_STORE_DB')
+)
+
+# Coalesces identical in-flight analyses; ANALYSIS_LOCK_DIR extends this
+# across workers on the same host
+inflight = SingleFlight(lock_dir=os.environ.get('ANALYSIS_LOCK_DIR'))
+
+def parse_coordinates(location):
+    """Parse a 'latitude, longitude' string, returning None if it is not one"""
+    try:
+        lat, lon = (float(part) for part in str(location).split(','))
+    except (TypeError, ValueError):
+        return None
+    return valid_coordinates(lat, lon)
+
+def parse_point(point):
+    """Validate a [latitude, longitude] pair of numbers, returning None if it is not one"""
+    if not isinstance(point, (list, tuple)) or len(point) != 2 or not all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in point):
+        return None
+    return valid_coordinates(float(point[0]), float(point[1]))
+
+def valid_coordinates(lat, lon):
+    """(lat, lon) when both are in range, else None"""
+    if not (-90 <= lat <= 90 and -180 <= lon <= 360):
+        return None
+    return lat, lon
+
+# Offline place-name index for the location field, loaded on first use
+gazetteer = None
+
+def get_gazetteer():
+    """Load the gazetteer once per process"""
+    global gazetteer
+    if gazetteer is None:
+        gazetteer = load_gazetteer()
+    return gazetteer
+
+def resolve_location(location):
+    """Coordinates for a 'lat, lon' string or a place name, or None"""
+    coordinates = parse_coordinates(location)
+    if coordinates is None and isinstance(location, str):
+        place = get_gazetteer().resolve(location)
+        if place is not None:
+            coordinates = place['lat'], place['lon']
+    return coordinates
+
+@app.route('/api/geocode')
+def geocode():
+    """Type-ahead place search against the offline gazetteer"""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    return jsonify({
+        'query': query,
+        'results': get_gazetteer().search(query, limit)
+    })
+
 # API endpoint for weather analysis
 @app.route('/api/analyze', methods=['POST'])
 def analyze_weather():
     """
     Analyze weather conditions based on user input
-    In production, this would query actual NASA APIs
+    Probabilities are the share of historical days in the selected window
+    that met each condition. With a region (bbox, GeoJSON polygon or line)
+    instead of a location they are area- or route-weighted over its cells.
     """
     data = request.json
     location = data.get('location')
     date = data.get('date')
     time_range = data.get('timeRange')
     conditions = data.get('conditions', [])
-
-    # Simulate NASA data analysis
-    # In production, integrate with actual NASA APIs:
-    # - GES DISC OPeNDAP for historical data
-    # - Giovanni for data visualization
-    # - Worldview for satellite imagery
-    # - Earthdata Search for comprehensive datasets
+    region = data.get('region')
+
+    index = get_exceedance_index()
+    mask = None
+    if region is not None:
+        try:
+            mask = region_masks.get(index.grid, region)
+        except ValueError as error:
+            return jsonify({'error': f'Invalid region: {error}'}), 400
+        lat, lon = mask.centroid
+    else:
+        coordinates = resolve_location(location)
+        if coordinates is None:
+            return jsonify({'error': f'Could not resolve location: {location}'}), 400
+        lat, lon = coordinates
+    if not isinstance(conditions, list):
+        return jsonify({'error': 'conditions must be a list'}), 400
+    unknown = [str(c) for c in conditions if c not in index.conditions]
+    if unknown:
+        return jsonify({'error': f'Unknown conditions: {", ".join(unknown)}'}), 400
+    thresholds = parse_thresholds(data.get('thresholds'))
+    if thresholds is None:
+        return jsonify({'error': 'thresholds must map condition names to numbers'}), 400
+
+    # Results only depend on the snapped grid cell (or region) and
+    # day-of-year window, so nearby clicks for the same date share one entry
+    try:
+        key = analysis_key(index, lat, lon, date, time_range, conditions, thresholds, mask)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Date must be formatted as YYYY-MM-DD'}), 400
+    analysis = analysis_cache.get(key)
+    if analysis is None:
+        # Identical concurrent requests wait on a single computation
+        analysis = inflight.do(key, lambda: fill_analysis_cache(
+            key, lat, lon, date, time_range, sorted(set(conditions)), thresholds, mask
+        ))
+    exceedance = analysis['exceedance']
 
     probabilities = []
     condition_labels = {
@@ -1059,26 +1526,43 @@ def analyze_weather():
     }
 
     for condition in conditions:
-        # Simulate probability calculation based on historical data
-        probability = random.randint(15, 85)
+        if condition not in exceedance:
+            continue
+        probability = int(round(exceedance[condition]['probability']))
+        threshold = thresholds.get(condition, CONDITIONS[condition][2])
         
-        details = generate_condition_details(condition, probability, date)
+        details = generate_condition_details(condition, probability, date, threshold)
         
         probabilities.append({
             'condition': condition,
             'label': condition_labels.get(condition, condition),
             'probability': probability,
+            'threshold': threshold,
+            'samples': exceedance[condition]['samples'],
             'details': details
         })
-
-    # Generate historical data for charts
-    historical_data = generate_historical_data(date, time_range)
+        if 'max' in exceedance[condition]:
+            # Highest probability of any single cell in the region
+            probabilities[-1]['max'] = int(round(exceedance[condition]['max']))
+
+    # Historical data for charts (labels depend on the exact date)
+    historical_data = {
+        'labels': historical_labels(date, time_range),
+        'temperature': analysis['temperature'],
+        'precipitation': analysis['precipitation']
+    }
 
     result = {
         'location': location,
         'date': date,
         'timeRange': time_range,
         'probabilities': probabilities,
+        'combined': analysis.get('combined'),
+        'region': {
+            'type': mask.kind,
+            'cells': len(mask.cells),
+            'centroid': [round(lat, 4), round(lon, 4)]
+        } if mask else None,
         'historicalData': historical_data,
         'dataSources': [
             'NASA GES DISC',
@@ -1089,99 +1573,795 @@ def analyze_weather():
         'metadata': {
             'generatedAt': datetime.now().isoformat(),
             'dataQuality': 'High',
-            'confidence': '85%'
+            'confidence': '85%',
+            'years': [int(index.years[0]), int(index.years[-1])]
         }
     }
+    result.update(store_result('analysis', dict(result), json.dumps([key, date, location, conditions])))
+
+    # JSON by default; the chart series go as Float32 buffers when asked for
+    return encoded_response(result, [('historicalData', 'temperature'), ('historicalData', 'precipitation')])
+
+def encoded_response(data, paths=()):
+    """Response in the type negotiated from the Accept header"""
+    mimetype = negotiate(request.accept_mimetypes)
+    response = Response(encode(data, mimetype, paths), mimetype=mimetype)
+    response.headers['Vary'] = 'Accept'
+    return response
+
+def json_response(data):
+    """JSON response through the fastest available encoder"""
+    return Response(json_bytes(data), mimetype=JSON)
+
+def parse_thresholds(thresholds):
+    """Custom thresholds that differ from the defaults, or None if malformed"""
+    if not thresholds:
+        return {}
+    if not isinstance(thresholds, dict):
+        return None
+    custom = {}
+    for condition, value in thresholds.items():
+        if condition not in CONDITIONS:
+            return None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        if not math.isfinite(value):
+            return None
+        if value != CONDITIONS[condition][2]:
+            custom[condition] = value
+    return custom
+
+def analysis_key(index, lat, lon, date, time_range, conditions, thresholds=None, mask=None):
+    """Cache key: snapped grid cell or region hash, day-of-year, time range, sorted conditions and custom thresholds"""
+    place = f'region-{mask.key}' if mask else int(index.grid.nearest(lat, lon))
+    start, _ = window_bounds(date, time_range)
+    custom = ','.join(f'{c}={v!r}' for c, v in sorted((thresholds or {}).items()))
+    return f"{place}:{start}:{time_range}:{','.join(sorted(set(conditions)))}:{custom}"
+
+def region_exceedance(mask, date, time_range, conditions, thresholds):
+    """Weighted mean and worst-cell probability of each condition over a region"""
+    index = get_exceedance_index()
+    start, length = window_bounds(date, time_range)
+    hits, total = index.window_counts(mask.cells, start, length)
+    days = (start + np.arange(length)) % DAYS_PER_YEAR
+    result = {}
+    for condition in conditions:
+        if condition in thresholds:
+            cell_hits, cell_total = get_ecdf_index().daily_counts(
+                mask.cells[:, None], days, condition, thresholds[condition]
+            )
+            cell_hits, cell_total = cell_hits.sum(axis=-1), cell_total.sum(axis=-1)
+        elif condition in index.conditions:
+            row = index.conditions.index(condition)
+            cell_hits, cell_total = hits[row], total[row]
+        else:
+            continue
+        probability = 100.0 * cell_hits / np.maximum(cell_total, 1)
+        result[condition] = {
+            'probability': float(probability @ mask.weights),
+            'max': float(probability.max()),
+            'count': int(cell_hits.sum()),
+            'samples': int(cell_total.sum())
+        }
+    return result
+
+def compute_analysis(lat, lon, date, time_range, conditions, thresholds=None, mask=None):
+    """Exceedance probabilities and chart series for one location (or region) and window"""
+    # Exceedance frequencies from the historical daily record
+    # (MERRA-2 / IMERG style grid, see climatology.py and exceedance_index.py);
+    # conditions with custom thresholds are answered from the ECDF index
+    thresholds = thresholds or {}
+    combined = None
+    if mask is not None:
+        exceedance = region_exceedance(mask, date, time_range, conditions, thresholds)
+    else:
+        exceedance = get_exceedance_index().lookup(
+            lat, lon, date, time_range, [c for c in conditions if c not in thresholds]
+        )
+        custom = [c for c in conditions if c in thresholds]
+        if custom:
+            exceedance.update(get_ecdf_index().lookup(lat, lon, date, time_range, custom, thresholds))
+        # AND / OR / conditional probabilities, from bitsets at default thresholds
+        standard = [c for c in conditions if c not in thresholds]
+        if len(standard) > 1:
+            combined = get_cooccurrence().combine(lat, lon, date, time_range, standard)
+    # Chart series at the location, or at the region's weighted centroid
+    historical_data = generate_historical_data(date, time_range, lat, lon)
+    return {
+        'exceedance': exceedance,
+        'combined': combined,
+        'temperature': historical_data['temperature'],
+        'precipitation': historical_data['precipitation']
+    }
+
+def fill_analysis_cache(key, *args):
+    """Compute and cache an analysis unless another caller just did"""
+    # Re-check: the previous leader (possibly in another worker sharing the
+    # disk tier) may have stored the result while we waited
+    analysis = analysis_cache.get(key, count=False)
+    if analysis is None:
+        analysis = compute_analysis(*args)
+        analysis_cache.put(key, analysis)
+    return analysis
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Hit/miss/eviction counters of the analysis cache"""
+    return jsonify(dict(analysis_cache.snapshot(), singleFlight=inflight.snapshot(),
+                        regionMasks=dict(region_masks.stats), resultStore=result_store.snapshot()))
+
+# Upper bound on locations x dates evaluated by one batch request
+MAX_BATCH_ROWS = 100000
+
+def batch_request(data, max_rows=MAX_BATCH_ROWS):
+    """Validated batch parameters, or (None, error message)"""
+    if not isinstance(data, dict):
+        return None, 'Request body must be a JSON object'
+    locations = data.get('locations', [])
+    dates = data.get('dates', [])
+    time_range = data.get('timeRange')
+    conditions = data.get('conditions', [])
+    interpolation = data.get('interpolation', 'nearest')
+
+    if not all(isinstance(value, list) for value in (locations, dates, conditions)):
+        return None, 'locations, dates and conditions must be lists'
+
+    index = get_exceedance_index()
+    if interpolation not in ('nearest', 'bilinear', 'idw'):
+        return None, f'Unknown interpolation: {interpolation}'
+    unknown = [c for c in conditions if c not in index.conditions]
+    if unknown:
+        return None, f'Unknown conditions: {", ".join(unknown)}'
+    if len(locations) * len(dates) > max_rows:
+        return None, f'Batch exceeds {max_rows} location x date rows'
+
+    coordinates = []
+    for location in locations:
+        if isinstance(location, (list, tuple)):
+            point = parse_point(location)
+            if point is None:
+                return None, f'Invalid [lat, lon] point: {location}'
+        else:
+            point = resolve_location(location)
+            if point is None:
+                return None, f'Could not resolve location: {location}'
+        coordinates.append(point)
+
+    try:
+        starts = [window_bounds(date, time_range)[0] for date in dates]
+    except (TypeError, ValueError):
+        return None, 'Dates must be formatted as YYYY-MM-DD'
 
-    return jsonify(result)
+    return {
+        'index': index,
+        'locations': locations,
+        'dates': dates,
+        'timeRange': time_range,
+        'conditions': conditions,
+        'interpolation': interpolation,
+        'points': np.array(coordinates, dtype=np.float64).reshape(-1, 2),
+        'starts': np.array(starts, dtype=np.intp),
+        'length': window_bounds(dates[0], time_range)[1] if dates else 1
+    }, None
+
+def batch_rows(batch, first, last):
+    """Probabilities (conditions, rows) and samples of batch rows [first, last)
+
+    Row r is location r // len(dates) on date r % len(dates).
+    """
+    rows = np.arange(first, last)
+    location, date = np.divmod(rows, len(batch['dates']))
+    return batch['index'].lookup_many(
+        batch['points'][location, 0], batch['points'][location, 1], batch['starts'][date],
+        batch['length'], batch['conditions'], method=batch['interpolation']
+    )
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_weather_batch():
+    """
+    Analyze many locations and dates in one vectorized pass
+    Every location is paired with every date; the response is columnar with
+    one entry per (location, date) row
+    """
+    data = request.get_json(silent=True)
+    batch, error = batch_request(data)
+    if error:
+        return jsonify({'error': error}), 400
+    # Exports re-evaluate the (small) request rather than storing every row
+    return json_response(dict(batch_result(batch), **store_result('batch', data, json.dumps(data, sort_keys=True))))
+
+def batch_result(batch):
+    """Columnar response body of a validated batch"""
+    index = batch['index']
+    n_points, n_dates = len(batch['points']), len(batch['dates'])
+    probabilities, samples = batch_rows(batch, 0, n_points * n_dates)
+
+    columns = {
+        'location': np.repeat(np.arange(n_points), n_dates).tolist(),
+        'date': np.tile(np.arange(n_dates), n_points).tolist(),
+        'samples': samples.tolist()
+    }
+    rounded = np.rint(probabilities).astype(np.int32)
+    for k, condition in enumerate(batch['conditions']):
+        columns[condition] = rounded[k].tolist()
+
+    return {
+        'locations': batch['locations'],
+        'dates': batch['dates'],
+        'timeRange': batch['timeRange'],
+        'conditions': batch['conditions'],
+        'interpolation': batch['interpolation'],
+        'rows': n_points * n_dates,
+        'columns': columns,
+        'metadata': {
+            'generatedAt': datetime.now().isoformat(),
+            'years': [int(index.years[0]), int(index.years[-1])]
+        }
+    }
+
+@app.route('/api/tiles/<condition>/<int:doy>/<int:z>/<int:x>/<int:y>.png')
+def probability_tile(condition, doy, z, x, y):
+    """XYZ PNG tile of a condition's probability for the window starting on a day-of-year"""
+    renderer = get_tile_renderer()
+    interpolation = request.args.get('interpolation', 'nearest')
+    if (condition not in renderer.index.conditions or not 0 <= doy < DAYS_PER_YEAR
+            or not valid_tile(z, x, y) or interpolation not in ('nearest', 'bilinear', 'idw')):
+        return jsonify({'error': 'No such tile'}), 404
+    length = window_length(request.args.get('timeRange', 'day'))
+    png = renderer.tile(condition, doy, length, z, x, y, interpolation)
+    response = Response(png, mimetype='image/png')
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+# Variables returned by /api/series unless others are requested
+SERIES_VARIABLES = ('tmax', 'tmin', 'precip')
+
+def cell_record(name, lat, lon):
+    """(years, full (years, 366) record) of a variable at the nearest cell"""
+    store = get_point_store()
+    if store is not None and name in store.variables:
+        return store.years, store.series(name, lat, lon)
+    climate = get_climatology()
+    i, j = climate.cell_index(lat, lon)
+    return climate.years, climate.cell_series(name, i, j)
+
+def series_request(args):
+    """Validated /api/series parameters, or (None, error message)"""
+    location = args.get('location')
+    variables = [v for v in args.get('variables', ','.join(SERIES_VARIABLES)).split(',') if v]
+    coordinates = resolve_location(location)
+    if coordinates is None:
+        return None, f'Could not resolve location: {location}'
+    unknown = [v for v in variables if v not in UNITS]
+    if unknown:
+        return None, f'Unknown variables: {", ".join(unknown)}'
+    try:
+        start, length = window_bounds(args.get('date'), args.get('timeRange', 'day'))
+    except (TypeError, ValueError):
+        return None, 'Date must be formatted as YYYY-MM-DD'
+    return {
+        'location': location,
+        'date': args.get('date'),
+        'timeRange': args.get('timeRange', 'day'),
+        'variables': variables,
+        'coordinates': coordinates,
+        'days': (start + np.arange(length)) % DAYS_PER_YEAR
+    }, None
+
+def compute_series(series):
+    """Years, per-year values (variables, years), trend fit and fitted lines"""
+    lat, lon = series['coordinates']
+    rows = []
+    for name in series['variables']:
+        years, record = cell_record(name, lat, lon)
+        rows.append(window_aggregate(record, series['days'], name))
+    values = np.vstack(rows)
+    trend = linear_trend(years, values)
+    fitted = trend['intercept'][:, None] + trend['slope'][:, None] * np.asarray(years, dtype=np.float64)
+    return years, values, trend, fitted
+
+@app.route('/api/series')
+def yearly_series():
+    """
+    Year-by-year values of each variable over the selected window
+    Means (totals for precipitation) per year across the full record, with
+    a least-squares linear trend per decade and its two-sided p-value
+    """
+    series, error = series_request(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    variables = series['variables']
+    years, values, trend, fitted = compute_series(series)
+
+    def finite(value, digits):
+        return round(float(value), digits) if np.isfinite(value) else None
+
+    return json_response({
+        'location': series['location'],
+        'date': series['date'],
+        'timeRange': series['timeRange'],
+        'years': [int(y) for y in years],
+        'series': {
+            name: [finite(v, 2) for v in values[k]] for k, name in enumerate(variables)
+        },
+        'units': {name: UNITS[name] for name in variables},
+        'trends': {
+            name: {
+                'slopePerDecade': finite(10 * trend['slope'][k], 3),
+                'intercept': finite(trend['intercept'][k], 3),
+                'rSquared': finite(trend['rSquared'][k], 3),
+                'pValue': finite(trend['pValue'][k], 4),
+                'significant': bool(trend['pValue'][k] < SIGNIFICANCE_LEVEL),
+                'years': int(trend['n'][k]),
+                'fitted': [finite(v, 2) for v in fitted[k]]
+            } for k, name in enumerate(variables)
+        },
+        'metadata': {
+            'generatedAt': datetime.now().isoformat(),
+            'source': 'point store' if get_point_store() else 'climatology'
+        }
+    })
+
+# Default number of ranked windows returned by /api/best-dates
+BEST_DATES_TOP = 10
+
+@app.route('/api/best-dates', methods=['POST'])
+def best_dates():
+    """
+    Rank every start day of the year for a location
+    All 366 windows are scored in one vectorized pass over the precomputed
+    indexes: the score is the weighted mean probability of the selected
+    conditions, so lower is better. A negative weight rewards a condition.
+    """
+    data = request.json
+    location = data.get('location')
+    time_range = data.get('timeRange', 'day')
+    conditions = data.get('conditions', [])
+    weights = data.get('weights') or {}
+    spacing = data.get('spacing', 0)
+    top = data.get('top', BEST_DATES_TOP)
+
+    coordinates = resolve_location(location)
+    if coordinates is None:
+        return jsonify({'error': f'Could not resolve location: {location}'}), 400
+    lat, lon = coordinates
+    index = get_exceedance_index()
+    unknown = [c for c in conditions if c not in index.conditions]
+    if not conditions or unknown:
+        return jsonify({'error': f'Unknown conditions: {", ".join(unknown) or "none selected"}'}), 400
+    thresholds = parse_thresholds(data.get('thresholds'))
+    if thresholds is None:
+        return jsonify({'error': 'thresholds must map condition names to numbers'}), 400
+    try:
+        weight = np.array([float(weights.get(c, 1.0)) for c in conditions])
+        top = min(max(int(top), 1), DAYS_PER_YEAR)
+        spacing = max(int(spacing), 0)
+        year = int(data.get('year', datetime.now().year))
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({'error': 'weights, top, spacing and year must be numbers'}), 400
+    if not np.all(np.isfinite(weight)) or not np.abs(weight).sum():
+        return jsonify({'error': 'weights must be finite and not all zero'}), 400
+
+    # (conditions, 366) probabilities for windows starting on every day
+    length = window_length(time_range)
+    cell = int(index.grid.nearest(lat, lon))
+    hits, samples = index.window_counts(np.full(DAYS_PER_YEAR, cell), np.arange(DAYS_PER_YEAR), length)
+    rows = [index.conditions.index(c) for c in conditions]
+    hits, samples = hits[rows], samples[rows]
+    for k, condition in enumerate(conditions):
+        if condition in thresholds:
+            hits[k], samples[k] = get_ecdf_index().all_windows(
+                cell, length, condition, thresholds[condition]
+            )
+    probabilities = 100.0 * hits / np.maximum(samples, 1)
+    scores = weight @ probabilities / np.abs(weight).sum()
+
+    # Best first; Feb 29 only exists in leap years, and windows closer than
+    # spacing days to a better one are skipped
+    ranked = []
+    for doy in np.argsort(scores, kind='stable'):
+        start = doy_to_date(doy, year)
+        if start is None:
+            continue
+        gap = [min(abs(doy - d), DAYS_PER_YEAR - abs(doy - d)) for d, _ in ranked]
+        if spacing and gap and min(gap) < spacing:
+            continue
+        ranked.append((int(doy), start))
+        if len(ranked) == top:
+            break
+
+    return jsonify({
+        'location': location,
+        'timeRange': time_range,
+        'windowDays': length,
+        'year': year,
+        'conditions': conditions,
+        'weights': dict(zip(conditions, weight.tolist())),
+        'thresholds': {c: thresholds.get(c, CONDITIONS[c][2]) for c in conditions},
+        'dates': [{
+            'date': start.strftime('%Y-%m-%d'),
+            'end': (start + timedelta(days=length - 1)).strftime('%Y-%m-%d'),
+            'score': round(float(scores[doy]), 1),
+            'probabilities': {c: round(float(probabilities[k, doy]), 1) for k, c in enumerate(conditions)},
+            'samples': int(samples[:, doy].min())
+        } for doy, start in ranked],
+        'metadata': {
+            'generatedAt': datetime.now().isoformat(),
+            'years': [int(index.years[0]), int(index.years[-1])]
+        }
+    })
 
-def generate_condition_details(condition, probability, date):
+def generate_condition_details(condition, probability, date, threshold=None):
     """Generate detailed explanation for each condition"""
+    if threshold is None:
+        threshold = CONDITIONS[condition][2] if condition in CONDITIONS else 0
     details_map = {
-        'hot': f"Based on {probability}% historical occurrence of temperatures exceeding 90°F. Heat index may reach dangerous levels.",
-        'cold': f"Historical data shows {probability}% probability of temperatures below 32°F. Frost and ice conditions likely.",
-        'windy': f"{probability}% chance of sustained winds exceeding 25 mph. May affect outdoor activities significantly.",
-        'wet': f"Precipitation probability of {probability}% with potential for over 1 inch of rainfall. Plan for wet conditions.",
-        'uncomfortable': f"{probability}% likelihood of high humidity (>70%) combined with temperature. Heat index will feel higher."
+        'hot': f"Based on {probability}% historical occurrence of temperatures exceeding {threshold:g}°F. Heat index may reach dangerous levels.",
+        'cold': f"Historical data shows {probability}% probability of temperatures below {threshold:g}°F. Frost and ice conditions likely.",
+        'windy': f"{probability}% chance of sustained winds exceeding {threshold:g} mph. May affect outdoor activities significantly.",
+        'wet': f"Precipitation probability of {probability}% with potential for over {threshold:g} inch of rainfall. Plan for wet conditions.",
+        'uncomfortable': f"{probability}% likelihood of a heat index above {threshold:g}°F from heat and humidity combined."
     }
     return details_map.get(condition, f"{probability}% probability based on historical data")
 
-def generate_historical_data(date, time_range):
-    """Generate simulated historical weather data"""
+def period_sizes(length, num_points):
+    """Split a window of length days into num_points consecutive periods"""
+    sizes = np.full(num_points, length // num_points)
+    sizes[:length % num_points] += 1
+    return sizes
+
+def historical_labels(date, time_range):
+    """Chart labels for the historical data series"""
     # Parse date
     target_date = datetime.strptime(date, '%Y-%m-%d')
     
     # Generate labels based on time range
     if time_range == 'day':
-        labels = [f"{i}:00" for i in range(0, 24, 3)]
-        num_points = 8
+        return [f"{i}:00" for i in range(0, 24, 3)]
     elif time_range == 'week':
-        labels = [(target_date + timedelta(days=i)).strftime('%a') for i in range(7)]
-        num_points = 7
+        return [(target_date + timedelta(days=i)).strftime('%a') for i in range(7)]
     elif time_range == 'month':
-        labels = [f"Week {i+1}" for i in range(4)]
-        num_points = 4
-    else:  # season
-        labels = ['Month 1', 'Month 2', 'Month 3']
-        num_points = 3
-
-    # Generate temperature data (40-95°F range)
-    temperature = [random.randint(40, 95) for _ in range(num_points)]
-    
-    # Generate precipitation data (0-3 inches)
-    precipitation = [round(random.uniform(0, 3), 2) for _ in range(num_points)]
+        return [f"Week {i+1}" for i in range(4)]
+    elif time_range == 'season':
+        return ['Month 1', 'Month 2', 'Month 3']
+    else:  # custom number of days, labelled by period start date
+        length = window_length(time_range)
+        sizes = period_sizes(length, min(length, 8))
+        offsets = np.cumsum(sizes) - sizes
+        return [(target_date + timedelta(days=int(d))).strftime('%b %d') for d in offsets]
+
+def generate_historical_data(date, time_range, lat, lon):
+    """Average temperature and precipitation for the window across all years"""
+    labels = historical_labels(date, time_range)
+    num_points = len(labels)
+
+    # Every aggregate is a difference of two prefix sums (see window_sums.py)
+    sums = get_window_sums()
+    cell = sums.cell(lat, lon)
+    start, length = window_bounds(date, time_range)
+
+    if time_range == 'day':
+        # Daily record only has extremes: sketch the diurnal cycle between
+        # the mean minimum (around 3:00) and mean maximum (around 15:00)
+        low = sums.mean('tmin', cell, start, 1)
+        high = sums.mean('tmax', cell, start, 1)
+        hours = np.arange(0, 24, 3)
+        temperature = low + (high - low) * (1 + np.cos(np.pi * (hours - 15) / 12)) / 2
+        precipitation = np.full(num_points, sums.mean('precip', cell, start, 1) / num_points)
+    else:
+        # All periods of the window evaluated in one vectorized call
+        sizes = period_sizes(length, num_points)
+        starts = (start + np.cumsum(sizes) - sizes) % DAYS_PER_YEAR
+        temperature = (sums.mean('tmax', cell, starts, sizes) +
+                       sums.mean('tmin', cell, starts, sizes)) / 2
+        # Mean over years of the total precipitation in each period
+        precipitation = sums.mean('precip', cell, starts, sizes) * sizes
 
     return {
         'labels': labels,
-        'temperature': temperature,
-        'precipitation': precipitation
+        'temperature': [round(float(t), 1) for t in temperature],
+        'precipitation': [round(float(p), 2) for p in precipitation]
     }
 
-@app.route('/api/download/csv', methods=['POST'])
-def download_csv():
-    """Generate CSV file from analysis results"""
-    data = request.json
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write headers
-    writer.writerow(['Weather Analysis Report'])
-    writer.writerow(['Location', data['location']])
-    writer.writerow(['Date', data['date']])
-    writer.writerow(['Time Range', data['timeRange']])
-    writer.writerow([])
-    
-    # Write probabilities
-    writer.writerow(['Condition', 'Probability (%)', 'Details'])
+# Rows encoded per chunk of a streamed CSV download
+CSV_CHUNK_ROWS = 1024
+
+# Batch rows evaluated per lookup while streaming, and the export row limit
+EXPORT_CHUNK_ROWS = 8192
+MAX_EXPORT_ROWS = 10_000_000
+
+def stream_csv(rows):
+    """Encode rows as CSV bytes a chunk at a time, so memory stays constant"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+def csv_response(rows, name):
+    """Chunked text/csv attachment streamed from a row generator"""
+    response = Response(stream_csv(rows), mimetype='text/csv')
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename={name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    )
+    return response
+
+def report_rows(data):
+    """Rows of the analysis report CSV"""
+    yield ['Weather Analysis Report']
+    yield ['Location', data['location']]
+    yield ['Date', data['date']]
+    yield ['Time Range', data['timeRange']]
+    yield []
+
+    yield ['Condition', 'Probability (%)', 'Details']
     for prob in data['probabilities']:
-        writer.writerow([prob['label'], prob['probability'], prob['details']])
-    
-    writer.writerow([])
-    
-    # Write historical data
-    writer.writerow(['Historical Data'])
-    writer.writerow(['Period', 'Temperature (°F)', 'Precipitation (inches)'])
+        yield [prob['label'], prob['probability'], prob['details']]
+    yield []
+
+    yield ['Historical Data']
+    yield ['Period', 'Temperature (°F)', 'Precipitation (inches)']
     for i, label in enumerate(data['historicalData']['labels']):
-        writer.writerow([
+        yield [
             label,
             data['historicalData']['temperature'][i],
             data['historicalData']['precipitation'][i]
-        ])
-    
-    # Create response
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode()),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'weather_analysis_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        ]
+
+def report_error(data):
+    """Why an uploaded analysis result cannot be turned into a report, or None
+
+    Rows are only generated once the response has started streaming, so the
+    payload is checked up front.
+    """
+    if not isinstance(data, dict):
+        return 'Request body must be an analysis result object'
+    missing = [key for key in ('location', 'date', 'timeRange', 'probabilities', 'historicalData')
+               if key not in data]
+    if missing:
+        return f'Missing fields: {", ".join(missing)}'
+    probabilities = data['probabilities']
+    if not isinstance(probabilities, list) or not all(
+            isinstance(prob, dict) and {'label', 'probability', 'details'} <= prob.keys()
+            for prob in probabilities):
+        return 'probabilities must be a list of {label, probability, details} objects'
+    historical = data['historicalData']
+    if not isinstance(historical, dict) or not all(
+            isinstance(historical.get(key), list) for key in ('labels', 'temperature', 'precipitation')):
+        return 'historicalData must have labels, temperature and precipitation lists'
+    if min(len(historical['temperature']), len(historical['precipitation'])) < len(historical['labels']):
+        return 'historicalData series are shorter than its labels'
+    return None
+
+@app.route('/api/download/csv', methods=['POST'])
+def download_csv():
+    """Generate CSV file from analysis results"""
+    data = request.get_json(silent=True)
+    error = report_error(data)
+    if error:
+        return jsonify({'error': error}), 400
+    return csv_response(report_rows(data), 'weather_analysis')
+
+def batch_csv_rows(batch):
+    """Header and one row per (location, date), evaluated a chunk at a time"""
+    labels = [', '.join(str(v) for v in location) if isinstance(location, (list, tuple)) else location
+              for location in batch['locations']]
+    yield ['location', 'date', 'samples'] + batch['conditions']
+    n_dates = len(batch['dates'])
+    total = len(batch['points']) * n_dates
+    for first in range(0, total, EXPORT_CHUNK_ROWS):
+        last = min(first + EXPORT_CHUNK_ROWS, total)
+        probabilities, samples = batch_rows(batch, first, last)
+        rounded = np.rint(probabilities).astype(np.int32).T.tolist()
+        for offset, (count, values) in enumerate(zip(samples.tolist(), rounded)):
+            location, date = divmod(first + offset, n_dates)
+            yield [labels[location], batch['dates'][date], count] + values
+
+@app.route('/api/download/batch', methods=['POST'])
+def download_batch():
+    """Batch analysis (same payload as /api/analyze/batch) streamed as CSV"""
+    batch, error = batch_request(request.get_json(silent=True), max_rows=MAX_EXPORT_ROWS)
+    if error:
+        return jsonify({'error': error}), 400
+    fmt = request.args.get('format', 'csv')
+    if fmt in EXPORT_FORMATS:
+        return columnar_response(lambda: batch_table(batch), fmt, 'weather_batch')
+    return csv_response(batch_csv_rows(batch), 'weather_batch')
+
+def series_csv_rows(series):
+    """Per-year rows followed by the trend of each variable"""
+    years, values, trend, _ = compute_series(series)
+    variables = series['variables']
+    yield ['Year'] + [f'{name} ({UNITS[name]})' for name in variables]
+    for k, year in enumerate(years):
+        yield [int(year)] + [round(float(v), 2) if np.isfinite(v) else '' for v in values[:, k]]
+    yield []
+    yield ['Trend per decade'] + [round(float(10 * v), 3) if np.isfinite(v) else '' for v in trend['slope']]
+    yield ['p-value'] + [round(float(v), 4) if np.isfinite(v) else '' for v in trend['pValue']]
+
+@app.route('/api/download/series')
+def download_series():
+    """Year-by-year record (same parameters as /api/series) streamed as CSV"""
+    series, error = series_request(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    fmt = request.args.get('format', 'csv')
+    if fmt in EXPORT_FORMATS:
+        return columnar_response(lambda: series_table(series), fmt, 'weather_series')
+    return csv_response(series_csv_rows(series), 'weather_series')
+
+def batch_table(batch):
+    """Batch rows as a columnar table, evaluated a row group at a time
+
+    Probabilities are kept unrounded as float64, straight from the lookup.
+    """
+    n_dates = len(batch['dates'])
+    total = len(batch['points']) * n_dates
+
+    def groups():
+        for first in range(0, total, EXPORT_CHUNK_ROWS):
+            last = min(first + EXPORT_CHUNK_ROWS, total)
+            probabilities, samples = batch_rows(batch, first, last)
+            location, date = np.divmod(np.arange(first, last), n_dates)
+            group = {'location': location, 'date': date, 'samples': samples}
+            group.update(zip(batch['conditions'], probabilities))
+            yield group
+
+    labels = [', '.join(str(v) for v in location) if isinstance(location, (list, tuple)) else location
+              for location in batch['locations']]
+    return ColumnTable(
+        [('location', np.int32), ('date', np.int32), ('samples', np.int32)] +
+        [(condition, np.float64) for condition in batch['conditions']],
+        groups,
+        labels={'location': labels, 'date': batch['dates']},
+        attributes={'timeRange': batch['timeRange'], 'interpolation': batch['interpolation'],
+                    'units': 'probability in percent of historical days'}
+    )
+
+def series_table(series):
+    """Per-year values with each variable's trend in the file metadata"""
+    years, values, trend, _ = compute_series(series)
+    variables = series['variables']
+    attributes = {'location': series['location'], 'date': series['date'], 'timeRange': series['timeRange']}
+    for k, name in enumerate(variables):
+        attributes[f'{name}_units'] = UNITS[name]
+        attributes[f'{name}_slope_per_decade'] = 10 * trend['slope'][k]
+        attributes[f'{name}_p_value'] = trend['pValue'][k]
+    group = dict(zip(variables, values), year=np.asarray(years))
+    return ColumnTable([('year', np.int32)] + [(name, np.float64) for name in variables],
+                       lambda: [group], attributes=attributes)
+
+def analysis_table(data):
+    """Chart series of an analysis report, with its probabilities as metadata"""
+    historical = data['historicalData']
+    attributes = {'location': data['location'], 'date': data['date'], 'timeRange': data['timeRange']}
+    for prob in data['probabilities']:
+        attributes[f'{prob["condition"]}_probability'] = prob['probability']
+        attributes[f'{prob["condition"]}_threshold'] = prob['threshold']
+    group = {
+        'period': np.arange(len(historical['labels'])),
+        'temperature': np.asarray(historical['temperature'], dtype=np.float64),
+        'precipitation': np.asarray(historical['precipitation'], dtype=np.float64)
+    }
+    return ColumnTable([('period', np.int32), ('temperature', np.float64), ('precipitation', np.float64)],
+                       lambda: [group], labels={'period': historical['labels']}, attributes=attributes)
+
+def columnar_response(make_table, fmt, name):
+    """Arrow / Parquet / NetCDF attachment streamed a row group at a time"""
+    try:
+        require(fmt)
+    except RuntimeError as error:
+        return jsonify({'error': str(error)}), 501
+    response = Response(stream_table(make_table(), fmt), mimetype=EXPORT_FORMATS[fmt][0])
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename={name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{fmt}'
+    )
+    return response
+
+def store_result(kind, payload, request_key):
+    """Keep an analysis result or batch request under an id
+
+    The id is a hash of the normalized request, so repeating a request (an
+    analysis cache hit) finds its result already stored and writes nothing.
+    Returns the id and export URLs to merge into the response.
+    """
+    result_id = hashlib.sha256(f'{kind}\0{request_key}'.encode()).hexdigest()[:20]
+    if result_store.get(result_id, count=False) is None:
+        result_store.put(result_id, {'kind': kind, 'payload': payload})
+    return {
+        'resultId': result_id,
+        'exports': {fmt: f'/api/results/{result_id}.{fmt}' for fmt in RESULT_FORMATS}
+    }
+
+def analysis_export(payload, fmt):
+    if fmt in EXPORT_FORMATS:
+        return columnar_response(lambda: analysis_table(payload), fmt, 'weather_analysis')
+    if fmt == 'csv':
+        return csv_response(report_rows(payload), 'weather_analysis')
+    return json_attachment(payload, 'weather_analysis')
+
+def batch_export(payload, fmt):
+    batch, error = batch_request(payload, max_rows=MAX_EXPORT_ROWS)
+    if error:
+        return jsonify({'error': error}), 400
+    if fmt in EXPORT_FORMATS:
+        return columnar_response(lambda: batch_table(batch), fmt, 'weather_batch')
+    if fmt == 'csv':
+        return csv_response(batch_csv_rows(batch), 'weather_batch')
+    return json_attachment(batch_result(batch), 'weather_batch')
+
+def json_attachment(data, name):
+    response = Response(json.dumps(data), mimetype='application/json')
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename={name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
     )
+    return response
+
+# Export builders per stored result kind, and the formats they offer
+# (columnar ones only when pyarrow / netCDF4 are installed)
+RESULT_EXPORTS = {'analysis': analysis_export, 'batch': batch_export}
+RESULT_FORMATS = ('csv', 'json') + tuple(available_formats())
+
+@app.route('/api/results/<result_id>.<fmt>')
+def stored_result(result_id, fmt):
+    """Export a stored result; the content behind an id never changes"""
+    if fmt not in RESULT_FORMATS:
+        return jsonify({'error': f'Unknown format: {fmt}'}), 404
+    stored = result_store.get(result_id)
+    if stored is None:
+        return jsonify({'error': 'Result not found or expired'}), 404
+    etag = f'{result_id}.{fmt}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = RESULT_EXPORTS[stored['kind']](stored['payload'], fmt)
+        if isinstance(response, tuple):
+            return response
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={int(result_store.ttl)}'
+    return response
+
+# The page is static: rendered once per process, split into fingerprinted
+# assets (see assets.py) and served from memory, pre-compressed, with strong
+# ETags. Vendored libraries are read from STATIC_VENDOR_DIR.
+index_page = None
+asset_files = None
+
+def get_index_page():
+    """Render, bundle and compress the main page and its assets once per process"""
+    global index_page, asset_files
+    if index_page is None:
+        vendor_dir = os.environ.get('STATIC_VENDOR_DIR', os.path.join(os.path.dirname(__file__), 'vendor'))
+        bundle = build_bundle(render_template_string(HTML_TEMPLATE), vendor_dir)
+        asset_files = {
+            name: PrecompressedBody(data, asset_mimetype(name), IMMUTABLE, compress=compressible(name))
+            for name, data in bundle.files.items()
+        }
+        index_page = PrecompressedBody(
+            bundle.html, 'text/html',
+            cache_control=os.environ.get('INDEX_CACHE_CONTROL', 'public, max-age=0, must-revalidate')
+        )
+    return index_page
 
 @app.route('/')
 def index():
-    """Render main application page"""
-    return render_template_string(HTML_TEMPLATE)
+    """Serve the main application page"""
+    return get_index_page().response(request)
+
+@app.route('/assets/<path:name>')
+def asset(name):
+    """Serve a fingerprinted asset of the page"""
+    get_index_page()
+    body = asset_files.get(name)
+    if body is None:
+        return jsonify({'error': 'Unknown asset'}), 404
+    return body.response(request)
 
 if __name__ == '__main__':
     print("=" * 60)
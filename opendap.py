@@ -0,0 +1,216 @@
+"""
+Async GES DISC OPeNDAP subset fetcher
+Requests only the lat/lon/time hyperslabs we need as DAP2 binary (.dods),
+over a pooled aiohttp session with bounded parallelism and retry/backoff,
+writing every slab through to the on-disk chunk cache (chunk_cache.py).
+
+Benchmark against the bundled stand-in server (opendap_standin.py) with:
+    python opendap.py bench --days 365
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import time
+from datetime import date as date_cls, timedelta
+from urllib.parse import quote
+
+import numpy as np
+
+from chunk_cache import ChunkCache
+
+try:
+    import aiohttp
+except ImportError:  # Only needed when actually fetching
+    aiohttp = None
+
+# MERRA-2 daily single-level diagnostics on GES DISC
+MERRA2_DAILY_URL = (
+    'https://goldsmr4.gesdisc.eosdis.nasa.gov/opendap/MERRA2/M2SDNXSLV.5.12.4/'
+    '%Y/%m/MERRA2_400.statD_2d_slv_Nx.%Y%m%d.nc4'
+)
+
+# HTTP statuses worth retrying; other 4xx responses fail immediately
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# XDR encodings of DAP2 atomic types (Int16 travels as a 32-bit integer)
+DAP_TYPES = {
+    'Float32': '>f4',
+    'Float64': '>f8',
+    'Int32': '>i4',
+    'UInt32': '>u4',
+    'Int16': '>i4',
+    'UInt16': '>u4'
+}
+
+_DECLARATION = re.compile(r'(\w+)\s+(\w+)((?:\[\s*\w+\s*=\s*\d+\s*\])+)\s*;')
+_DIMENSION = re.compile(r'=\s*(\d+)')
+
+
+class Hyperslab:
+    """Inclusive index ranges of one variable within a granule"""
+
+    def __init__(self, variable, lat, lon, time=(0, 0)):
+        self.variable = variable
+        self.time = tuple(time)
+        self.lat = tuple(lat)
+        self.lon = tuple(lon)
+
+    def constraint(self):
+        """DAP2 constraint expression, e.g. T2MMAX[0:0][10:20][30:40]"""
+        return self.variable + ''.join(f'[{start}:{stop}]' for start, stop in (self.time, self.lat, self.lon))
+
+    def chunk(self):
+        """Chunk coordinates used as part of the cache key"""
+        return self.time + self.lat + self.lon
+
+
+def parse_dods(payload):
+    """Decode the first array of a DAP2 .dods response into a NumPy array"""
+    separator = payload.find(b'\nData:\n')
+    if separator < 0:
+        raise ValueError('Not a DAP2 data response')
+    dds = payload[:separator].decode('ascii', 'replace')
+    match = _DECLARATION.search(dds)
+    if match is None or match.group(1) not in DAP_TYPES:
+        raise ValueError('No supported array in DAP2 response')
+
+    shape = tuple(int(n) for n in _DIMENSION.findall(match.group(3)))
+    offset = separator + len(b'\nData:\n')
+    count, repeated = np.frombuffer(payload, dtype='>u4', count=2, offset=offset)
+    if count != repeated or count != int(np.prod(shape)):
+        raise ValueError('Corrupt DAP2 array length')
+    values = np.frombuffer(payload, dtype=DAP_TYPES[match.group(1)], count=count, offset=offset + 8)
+    return values.astype(np.float32).reshape(shape)
+
+
+class OpendapFetcher:
+    """Fetch hyperslabs from daily granules with pooling, limits and retries"""
+
+    def __init__(self, granule_url=MERRA2_DAILY_URL, dataset='M2SDNXSLV', version='5.12.4',
+                 max_concurrency=8, retries=4, backoff=0.5, timeout=60, cache=None, auth=None):
+        if aiohttp is None:
+            raise RuntimeError('aiohttp is required to fetch from OPeNDAP')
+        self.granule_url = granule_url
+        self.dataset = dataset
+        self.version = version
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = ChunkCache(cache) if isinstance(cache, str) else cache
+        self.auth = auth
+        self.stats = {'requests': 0, 'retries': 0, 'bytes': 0}
+
+    def url(self, day, slab):
+        granule = day.strftime(self.granule_url)
+        return f"{granule}.dods?{quote(slab.constraint(), safe=':')}"
+
+    def _cache_read(self, day, slab):
+        if self.cache is None:
+            return None
+        chunk = (f'{day:%Y%m%d}',) + slab.chunk()
+        return self.cache.get(self.dataset, slab.variable, chunk, self.version)
+
+    def _cache_write(self, day, slab, values):
+        if self.cache is not None:
+            chunk = (f'{day:%Y%m%d}',) + slab.chunk()
+            self.cache.put(self.dataset, slab.variable, chunk, self.version, values)
+
+    async def _get(self, session, semaphore, url):
+        """GET with exponential backoff and jitter on transient failures"""
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    self.stats['requests'] += 1
+                    async with session.get(url) as response:
+                        response.raise_for_status()
+                        payload = await response.read()
+                        self.stats['bytes'] += len(payload)
+                        return payload
+            except aiohttp.ClientResponseError as error:
+                if error.status not in RETRY_STATUSES or attempt == self.retries:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            self.stats['retries'] += 1
+            await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    async def fetch_slab(self, session, semaphore, day, slab):
+        values = self._cache_read(day, slab)
+        if values is None:
+            values = parse_dods(await self._get(session, semaphore, self.url(day, slab)))
+            self._cache_write(day, slab, values)
+        return values
+
+    async def fetch_days(self, days, slab):
+        """Fetch the same hyperslab from every day's granule concurrently"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         auth=self.auth, trust_env=True) as session:
+            slabs = await asyncio.gather(*(
+                self.fetch_slab(session, semaphore, day, slab) for day in days
+            ))
+        # Each daily granule holds one time step; stack along time
+        return np.concatenate(slabs, axis=0)
+
+    def fetch_range(self, start, end, slab):
+        """Blocking helper: hyperslab for every day from start to end inclusive"""
+        days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+        return asyncio.run(self.fetch_days(days, slab))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fetch or benchmark OPeNDAP hyperslabs')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fetch = commands.add_parser('fetch', help='Fetch a hyperslab for a date range')
+    fetch.add_argument('--url', default=MERRA2_DAILY_URL, help='strftime granule URL template')
+    fetch.add_argument('--variable', required=True)
+    fetch.add_argument('--lat', type=int, nargs=2, required=True, metavar=('START', 'STOP'))
+    fetch.add_argument('--lon', type=int, nargs=2, required=True, metavar=('START', 'STOP'))
+    fetch.add_argument('--start', required=True, help='YYYY-MM-DD')
+    fetch.add_argument('--end', required=True, help='YYYY-MM-DD')
+    fetch.add_argument('--cache-dir', help='Chunk cache directory')
+    fetch.add_argument('--cache-bytes', type=int, default=2 * 2**30, help='Chunk cache byte budget')
+    fetch.add_argument('--output', required=True, help='.npy file to write')
+
+    bench = commands.add_parser('bench', help='Measure throughput against the stand-in server')
+    bench.add_argument('--days', type=int, default=365)
+    bench.add_argument('--concurrency', type=int, default=16)
+
+    args = parser.parse_args(argv)
+    if args.command == 'fetch':
+        cache = ChunkCache(args.cache_dir, args.cache_bytes) if args.cache_dir else None
+        fetcher = OpendapFetcher(args.url, cache=cache)
+        slab = Hyperslab(args.variable, args.lat, args.lon)
+        values = fetcher.fetch_range(date_cls.fromisoformat(args.start),
+                                     date_cls.fromisoformat(args.end), slab)
+        np.save(args.output, values)
+        print(f'Fetched {values.shape} in {fetcher.stats["requests"]} requests')
+        if cache is not None:
+            print(f'Chunk cache: {cache.snapshot()}')
+    else:
+        from opendap_standin import start_standin
+
+        server, base_url = start_standin()
+        try:
+            fetcher = OpendapFetcher(base_url + '/%Y%m%d.nc4', dataset='standin',
+                                     max_concurrency=args.concurrency)
+            slab = Hyperslab('T2MMAX', (0, 17), (0, 35))
+            first = date_cls(int(server.climate.years[0]), 1, 1)
+            started = time.perf_counter()
+            values = fetcher.fetch_range(first, first + timedelta(days=args.days - 1), slab)
+            elapsed = time.perf_counter() - started
+        finally:
+            server.shutdown()
+        print(f'{len(values)} granules, {fetcher.stats["bytes"] / 2**20:.1f} MiB in {elapsed:.2f}s: '
+              f'{len(values) / elapsed:.0f} req/s, {fetcher.stats["bytes"] / 2**20 / elapsed:.1f} MiB/s')
+
+
+if __name__ == '__main__':
+    main()
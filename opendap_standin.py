@@ -0,0 +1,122 @@
+"""
+Local stand-in for a GES DISC OPeNDAP server
+Serves the climatology dataset as daily DAP2 granules so the fetcher can be
+tested and benchmarked offline. Granules live at /<YYYYMMDD>.nc4 and answer
+.dds and .dods requests with hyperslab constraints, e.g.
+    /20200101.nc4.dods?T2MMAX[0:0][10:20][30:40]
+
+Run standalone with:
+    python opendap_standin.py --port 8765
+"""
+
+import argparse
+import re
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import numpy as np
+
+from climatology import VARIABLE_ALIASES, date_to_doy, load_dataset
+
+# Served variable name -> climatology variable (MERRA-2 names first)
+SERVED_VARIABLES = {aliases[1]: name for name, aliases in VARIABLE_ALIASES.items()}
+
+_GRANULE = re.compile(r'^/(\d{8})\.nc4\.(dds|dods)$')
+_SLICE = re.compile(r'\[(\d+)(?::(\d+))?(?::(\d+))?\]')
+
+
+def _slices(constraint):
+    """[start:stop] or [start:stride:stop] ranges as Python slices"""
+    slices = []
+    for start, second, third in _SLICE.findall(constraint):
+        start = int(start)
+        if third:
+            slices.append(slice(start, int(third) + 1, int(second)))
+        elif second:
+            slices.append(slice(start, int(second) + 1))
+        else:
+            slices.append(slice(start, start + 1))
+    return tuple(slices)
+
+
+def _dds(granule, name, dap_type, dims):
+    shape = ''.join(f'[{dim} = {size}]' for dim, size in dims)
+    return f'Dataset {{\n    {dap_type} {name}{shape};\n}} {granule};\n'
+
+
+def _xdr_array(values, dtype):
+    count = np.array([values.size, values.size], dtype='>u4')
+    return count.tobytes() + np.ascontiguousarray(values, dtype=dtype).tobytes()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        match = _GRANULE.match(path)
+        if match is None:
+            return self._send(404, b'Unknown granule')
+        day = datetime.strptime(match.group(1), '%Y%m%d')
+        climate = self.server.climate
+        years = climate.years.tolist()
+        if day.year not in years:
+            return self._send(404, b'No granule for that date')
+
+        constraint = unquote(query)
+        name = constraint.split('[', 1)[0] or 'T2MMAX'
+        if name in ('lat', 'lon'):
+            values = getattr(climate, name)[_slices(constraint)]
+            dims = [(name, values.size)]
+            dap_type, dtype = 'Float64', '>f8'
+        elif name in SERVED_VARIABLES:
+            field = climate.variables[SERVED_VARIABLES[name]]
+            # One time step per daily granule
+            values = field[years.index(day.year), date_to_doy(day)][None]
+            values = values[_slices(constraint) or (slice(None),) * 3]
+            dims = list(zip(('time', 'lat', 'lon'), values.shape))
+            dap_type, dtype = 'Float32', '>f4'
+        else:
+            return self._send(404, f'Unknown variable {name}'.encode())
+
+        dds = _dds(f'{match.group(1)}.nc4', name, dap_type, dims).encode()
+        if match.group(2) == 'dds':
+            return self._send(200, dds, 'text/plain')
+        self._send(200, dds + b'\nData:\n' + _xdr_array(values, dtype), 'application/octet-stream')
+
+    def _send(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_standin(host='127.0.0.1', port=0, climate=None):
+    """Start the stand-in server on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.daemon_threads = True
+    server.climate = climate or load_dataset()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the climatology as a stand-in OPeNDAP server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), StandInHandler)
+    server.climate = load_dataset()
+    print(f'Serving {server.climate.source} granules on http://{args.host}:{args.port}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Point-major columnar store
+The daily record re-chunked so that the full multi-decade series of one grid
+cell is a single contiguous read. Written by ingest.py.
+
+Layout:
+    store.json                      grid, years, variables and block size
+    <variable>/<row>_<col>.npy      float32 (block_lat, block_lon, years, 366)
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+from spatial import make_grid
+
+STORE_VERSION = 1
+MANIFEST = 'store.json'
+
+
+def block_path(root, variable, block_row, block_col):
+    return os.path.join(root, variable, f'{block_row:04d}_{block_col:04d}.npy')
+
+
+def write_manifest(root, lat, lon, years, variables, block, discomfort='heat_index'):
+    """Create the store directory and its manifest"""
+    os.makedirs(root, exist_ok=True)
+    manifest = {
+        'version': STORE_VERSION,
+        'lat': [float(v) for v in lat],
+        'lon': [float(v) for v in lon],
+        'years': [int(y) for y in years],
+        'variables': list(variables),
+        'block': list(block),
+        'discomfort': discomfort
+    }
+    tmp_path = os.path.join(root, f'{MANIFEST}.tmp{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(root, MANIFEST))
+    return manifest
+
+
+def read_manifest(root):
+    with open(os.path.join(root, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest['version'] != STORE_VERSION:
+        raise ValueError(f'Unsupported point store version in {root}')
+    return manifest
+
+
+class PointStore:
+    """Read-only access to cell series through memory-mapped block files"""
+
+    def __init__(self, root):
+        self.root = root
+        manifest = read_manifest(root)
+        self.lat = np.array(manifest['lat'])
+        self.lon = np.array(manifest['lon'])
+        self.years = np.array(manifest['years'], dtype=np.int32)
+        self.variables = tuple(manifest['variables'])
+        self.block = tuple(manifest['block'])
+        self.grid = make_grid(self.lat, self.lon)
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def _block(self, variable, block_row, block_col):
+        key = (variable, block_row, block_col)
+        block = self._blocks.get(key)
+        if block is None:
+            block = np.load(block_path(self.root, variable, block_row, block_col), mmap_mode='r')
+            with self._lock:
+                self._blocks[key] = block
+        return block
+
+    def cell_series(self, variable, i, j):
+        """Full (years, 366) record of one cell, read as one contiguous slice"""
+        block_row, row = divmod(i, self.block[0])
+        block_col, col = divmod(j, self.block[1])
+        return self._block(variable, block_row, block_col)[row, col]
+
+    def series(self, variable, lat, lon):
+        i, j = self.grid.nearest_rows_columns(lat, lon)
+        return self.cell_series(variable, int(i), int(j))
@@ -0,0 +1,63 @@
+"""
+Pre-compressed in-memory responses
+Static bodies (the rendered page, bundled assets) are compressed once with
+gzip and, when the brotli package is installed, brotli. Requests are then
+answered from memory by content negotiation, with a strong ETag per
+encoding ("<hash>", "<hash>-gzip", "<hash>-br") and 304 Not Modified for
+revalidations.
+"""
+
+import gzip
+import hashlib
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # gzip and identity are always available
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 256
+
+
+class PrecompressedBody:
+    """A static body with its encodings and strong validator"""
+
+    def __init__(self, body, mimetype, cache_control='public, max-age=0, must-revalidate',
+                 compress=True):
+        if isinstance(body, str):
+            body = body.encode()
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.encodings = {'identity': body}
+        if compress and len(body) >= MIN_COMPRESS_BYTES:
+            if brotli is not None:
+                self.encodings['br'] = brotli.compress(body, quality=11)
+            self.encodings['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+
+    def choose_encoding(self, accept_encoding):
+        """Smallest encoding the client accepts"""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encodings and accept_encoding[encoding]:
+                return encoding
+        return 'identity'
+
+    def encoding_etag(self, encoding):
+        """Strong validators differ between the bytes of each encoding"""
+        return self.etag if encoding == 'identity' else f'{self.etag}-{encoding}'
+
+    def response(self, request):
+        """200 with the negotiated encoding, or 304 when the client's copy is current"""
+        encoding = self.choose_encoding(request.accept_encodings)
+        if any(request.if_none_match.contains(self.encoding_etag(e)) for e in self.encodings):
+            response = Response(status=304)
+        else:
+            response = Response(self.encodings[encoding], mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(self.encoding_etag(encoding))
+        response.headers['Cache-Control'] = self.cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
@@ -0,0 +1,206 @@
+"""
+Region queries: bounding boxes, GeoJSON polygons and routes
+A region is rasterized once onto the grid as cell ids with weights:
+cos(latitude) area weights for cells whose centre lies inside a polygon, or
+the length of route falling in each cell for a line. Masks are cached by a
+hash of the geometry, so repeat queries for the same venue skip this step.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from spatial import RegularGrid
+
+# Point-in-polygon tests are blocked to keep (points x edges) temporaries small
+_BLOCK_ELEMENTS = 4_000_000
+
+
+class RegionMask:
+    """Grid cells covered by a region and their normalized weights"""
+
+    def __init__(self, kind, cells, weights, centroid, key):
+        self.kind = kind
+        self.cells = cells
+        self.weights = weights
+        self.centroid = centroid
+        self.key = key
+
+
+def geometry_hash(geometry):
+    """Stable hash of a region payload, independent of key order"""
+    canonical = json.dumps(geometry, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _geometry(region):
+    """(kind, list of parts) from a bbox or GeoJSON geometry / Feature
+
+    Polygon parts are lists of (lon, lat) rings; line parts are one
+    (lon, lat) vertex array each.
+    """
+    if isinstance(region, dict) and region.get('type') == 'Feature':
+        region = region.get('geometry') or {}
+    if not isinstance(region, dict):
+        raise ValueError('region must be an object')
+    if 'bbox' in region and 'type' not in region:
+        try:
+            west, south, east, north = (float(v) for v in region['bbox'])
+        except (TypeError, ValueError) as error:
+            raise ValueError('bbox must be [west, south, east, north]') from error
+        if not (south < north and west < east):
+            raise ValueError('bbox must be [west, south, east, north]')
+        ring = np.array([[west, south], [east, south], [east, north], [west, north], [west, south]])
+        return 'polygon', [[ring]]
+
+    kind = region.get('type')
+    coordinates = region.get('coordinates')
+    try:
+        if kind == 'Polygon':
+            parts = [coordinates]
+        elif kind == 'MultiPolygon':
+            parts = coordinates
+        elif kind == 'LineString':
+            parts = [coordinates]
+        elif kind == 'MultiLineString':
+            parts = coordinates
+        else:
+            raise ValueError(f'Unsupported region type: {kind}')
+        if kind.endswith('Polygon'):
+            parts = [[np.asarray(ring, dtype=np.float64)[:, :2] for ring in rings] for rings in parts]
+            if any(len(ring) < 3 for rings in parts for ring in rings):
+                raise ValueError('Polygon rings need at least 3 positions')
+            return 'polygon', parts
+        parts = [np.asarray(line, dtype=np.float64)[:, :2] for line in parts]
+        if any(len(line) < 2 for line in parts):
+            raise ValueError('Lines need at least 2 positions')
+        return 'line', parts
+    except (TypeError, IndexError) as error:
+        raise ValueError(f'Malformed {kind} coordinates') from error
+
+
+def _edges(rings):
+    """Edge start and end points of every ring, closing open rings"""
+    starts, ends = [], []
+    for ring in rings:
+        starts.append(ring)
+        ends.append(np.roll(ring, -1, axis=0))
+    return np.concatenate(starts), np.concatenate(ends)
+
+
+def points_in_polygon(rings, lons, lats):
+    """Even-odd rule over all rings, so holes are excluded"""
+    start, end = _edges(rings)
+    x0, y0, x1, y1 = start[:, 0], start[:, 1], end[:, 0], end[:, 1]
+    inside = np.zeros(len(lons), dtype=bool)
+    step = max(_BLOCK_ELEMENTS // len(start), 1)
+    for offset in range(0, len(lons), step):
+        px = lons[offset:offset + step, None]
+        py = lats[offset:offset + step, None]
+        straddles = (y0 > py) != (y1 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing_x = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        crossings = straddles & (px < crossing_x)
+        inside[offset:offset + step] = crossings.sum(axis=1) % 2 == 1
+    return inside
+
+
+def _wrap(lons):
+    return (lons + 180.0) % 360.0 - 180.0
+
+
+def _candidate_cells(grid, outer):
+    """Flat ids, latitudes and longitudes of the cells in a ring's bounding box"""
+    south, north = outer[:, 1].min(), outer[:, 1].max()
+    west, east = outer[:, 0].min(), outer[:, 0].max()
+    if isinstance(grid, RegularGrid):
+        # Filter each axis, then pair up the survivors
+        cell_lons = _wrap(grid.lon)
+        rows = np.flatnonzero((grid.lat >= south) & (grid.lat <= north))
+        columns = np.flatnonzero((cell_lons >= west) & (cell_lons <= east))
+        rows, columns = (a.ravel() for a in np.meshgrid(rows, columns, indexing='ij'))
+        return rows * grid.shape[1] + columns, grid.lat[rows], cell_lons[columns]
+    cell_lons = _wrap(grid.lon)
+    cells = np.flatnonzero((grid.lat >= south) & (grid.lat <= north) &
+                           (cell_lons >= west) & (cell_lons <= east))
+    return cells, grid.lat[cells], cell_lons[cells]
+
+
+def _rasterize_polygons(grid, parts):
+    covered = []
+    for rings in parts:
+        cells, lats, lons = _candidate_cells(grid, rings[0])
+        covered.append(cells[points_in_polygon(rings, lons, lats)])
+    cells = np.unique(np.concatenate(covered))
+    if len(cells) == 0:
+        # Smaller than a grid cell: use the cell under the vertex centroid
+        vertices = np.concatenate([rings[0] for rings in parts])
+        cells = np.atleast_1d(grid.nearest(vertices[:, 1].mean(), vertices[:, 0].mean()))
+    weights = np.cos(np.radians(grid.cell_centers(cells)[0]))
+    return cells, weights
+
+
+def _rasterize_lines(grid, parts):
+    """Sample each route finely and weight cells by the length inside them"""
+    spacing = grid.resolution / 4
+    samples, lengths = [], []
+    for line in parts:
+        start, end = line[:-1], line[1:]
+        middle_lat = np.radians((start[:, 1] + end[:, 1]) / 2)
+        delta = end - start
+        length = np.hypot(delta[:, 0] * np.cos(middle_lat), delta[:, 1])
+        steps = np.maximum(np.ceil(np.abs(delta).max(axis=1) / spacing), 1).astype(np.intp)
+        # Midpoints of equal sub-segments, each carrying its share of the length
+        segment = np.repeat(np.arange(len(steps)), steps)
+        fraction = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps) + 0.5) / steps[segment]
+        samples.append(start[segment] + delta[segment] * fraction[:, None])
+        lengths.append(length[segment] / steps[segment])
+    samples, lengths = np.concatenate(samples), np.concatenate(lengths)
+    nearest = grid.nearest(samples[:, 1], samples[:, 0])
+    cells, position = np.unique(nearest, return_inverse=True)
+    weights = np.bincount(position, weights=lengths, minlength=len(cells))
+    if not weights.sum():  # Degenerate route of repeated points
+        weights = np.ones(len(cells))
+    return cells, weights
+
+
+def rasterize(grid, region):
+    """RegionMask of a bbox or GeoJSON geometry on a grid"""
+    kind, parts = _geometry(region)
+    if kind == 'polygon':
+        cells, weights = _rasterize_polygons(grid, parts)
+    else:
+        cells, weights = _rasterize_lines(grid, parts)
+    weights = weights / weights.sum()
+    lats, lons = grid.cell_centers(cells)
+    centroid = (float(lats @ weights), float(_wrap(lons) @ weights))
+    return RegionMask(kind, cells.astype(np.intp), weights, centroid, geometry_hash(region))
+
+
+class RegionMaskCache:
+    """LRU of rasterized masks keyed by geometry hash and grid"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, grid, region):
+        key = (geometry_hash(region), grid.shape, float(grid.lat[0]), float(grid.lon[0]))
+        with self._lock:
+            mask = self._entries.get(key)
+            if mask is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return mask
+            self.stats['misses'] += 1
+        mask = rasterize(grid, region)
+        with self._lock:
+            self._entries[key] = mask
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return mask
@@ -0,0 +1,122 @@
+"""
+Response encodings for analysis results
+JSON is encoded with orjson when it is installed (several times faster than
+the standard library for long numeric lists). Clients that ask for it in
+their Accept header can instead get the numeric series as little-endian
+Float32 buffers:
+
+    application/x-float32-frame   uint32 LE header length, a JSON header
+                                  (padded with spaces to 4-byte alignment),
+                                  then the buffers; each series in the header
+                                  is replaced by {"dtype", "offset", "length"},
+                                  offsets counted from the start of the body,
+                                  so browsers can wrap them in Float32Array
+                                  without copying
+    application/msgpack           MessagePack, series as bin float32 LE
+                                  (needs the msgpack package)
+"""
+
+import json
+import struct
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # Standard library json is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are optional
+    msgpack = None
+
+JSON = 'application/json'
+FLOAT32_FRAME = 'application/x-float32-frame'
+MSGPACK = 'application/msgpack'
+
+# Alternative MessagePack type still sent by some clients
+_MSGPACK_ALIASES = ('application/x-msgpack',)
+
+_FLOAT32 = np.dtype('<f4')
+
+
+def available_mimetypes():
+    """Response types this process can produce, JSON first"""
+    mimetypes = [JSON, FLOAT32_FRAME]
+    if msgpack is not None:
+        mimetypes.append(MSGPACK)
+    return mimetypes
+
+
+def negotiate(accept):
+    """Best response type for a werkzeug Accept header, JSON by default"""
+    offered = available_mimetypes()
+    if msgpack is not None:
+        offered += list(_MSGPACK_ALIASES)
+    best = accept.best_match(offered, default=JSON)
+    return MSGPACK if best in _MSGPACK_ALIASES else best
+
+
+def json_bytes(data):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def _split_series(data, paths):
+    """Copy of data with the series at each key path removed, and the series
+
+    Only the dicts along the paths are copied, so cached results are never
+    modified.
+    """
+    data = dict(data)
+    copied = {id(data)}
+    series = []
+    for path in paths:
+        parent = data
+        for key in path[:-1]:
+            if id(parent[key]) not in copied:
+                parent[key] = dict(parent[key])
+                copied.add(id(parent[key]))
+            parent = parent[key]
+        values = parent.pop(path[-1])
+        series.append((parent, path[-1], np.ascontiguousarray(values, dtype=_FLOAT32)))
+    return data, series
+
+
+def encode_frame(data, paths):
+    """Float32 frame body: length-prefixed JSON header, then aligned buffers"""
+    header, series = _split_series(data, paths)
+    starts = np.cumsum([0] + [values.nbytes for _, _, values in series])
+    # Offsets include the header size, which depends on the offsets' digits:
+    # grow it until it is stable, padded so the first buffer is 4-byte aligned
+    base = 0
+    while True:
+        for (parent, key, values), start in zip(series, starts):
+            parent[key] = {'dtype': 'float32', 'offset': base + int(start), 'length': len(values)}
+        encoded = json_bytes(header)
+        size = 4 + len(encoded)
+        size += -size % 4
+        if size == base:
+            break
+        base = size
+    encoded += b' ' * (base - 4 - len(encoded))
+    return b''.join([struct.pack('<I', len(encoded)), encoded] + [values.tobytes() for _, _, values in series])
+
+
+def encode_msgpack(data, paths):
+    """MessagePack body with each series as a bin of float32 LE values"""
+    body, series = _split_series(data, paths)
+    for parent, key, values in series:
+        parent[key] = values.tobytes()
+    return msgpack.packb(body, use_bin_type=True)
+
+
+def encode(data, mimetype, paths=()):
+    """Body bytes of data in a negotiated type; paths are key tuples of numeric series"""
+    if mimetype == FLOAT32_FRAME:
+        return encode_frame(data, paths)
+    if mimetype == MSGPACK:
+        return encode_msgpack(data, paths)
+    return json_bytes(data)
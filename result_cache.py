@@ -0,0 +1,120 @@
+"""
+Bounded result cache for analysis responses
+In-process LRU with a TTL, optionally backed by a SQLite file shared by all
+workers on the host. Keeps hit/miss/eviction counters for sizing.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Thread-safe LRU + TTL cache of JSON-serializable values"""
+
+    def __init__(self, max_entries=4096, ttl=3600, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'diskHits': 0
+        }
+        if disk_path:
+            with self._connection() as db:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute(
+                    'CREATE TABLE IF NOT EXISTS results '
+                    '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)'
+                )
+                db.execute('CREATE INDEX IF NOT EXISTS results_expires ON results (expires)')
+
+    def _connection(self):
+        """One SQLite connection per thread"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.disk_path, timeout=5)
+            self._local.db = db
+        return db
+
+    def get(self, key, count=True):
+        """Cached value for key, or None on a miss
+
+        Pass count=False for re-checks that should not skew the counters.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += count
+                    return value
+                del self._entries[key]
+                self.stats['expirations'] += 1
+
+        value = self._disk_get(key) if self.disk_path else None
+        with self._lock:
+            if value is None:
+                self.stats['misses'] += count
+                return None
+            self.stats['hits'] += count
+            self.stats['diskHits'] += count
+        self._store(key, value, now)
+        return value
+
+    def put(self, key, value):
+        now = time.monotonic()
+        self._store(key, value, now)
+        if self.disk_path:
+            self._disk_put(key, value)
+
+    def _store(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def _disk_get(self, key):
+        # Wall-clock time on disk since monotonic clocks differ between processes
+        row = self._connection().execute(
+            'SELECT value FROM results WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _disk_put(self, key, value):
+        db = self._connection()
+        with db:
+            db.execute(
+                'INSERT OR REPLACE INTO results (key, value, expires) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time() + self.ttl)
+            )
+            db.execute('DELETE FROM results WHERE expires <= ?', (time.time(),))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_path:
+            db = self._connection()
+            with db:
+                db.execute('DELETE FROM results')
+
+    def snapshot(self):
+        """Counters plus current size, for the stats endpoint"""
+        with self._lock:
+            stats = dict(self.stats, size=len(self._entries), maxEntries=self.max_entries,
+                         ttl=self.ttl, disk=bool(self.disk_path))
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRatio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
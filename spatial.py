@@ -0,0 +1,244 @@
+"""
+Spatial lookup from map coordinates to grid cells
+Regular lat/lon grids use an arithmetic fast path; irregular grids (reduced
+Gaussian, swaths) use a KD-tree on unit vectors. Both return flat cell ids
+and can produce interpolation weights for arrays of points. make_grid picks
+one for a dataset's axes, so unevenly spaced axes (Gaussian latitudes) go
+through the KD-tree instead of being mis-mapped by the arithmetic path.
+"""
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # Brute-force fallback for irregular grids
+    cKDTree = None
+
+# Query rows per block in the brute-force nearest-neighbour fallback
+_BLOCK = 4096
+
+
+def _unit_vectors(lats, lons):
+    lat, lon = np.radians(lats), np.radians(lons)
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _idw_weights(distances, power):
+    """Inverse-distance weights; an exact hit takes all the weight"""
+    with np.errstate(divide='ignore'):
+        weights = 1.0 / distances ** power
+    exact = ~np.isfinite(weights)
+    weights = np.where(exact.any(axis=-1, keepdims=True), exact.astype(np.float64), weights)
+    return weights / weights.sum(axis=-1, keepdims=True)
+
+
+# Largest deviation from the mean axis step, relative to it, still treated as even
+SPACING_TOLERANCE = 1e-3
+
+
+def evenly_spaced(axis):
+    """Whether a 1-D coordinate axis has a constant step"""
+    axis = np.asarray(axis, dtype=np.float64)
+    if axis.ndim != 1 or len(axis) < 2:
+        return False
+    steps = np.diff(axis)
+    return bool(np.abs(steps - steps.mean()).max() <= SPACING_TOLERANCE * abs(steps.mean()))
+
+
+class RegularGrid:
+    """Grid defined by evenly spaced 1-D latitude and longitude axes"""
+
+    def __init__(self, lat, lon):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        for name, axis in (('latitude', self.lat), ('longitude', self.lon)):
+            if not evenly_spaced(axis):
+                raise ValueError(f'RegularGrid needs an evenly spaced {name} axis; use make_grid')
+        self.dlat = self.lat[1] - self.lat[0]
+        self.dlon = self.lon[1] - self.lon[0]
+        self.shape = (len(self.lat), len(self.lon))
+        self.size = len(self.lat) * len(self.lon)
+        self.periodic = abs(len(self.lon) * self.dlon - 360.0) < 1e-6
+        self.resolution = min(abs(self.dlat), abs(self.dlon))
+
+    def _fractional(self, lats, lons):
+        """Fractional row and column positions of points"""
+        rows = (np.asarray(lats, dtype=np.float64) - self.lat[0]) / self.dlat
+        # Wrap longitudes into the window centred on the grid's extent
+        margin = (360.0 - (self.shape[1] - 1) * self.dlon) / 2
+        lons = (np.asarray(lons, dtype=np.float64) - self.lon[0] + margin) % 360.0 - margin
+        return rows, lons / self.dlon
+
+    def nearest_rows_columns(self, lats, lons):
+        """Nearest (rows, columns) for arrays of points"""
+        rows, columns = self._fractional(lats, lons)
+        rows = np.clip(np.rint(rows), 0, self.shape[0] - 1).astype(np.intp)
+        columns = np.rint(columns).astype(np.intp)
+        if self.periodic:
+            columns %= self.shape[1]
+        else:
+            np.clip(columns, 0, self.shape[1] - 1, out=columns)
+        return rows, columns
+
+    def nearest(self, lats, lons):
+        """Flat cell ids of the nearest cells"""
+        rows, columns = self.nearest_rows_columns(lats, lons)
+        return rows * self.shape[1] + columns
+
+    def cell_centers(self, cells):
+        """Latitudes and longitudes of flat cell ids"""
+        rows, columns = np.divmod(cells, self.shape[1])
+        return self.lat[rows], self.lon[columns]
+
+    def contains(self, lats, lons):
+        """Whether points lie within half a cell of the grid's extent"""
+        rows, columns = self._fractional(lats, lons)
+        inside = (rows >= -0.5) & (rows <= self.shape[0] - 0.5)
+        if not self.periodic:
+            inside &= (columns >= -0.5) & (columns <= self.shape[1] - 0.5)
+        return inside
+
+    def _corners(self, lats, lons):
+        """Four surrounding cells and the fractional offsets inside them"""
+        rows, columns = self._fractional(lats, lons)
+        n_lat, n_lon = self.shape
+        i0 = np.clip(np.floor(rows), 0, n_lat - 2).astype(np.intp)
+        wi = np.clip(rows - i0, 0.0, 1.0)
+        j0 = np.floor(columns).astype(np.intp)
+        wj = columns - j0
+        if self.periodic:
+            j0 %= n_lon
+            j1 = (j0 + 1) % n_lon
+        else:
+            j0 = np.clip(j0, 0, n_lon - 2)
+            wj = np.clip(columns - j0, 0.0, 1.0)
+            j1 = j0 + 1
+        i1 = i0 + 1
+        cells = np.stack([i0 * n_lon + j0, i0 * n_lon + j1, i1 * n_lon + j0, i1 * n_lon + j1], axis=-1)
+        return cells, wi, wj
+
+    def weights(self, lats, lons, method='bilinear', power=2.0):
+        """Cells (points, k) and weights (points, k) for interpolation"""
+        if method == 'nearest':
+            cells = self.nearest(lats, lons)[..., None]
+            return cells, np.ones(cells.shape)
+        cells, wi, wj = self._corners(lats, lons)
+        if method == 'bilinear':
+            wi, wj = wi[..., None], wj[..., None]
+            weights = np.concatenate([(1 - wi) * (1 - wj), (1 - wi) * wj, wi * (1 - wj), wi * wj], axis=-1)
+            return cells, weights
+        if method == 'idw':
+            rows, columns = np.divmod(cells, self.shape[1])
+            points = _unit_vectors(np.asarray(lats)[..., None], np.asarray(lons)[..., None])
+            corners = _unit_vectors(self.lat[rows], self.lon[columns])
+            distances = np.linalg.norm(corners - points, axis=-1)
+            return cells, _idw_weights(distances, power)
+        raise ValueError(f'Unknown interpolation method: {method}')
+
+
+class IrregularGrid:
+    """Grid given as arbitrary cell-centre coordinates (one entry per cell)
+
+    shape is the layout of the cells in the data arrays (flat ids are their
+    C-order positions); it defaults to a single cell dimension.
+    """
+
+    def __init__(self, lats, lons, shape=None):
+        self.lat = np.asarray(lats, dtype=np.float64).ravel()
+        self.lon = np.asarray(lons, dtype=np.float64).ravel()
+        self.size = len(self.lat)
+        self.shape = tuple(shape) if shape is not None else (self.size,)
+        if int(np.prod(self.shape)) != self.size:
+            raise ValueError(f'{self.size} cells do not fill a {self.shape} layout')
+        self._xyz = _unit_vectors(self.lat, self.lon)
+        self._tree = cKDTree(self._xyz) if cKDTree is not None else None
+        self._spacing = None
+
+    @property
+    def spacing(self):
+        """Largest chord distance from a cell to its nearest neighbour"""
+        if self._spacing is None:
+            if self.size < 2:
+                self._spacing = np.inf
+            else:
+                distances, _ = self._query(self.lat, self.lon, 2)
+                self._spacing = float(distances[:, 1].max())
+        return self._spacing
+
+    @property
+    def resolution(self):
+        """Cell spacing in degrees of arc"""
+        return float(np.degrees(2 * np.arcsin(min(self.spacing, 2.0) / 2)))
+
+    def _query(self, lats, lons, k):
+        """Chord distances and flat ids of the k nearest cells"""
+        points = _unit_vectors(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
+        flat = points.reshape(-1, 3)
+        if self._tree is not None:
+            distances, cells = self._tree.query(flat, k=k)
+        else:
+            distances = np.empty((len(flat), k))
+            cells = np.empty((len(flat), k), dtype=np.intp)
+            for start in range(0, len(flat), _BLOCK):
+                block = flat[start:start + _BLOCK]
+                # Largest dot product is the smallest chord distance
+                dots = block @ self._xyz.T
+                nearest = np.argpartition(-dots, k - 1, axis=1)[:, :k]
+                chord = np.sqrt(np.maximum(2 - 2 * np.take_along_axis(dots, nearest, axis=1), 0))
+                order = np.argsort(chord, axis=1)
+                distances[start:start + _BLOCK] = np.take_along_axis(chord, order, axis=1)
+                cells[start:start + _BLOCK] = np.take_along_axis(nearest, order, axis=1)
+        shape = points.shape[:-1] + (k,)
+        return distances.reshape(shape), cells.reshape(shape)
+
+    def nearest(self, lats, lons):
+        return self._query(lats, lons, 1)[1][..., 0]
+
+    def nearest_rows_columns(self, lats, lons):
+        """Nearest cell positions in a 2-D (rows, columns) layout"""
+        return np.unravel_index(self.nearest(lats, lons), self.shape)
+
+    def cell_centers(self, cells):
+        return self.lat[cells], self.lon[cells]
+
+    def contains(self, lats, lons):
+        """Whether points lie within one cell spacing of some cell centre"""
+        distances, _ = self._query(lats, lons, 1)
+        return distances[..., 0] <= self.spacing
+
+    def weights(self, lats, lons, method='idw', power=2.0, k=4):
+        if method == 'nearest':
+            cells = self.nearest(lats, lons)[..., None]
+            return cells, np.ones(cells.shape)
+        if method in ('idw', 'bilinear'):
+            # No cell topology to interpolate bilinearly on; IDW stands in
+            distances, cells = self._query(lats, lons, min(k, self.size))
+            return cells, _idw_weights(distances, power)
+        raise ValueError(f'Unknown interpolation method: {method}')
+
+
+def make_grid(lat, lon):
+    """Grid for 1-D latitude and longitude axes
+
+    Evenly spaced axes get the arithmetic RegularGrid; uneven ones (Gaussian
+    latitudes, stretched grids) an IrregularGrid over every axis pair, laid
+    out as (lat, lon) so flat cell ids are the same in both.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if lat.ndim != 1 or lon.ndim != 1:
+        raise ValueError('Gridded data needs 1-D latitude and longitude axes')
+    if evenly_spaced(lat) and evenly_spaced(lon):
+        return RegularGrid(lat, lon)
+    lats, lons = np.meshgrid(lat, lon, indexing='ij')
+    return IrregularGrid(lats, lons, shape=(len(lat), len(lon)))
+
+
+def interpolate(grid, field, lats, lons, method='bilinear', power=2.0):
+    """Sample a field (..., cells) or (..., lat, lon) at arrays of points"""
+    field = np.asarray(field)
+    flat = field.reshape(field.shape[:field.ndim - len(grid.shape)] + (grid.size,))
+    cells, weights = grid.weights(lats, lons, method, power)
+    return (flat[..., cells] * weights).sum(axis=-1)
+
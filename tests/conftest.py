@@ -0,0 +1,58 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from climatology import DAYS_PER_YEAR, synthetic_dataset, window_bounds  # noqa: E402
+
+TIME_RANGES = ('day', 'week', 'month', 'season')
+
+
+@pytest.fixture(scope='session')
+def climate():
+    return synthetic_dataset(n_years=8, resolution=15.0)
+
+
+@pytest.fixture(scope='session')
+def windows():
+    """200 random (lat, lon, date, time range) windows, every fifth wrapping past Dec 31"""
+    rng = np.random.default_rng(2025)
+    windows = []
+    for k in range(200):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        time_range = TIME_RANGES[k % len(TIME_RANGES)]
+        if k % 5 == 0:
+            day = date(2021, 12, 31) - timedelta(days=int(rng.integers(0, 5)))
+            time_range = 'month'
+        else:
+            day = date(2021, 1, 1) + timedelta(days=int(rng.integers(0, 365)))
+        windows.append((lat, lon, day.isoformat(), time_range))
+    return windows
+
+
+@pytest.fixture(scope='session')
+def scan(climate):
+    """(years, days) samples of a variable over a window, read straight from the cube"""
+    def samples(name, lat, lon, day, time_range):
+        i, j = climate.cell_index(lat, lon)
+        start, length = window_bounds(day, time_range)
+        days = (start + np.arange(length)) % DAYS_PER_YEAR
+        return np.asarray(climate.variables[name][:, days, i, j])
+    return samples
+
+
+@pytest.fixture(scope='module')
+def client(climate):
+    """Flask test client serving the synthetic climatology"""
+    import main
+    main.climatology = climate
+    for name in ('exceedance_index', 'window_sums', 'ecdf_index', 'cooccurrence', 'tile_renderer'):
+        setattr(main, name, None)
+    main.analysis_cache.clear()
+    main.result_store.clear()
+    return main.app.test_client()
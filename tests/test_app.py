@@ -0,0 +1,22 @@
+"""/api/analyze, served from a small synthetic climatology"""
+
+from climatology import CONDITIONS
+
+ANALYSIS = {'location': '40.7, -74.0', 'date': '2021-07-04', 'timeRange': 'week', 'conditions': ['hot', 'wet']}
+
+
+def test_analyze_matches_the_climatology(client, climate):
+    response = client.post('/api/analyze', json=ANALYSIS)
+    assert response.status_code == 200
+    expected = climate.exceedance_probabilities(40.7, -74.0, '2021-07-04', 'week', ANALYSIS['conditions'])
+    assert [entry['condition'] for entry in response.json['probabilities']] == ANALYSIS['conditions']
+    for entry in response.json['probabilities']:
+        assert entry['probability'] == round(expected[entry['condition']]['probability'])
+        assert entry['samples'] == expected[entry['condition']]['samples']
+        assert entry['threshold'] == CONDITIONS[entry['condition']][2]
+    assert response.json['metadata']['years'] == [int(climate.years[0]), int(climate.years[-1])]
+
+
+def test_analyze_rejects_unknown_locations(client):
+    assert client.post('/api/analyze', json=dict(ANALYSIS, location='95, 10')).status_code == 400
+    assert client.post('/api/analyze', json=dict(ANALYSIS, location='Nowhere at all')).status_code == 400
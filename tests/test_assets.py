@@ -0,0 +1,80 @@
+"""Fingerprinted static assets"""
+
+import gzip
+import json
+import os
+import re
+
+import pytest
+
+from assets import ASSET_PREFIX, IMMUTABLE, VENDOR_FILES, build_bundle, fingerprint, split_inline, write_bundle
+
+PAGE = ('<html><head><style>body { color: red; }</style>'
+        f'<link rel="stylesheet" href="{VENDOR_FILES["chartjs"]["chart.umd.js"]}" />'
+        f'<script src="{VENDOR_FILES["chartjs"]["chart.umd.js"]}"></script></head>'
+        '<body><script>var a = 1;</script><script>var b = a;</script></body></html>')
+
+
+@pytest.fixture
+def vendor_dir(tmp_path):
+    for path in VENDOR_FILES['chartjs']:
+        target = tmp_path / 'chartjs' / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(b'/* chart */ ' * 40)
+    return str(tmp_path)
+
+
+def test_fingerprint_follows_content():
+    files = {'a.js': b'1', 'b.css': b'2'}
+    assert fingerprint(files) == fingerprint(dict(reversed(list(files.items()))))
+    assert fingerprint(files) != fingerprint({'a.js': b'1', 'b.css': b'3'})
+    assert fingerprint(files) != fingerprint({'a.js': b'1', 'c.css': b'2'})
+    assert len(fingerprint(files)) == 12
+
+
+def test_split_inline_keeps_document_order():
+    html, files = split_inline(PAGE)
+    assert '<style>' not in html and '<script>' not in html
+    assert html.count('@app@/app.js') == 1 and html.count('@app@/app.css') == 1
+    assert files['app.css'] == b'body { color: red; }\n'
+    assert files['app.js'].decode().index('var a') < files['app.js'].decode().index('var b')
+
+
+def test_unvendored_packages_keep_their_cdn_urls():
+    bundle = build_bundle(PAGE)
+    assert set(bundle.packages) == {'app'}
+    assert VENDOR_FILES['chartjs']['chart.umd.js'] in bundle.html
+    root = bundle.packages['app']
+    assert f'{ASSET_PREFIX}{root}/app.js' in bundle.html
+    assert set(bundle.files) == {f'{root}/app.css', f'{root}/app.js'}
+
+
+def test_vendored_packages_are_rewritten(vendor_dir):
+    bundle = build_bundle(PAGE, vendor_dir)
+    root = bundle.packages['chartjs']
+    assert re.fullmatch(r'chartjs-[0-9a-f]{12}', root)
+    assert 'cdn.jsdelivr.net' not in bundle.html
+    assert bundle.html.count(f'{ASSET_PREFIX}{root}/chart.umd.js') == 2
+    assert bundle.files[f'{root}/chart.umd.js'] == b'/* chart */ ' * 40
+
+
+def test_write_bundle(vendor_dir, tmp_path):
+    bundle = build_bundle(PAGE, vendor_dir)
+    output = tmp_path / 'dist'
+    assert write_bundle(bundle, str(output)) == len(bundle.files) + 1
+    root = bundle.packages['chartjs']
+    data = (output / root / 'chart.umd.js').read_bytes()
+    assert gzip.decompress((output / root / 'chart.umd.js.gz').read_bytes()) == data
+    assert (output / 'index.html').read_text() == bundle.html
+    manifest = json.loads((output / 'manifest.json').read_text())
+    assert manifest == {package: ASSET_PREFIX + root for package, root in bundle.packages.items()}
+    assert not [name for _, _, names in os.walk(output) for name in names if '.tmp' in name]
+
+
+def test_asset_route(client):
+    page = client.get('/').get_data(as_text=True)
+    path = re.search(r'/assets/(app-[0-9a-f]{12}/app\.js)', page).group(1)
+    response = client.get(f'/assets/{path}')
+    assert response.status_code == 200 and response.mimetype in ('text/javascript', 'application/javascript')
+    assert response.headers['Cache-Control'] == IMMUTABLE
+    assert client.get('/assets/app-000000000000/app.js').status_code == 404
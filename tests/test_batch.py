@@ -0,0 +1,51 @@
+"""/api/analyze/batch over many locations and dates"""
+
+import pytest
+
+import main
+from exceedance_index import build_index
+
+BATCH = {'locations': [[40.7, -74.0], '10, 20'], 'dates': ['2021-07-04', '2021-12-30'],
+         'timeRange': 'month', 'conditions': ['hot', 'wet']}
+
+
+def test_batch_matches_single_lookups(client, climate):
+    response = client.post('/api/analyze/batch', json=BATCH)
+    assert response.status_code == 200
+    columns = response.json['columns']
+    assert response.json['rows'] == 4
+    assert columns['location'] == [0, 0, 1, 1] and columns['date'] == [0, 1, 0, 1]
+    index = build_index(climate)
+    for row, (lat, lon, day) in enumerate((p + (d,) for p in ((40.7, -74.0), (10.0, 20.0)) for d in BATCH['dates'])):
+        expected = index.lookup(lat, lon, day, 'month', ['hot', 'wet'])
+        assert columns['hot'][row] == round(expected['hot']['probability'])
+        assert columns['wet'][row] == round(expected['wet']['probability'])
+        assert columns['samples'][row] == expected['hot']['samples']
+
+
+@pytest.mark.parametrize('interpolation', ['bilinear', 'idw'])
+def test_interpolation_at_cell_centres_matches_nearest(client, climate, interpolation):
+    payload = dict(BATCH, locations=[[float(climate.lat[i]), float(climate.lon[j])] for i, j in ((3, 4), (8, 20))])
+    nearest = client.post('/api/analyze/batch', json=payload).json['columns']
+    blended = client.post('/api/analyze/batch', json=dict(payload, interpolation=interpolation)).json['columns']
+    assert blended['hot'] == nearest['hot'] and blended['wet'] == nearest['wet']
+
+
+@pytest.mark.parametrize('payload', [
+    {'locations': [[40.7]], 'dates': ['2021-07-04'], 'conditions': ['hot']},
+    {'locations': [[True, 10]], 'dates': ['2021-07-04'], 'conditions': ['hot']},
+    {'locations': [[95, 10]], 'dates': ['2021-07-04'], 'conditions': ['hot']},
+    {'locations': '40.7, -74.0', 'dates': ['2021-07-04'], 'conditions': ['hot']},
+    {'locations': [[40.7, -74.0]], 'dates': ['July 4th'], 'conditions': ['hot']},
+    {'locations': [[40.7, -74.0]], 'dates': [None], 'conditions': ['hot']},
+    {'locations': [[40.7, -74.0]], 'dates': ['2021-07-04'], 'conditions': ['sunny']},
+    {'locations': [[40.7, -74.0]], 'dates': ['2021-07-04'], 'conditions': ['hot'], 'interpolation': 'cubic'},
+    ['not', 'an', 'object']
+])
+def test_batch_rejects_malformed_payloads(client, payload):
+    assert client.post('/api/analyze/batch', json=payload).status_code == 400
+
+
+def test_batch_row_limit(client):
+    payload = dict(BATCH, locations=[[0, 0]] * 1000, dates=['2021-07-04'] * (main.MAX_BATCH_ROWS // 1000 + 1))
+    assert client.post('/api/analyze/batch', json=payload).status_code == 400
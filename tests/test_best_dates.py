@@ -0,0 +1,77 @@
+"""/api/best-dates ranks every start day of the year"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from climatology import DAYS_PER_YEAR, FEB_29, date_to_doy
+from ecdf_index import build_ecdf_index
+from exceedance_index import build_index
+
+REQUEST = {'location': '40.7, -74.0', 'timeRange': 'week', 'conditions': ['hot', 'wet'], 'year': 2021}
+
+
+def brute_force_scores(climate, conditions, weights, thresholds=None):
+    """Score of the window starting on every day of 2024 (a leap year), one lookup at a time"""
+    index, ecdf = build_index(climate), build_ecdf_index(climate)
+    scores = np.empty(DAYS_PER_YEAR)
+    for doy in range(DAYS_PER_YEAR):
+        day = (date(2024, 1, 1) + timedelta(days=doy)).isoformat()
+        if thresholds:
+            result = ecdf.lookup(40.7, -74.0, day, 'week', conditions, thresholds)
+        else:
+            result = index.lookup(40.7, -74.0, day, 'week', conditions)
+        scores[doy] = sum(w * result[c]['probability'] for c, w in zip(conditions, weights)) / sum(map(abs, weights))
+    return scores
+
+
+def ranked_days(response):
+    return [date_to_doy(date.fromisoformat(entry['date'])) for entry in response.json['dates']]
+
+
+def test_ranking_matches_brute_force(client, climate):
+    response = client.post('/api/best-dates', json=dict(REQUEST, top=20))
+    assert response.status_code == 200
+    scores = brute_force_scores(climate, ['hot', 'wet'], [1, 1])
+    days = ranked_days(response)
+    assert len(days) == 20
+    # 2021 has no Feb 29, so that window is never offered
+    assert FEB_29 not in days
+    expected = [d for d in np.argsort(scores, kind='stable') if d != FEB_29][:20]
+    np.testing.assert_allclose(scores[days], scores[expected])
+    for entry, doy in zip(response.json['dates'], days):
+        assert entry['score'] == pytest.approx(scores[doy], abs=0.05)
+        assert entry['end'] == (date.fromisoformat(entry['date']) + timedelta(days=6)).isoformat()
+
+
+def test_weights_and_thresholds(client, climate):
+    request = dict(REQUEST, weights={'hot': -1, 'wet': 2}, thresholds={'hot': 80})
+    response = client.post('/api/best-dates', json=request)
+    assert response.status_code == 200
+    assert response.json['thresholds'] == {'hot': 80.0, 'wet': 1.0}
+    scores = brute_force_scores(climate, ['hot', 'wet'], [-1, 2], {'hot': 80.0})
+    days = ranked_days(response)
+    assert np.all(np.diff(scores[days]) >= -1e-9)
+    assert scores[days[0]] == pytest.approx(scores[np.arange(DAYS_PER_YEAR) != FEB_29].min())
+
+
+def test_spacing_keeps_windows_apart(client):
+    days = ranked_days(client.post('/api/best-dates', json=dict(REQUEST, spacing=30, top=5)))
+    assert len(days) == 5
+    for k, first in enumerate(days):
+        for second in days[k + 1:]:
+            assert min(abs(first - second), DAYS_PER_YEAR - abs(first - second)) >= 30
+
+
+@pytest.mark.parametrize('change', [
+    {'conditions': []},
+    {'conditions': ['sunny']},
+    {'weights': {'hot': 0, 'wet': 0}},
+    {'weights': {'hot': 'heavy'}},
+    {'top': 'ten'},
+    {'thresholds': {'hot': 'warm'}},
+    {'location': 'Atlantis'}
+])
+def test_rejects_malformed_requests(client, change):
+    assert client.post('/api/best-dates', json=dict(REQUEST, **change)).status_code == 400
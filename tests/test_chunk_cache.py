@@ -0,0 +1,87 @@
+"""Content-addressed chunk cache: addressing, atomic writes and LRU eviction"""
+
+import os
+import threading
+
+import numpy as np
+
+from chunk_cache import LOW_WATERMARK, ChunkCache
+
+
+def chunk(seed, size=1000):
+    return np.random.default_rng(seed).standard_normal(size).astype(np.float32)
+
+
+def npy_files(root):
+    return sorted(os.path.join(d, name) for d, _, names in os.walk(root) for name in names if name.endswith('.npy'))
+
+
+def test_round_trip_and_addressing(tmp_path):
+    cache = ChunkCache(str(tmp_path))
+    values = chunk(1)
+    cache.put('M2SDNXSLV', 'T2MMAX', ('20200101', 0, 0), '5.12.4', values)
+    np.testing.assert_array_equal(cache.get('M2SDNXSLV', 'T2MMAX', ('20200101', 0, 0), '5.12.4'), values)
+    # Any part of the identity changes the address
+    assert cache.get('M2SDNXSLV', 'T2MMAX', ('20200101', 0, 0), '5.12.5') is None
+    assert cache.get('M2SDNXSLV', 'T2MMIN', ('20200101', 0, 0), '5.12.4') is None
+    assert cache.get('M2SDNXSLV', 'T2MMAX', ('20200102', 0, 0), '5.12.4') is None
+    assert ChunkCache.key('d', 'v', (1, 2), '1') == ChunkCache.key('d', 'v', ('1', '2'), '1')
+    snapshot = cache.snapshot()
+    assert (snapshot['hits'], snapshot['misses'], snapshot['bytesSaved']) == (1, 3, values.nbytes)
+
+
+def test_size_survives_a_restart(tmp_path):
+    cache = ChunkCache(str(tmp_path))
+    for seed in range(3):
+        cache.put('d', 'v', (seed,), '1', chunk(seed))
+    assert ChunkCache(str(tmp_path)).snapshot()['size'] == cache.snapshot()['size'] > 0
+
+
+def test_evicts_least_recently_used_to_the_low_watermark(tmp_path):
+    probe = ChunkCache(str(tmp_path / 'probe'))
+    probe.put('d', 'v', (0,), '1', chunk(0))
+    size = probe.snapshot()['size']
+
+    cache = ChunkCache(str(tmp_path / 'cache'), max_bytes=5 * size)
+    for seed in range(5):
+        cache.put('d', 'v', (seed,), '1', chunk(seed))
+        # Distinct, increasing access times
+        os.utime(cache._path(cache.key('d', 'v', (seed,), '1')), (1000 + seed, 1000 + seed))
+    # Reading chunk 0 makes it the most recently used
+    assert cache.get('d', 'v', (0,), '1') is not None
+    cache.put('d', 'v', (5,), '1', chunk(5))
+
+    # Six chunks exceed the budget; the two oldest go to get under the low watermark
+    assert len(npy_files(str(tmp_path / 'cache'))) == 4
+    assert [seed for seed in range(6) if cache.get('d', 'v', (seed,), '1') is not None] == [0, 3, 4, 5]
+    assert cache.snapshot()['size'] == 4 * size <= 5 * size * LOW_WATERMARK
+    assert (cache.stats['evictions'], cache.stats['bytesEvicted']) == (2, 2 * size)
+
+
+def test_concurrent_writers_never_expose_partial_chunks(tmp_path):
+    cache = ChunkCache(str(tmp_path))
+    versions = [np.full(200_000, k, dtype=np.float32) for k in range(4)]
+    errors, stop = [], threading.Event()
+
+    def write(values):
+        for _ in range(20):
+            cache.put('d', 'v', (0,), '1', values)
+
+    def read():
+        while not stop.is_set():
+            values = cache.get('d', 'v', (0,), '1')
+            if values is not None and not (len(values) == 200_000 and (values == values[0]).all()):
+                errors.append(values)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    writers = [threading.Thread(target=write, args=(values,)) for values in versions]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert not errors
+    # Temporary files are renamed into place, never left behind
+    assert [name for _, _, names in os.walk(tmp_path) for name in names if '.tmp' in name] == []
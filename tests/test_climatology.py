@@ -0,0 +1,56 @@
+"""Calendar windows, unit conversion and probabilities from the daily record"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from climatology import CONDITIONS, DAYS_PER_YEAR, convert_units, date_to_doy, window_bounds, window_days
+
+
+def test_window_wraps_past_december():
+    start, length = window_bounds('2021-12-20', 'month')
+    days = window_days('2021-12-20', 'month')
+    assert start + length > DAYS_PER_YEAR
+    assert len(days) == length
+    assert days[-1] < start
+    assert window_days(date(2021, 12, 20), 'month').tolist() == days.tolist()
+
+
+def test_window_bounds_rejects_missing_dates():
+    with pytest.raises(TypeError):
+        window_bounds(None, 'day')
+    with pytest.raises(ValueError):
+        window_bounds('20/12/2021', 'day')
+
+
+def test_feb_29_is_missing_outside_leap_years(climate):
+    feb_29 = date_to_doy(date(2024, 2, 29))
+    leap = (climate.years % 4 == 0)
+    values = climate.variables['tmax'][:, feb_29, 0, 0]
+    assert np.isnan(values[~leap]).all()
+    assert not np.isnan(values[leap]).any()
+
+
+def test_exceedance_probabilities_count_window_samples(climate, windows, scan):
+    for lat, lon, day, time_range in windows[:40]:
+        result = climate.exceedance_probabilities(lat, lon, day, time_range, list(CONDITIONS) + ['sunny'])
+        assert set(result) == set(CONDITIONS)
+        for condition, entry in result.items():
+            name, compare, threshold = CONDITIONS[condition]
+            samples = scan(name, lat, lon, day, time_range)
+            assert entry['samples'] == int((~np.isnan(samples)).sum())
+            assert entry['count'] == int(compare(samples, threshold).sum())
+
+
+@pytest.mark.parametrize('value, units, name, expected', [
+    (303.15, 'K', 'tmax', 86.0),
+    (30.0, 'degC', 'tmin', 86.0),
+    (10.0, 'm s-1', 'wind', 22.3694),
+    (25.4, 'mm', 'precip', 1.0),
+    (1 / 86400, 'kg m-2 s-1', 'precip', 1 / 25.4),
+    (0.5, '1', 'rh', 50.0),
+    (86.0, 'degF', 'tmax', 86.0)
+])
+def test_convert_units(value, units, name, expected):
+    assert float(convert_units(np.float64(value), units, name)) == pytest.approx(expected)
@@ -0,0 +1,98 @@
+"""Arrow, Parquet and NetCDF exports, written a row group at a time"""
+
+import io
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+import main
+from columnar import ColumnTable, available_formats, netCDF4, pa, pq, require, stream_table
+
+needs_pyarrow = pytest.mark.skipif(pa is None, reason='Arrow and Parquet need pyarrow')
+needs_netcdf4 = pytest.mark.skipif(netCDF4 is None, reason='NetCDF needs netCDF4')
+
+BATCH = {'locations': [[40.7, -74.0], '10, 20'], 'dates': ['2021-07-04', '2021-12-30'],
+         'timeRange': 'month', 'conditions': ['hot', 'wet']}
+
+
+def make_table(groups=3, rows=4):
+    rng = np.random.default_rng(2)
+    data = [{'place': rng.integers(0, 2, rows), 'value': rng.standard_normal(rows)} for _ in range(groups)]
+    table = ColumnTable([('place', np.int32), ('value', np.float64)], lambda: iter(data),
+                        labels={'place': ['Paris', 'Lima']}, attributes={'units': 'F'})
+    return table, data
+
+
+def test_available_formats():
+    assert set(available_formats()) == (
+        ({'arrow', 'parquet'} if pa is not None else set()) | ({'nc'} if netCDF4 is not None else set()))
+    with pytest.raises(ValueError):
+        require('xlsx')
+
+
+@needs_pyarrow
+def test_arrow_round_trip():
+    table, data = make_table()
+    chunks = list(stream_table(table, 'arrow'))
+    assert len(chunks) > len(data)
+    read = pa.ipc.open_stream(io.BytesIO(b''.join(chunks))).read_all()
+    assert read.num_rows == 12
+    assert read.schema.metadata == {b'units': b'F'}
+    np.testing.assert_array_equal(read.column('value').to_numpy(), np.concatenate([g['value'] for g in data]))
+    places = np.concatenate([g['place'] for g in data])
+    assert read.column('place').to_pylist() == [['Paris', 'Lima'][i] for i in places]
+
+
+@needs_pyarrow
+def test_parquet_keeps_row_groups():
+    table, data = make_table()
+    parquet = pq.ParquetFile(io.BytesIO(b''.join(stream_table(table, 'parquet'))))
+    assert parquet.num_row_groups == len(data)
+    values = parquet.read().column('value').to_numpy()
+    np.testing.assert_array_equal(values, np.concatenate([g['value'] for g in data]))
+
+
+@needs_netcdf4
+def test_netcdf_round_trip():
+    table, data = make_table()
+    handle, path = tempfile.mkstemp(suffix='.nc')
+    os.close(handle)
+    try:
+        with open(path, 'wb') as f:
+            for chunk in stream_table(table, 'nc'):
+                f.write(chunk)
+        with netCDF4.Dataset(path) as ds:
+            assert ds.units == 'F'
+            np.testing.assert_array_equal(ds['value'][:], np.concatenate([g['value'] for g in data]))
+            np.testing.assert_array_equal(ds['place'][:], np.concatenate([g['place'] for g in data]))
+            assert list(ds['place_label'][:]) == ['Paris', 'Lima']
+    finally:
+        os.remove(path)
+
+
+@needs_pyarrow
+def test_batch_download_as_arrow(client):
+    columns = client.post('/api/analyze/batch', json=BATCH).json['columns']
+    response = client.post('/api/download/batch?format=arrow', json=BATCH)
+    assert response.status_code == 200 and response.mimetype == 'application/vnd.apache.arrow.stream'
+    read = pa.ipc.open_stream(io.BytesIO(response.data)).read_all()
+    assert read.column('samples').to_pylist() == columns['samples']
+    np.testing.assert_array_equal(np.rint(read.column('hot').to_numpy()), columns['hot'])
+    assert read.column('date').to_pylist() == BATCH['dates'] * 2
+
+
+@pytest.mark.skipif(pa is not None, reason='pyarrow is installed')
+def test_missing_writer_is_501(client):
+    assert client.post('/api/download/batch?format=arrow', json=BATCH).status_code == 501
+
+
+@pytest.mark.parametrize('fmt', main.RESULT_FORMATS)
+def test_result_exports(client, fmt):
+    result = client.post('/api/analyze', json={'location': '40.7, -74.0', 'date': '2021-07-04',
+                                                'timeRange': 'week', 'conditions': ['hot', 'wet']}).json
+    assert set(result['exports']) == set(main.RESULT_FORMATS)
+    response = client.get(result['exports'][fmt])
+    assert response.status_code == 200 and response.data
+    assert response.headers['Content-Disposition'].endswith(f'.{fmt}')
@@ -0,0 +1,70 @@
+"""Joint, union and conditional probabilities must agree with scanning the daily record"""
+
+import numpy as np
+import pytest
+
+from climatology import CONDITIONS, Climatology, window_days
+from cooccurrence import build_cooccurrence
+
+CONDITION_SET = ['hot', 'wet', 'windy']
+
+
+@pytest.fixture(scope='module')
+def index(climate):
+    return build_cooccurrence(climate)
+
+
+def check_combine(climate, index, windows):
+    for lat, lon, day, time_range in windows:
+        i, j = climate.cell_index(lat, lon)
+        days = window_days(day, time_range)
+        hits, valid = {}, {}
+        for condition in CONDITION_SET:
+            name, compare, threshold = CONDITIONS[condition]
+            samples = climate.cell_series(name, i, j, days)
+            valid[condition] = ~np.isnan(samples)
+            hits[condition] = compare(samples, threshold) & valid[condition]
+        every = valid['hot'] & valid['wet'] & valid['windy']
+
+        result = index.combine(lat, lon, day, time_range, CONDITION_SET)
+        assert result['conditions'] == CONDITION_SET
+        assert result['all']['count'] == int((hits['hot'] & hits['wet'] & hits['windy']).sum())
+        assert result['any']['count'] == int(((hits['hot'] | hits['wet'] | hits['windy']) & every).sum())
+        assert result['all']['samples'] == result['any']['samples'] == int(every.sum())
+        assert len(result['conditional']) == 6
+        for entry in result['conditional']:
+            given = hits[entry['given']] & valid[entry['condition']]
+            assert entry['samples'] == int(given.sum())
+            assert entry['count'] == int((hits[entry['condition']] & given).sum())
+
+
+def test_combine_matches_scan(climate, index, windows):
+    check_combine(climate, index, windows)
+
+
+def test_validity_follows_each_condition(climate, windows):
+    # Precipitation missing where wind and temperature are not
+    gaps = np.random.default_rng(6).random(climate.variables['precip'].shape) < 0.3
+    variables = dict(climate.variables, precip=np.where(gaps, np.nan, climate.variables['precip']))
+    patchy = Climatology(climate.lat, climate.lon, climate.years, variables)
+    check_combine(patchy, build_cooccurrence(patchy), windows[:40])
+
+
+def test_combine_needs_two_known_conditions(index):
+    assert index.combine(40.7, -74.0, '2021-07-04', 'week', ['hot']) is None
+    assert index.combine(40.7, -74.0, '2021-07-04', 'week', ['hot', 'sunny']) is None
+    assert index.combine(40.7, -74.0, '2021-07-04', 'week', []) is None
+
+
+def test_analyze_reports_combined_probabilities(client, index):
+    payload = {'location': '40.7, -74.0', 'date': '2021-07-04', 'timeRange': 'month', 'conditions': ['hot', 'wet']}
+    combined = client.post('/api/analyze', json=payload).json['combined']
+    assert combined == index.combine(40.7, -74.0, '2021-07-04', 'month', ['hot', 'wet'])
+    assert client.post('/api/analyze', json=dict(payload, conditions=['hot'])).json['combined'] is None
+
+
+@pytest.mark.parametrize('conditions', [['hot', 'sunny'], 'hot', None, [['hot']]])
+def test_analyze_rejects_unknown_conditions(client, conditions):
+    payload = {'location': '40.7, -74.0', 'date': '2021-07-04', 'timeRange': 'week', 'conditions': conditions}
+    response = client.post('/api/analyze', json=payload)
+    assert response.status_code == 400 and 'conditions' in response.json['error']
@@ -0,0 +1,54 @@
+"""Heat index, humidex and the derived discomfort variable"""
+
+import numpy as np
+import pytest
+
+from climatology import Climatology, dew_point, discomfort_index, heat_index, humidex
+
+
+def fahrenheit(celsius):
+    return celsius * 9 / 5 + 32
+
+
+@pytest.mark.parametrize('temperature, humidity, expected', [
+    (80, 40, 80),     # Below 80 °F the simple formula applies
+    (90, 50, 95),
+    (100, 40, 109),
+    (96, 65, 121),
+    (86, 90, 105)     # High humidity adjustment
+])
+def test_heat_index_matches_nws_table(temperature, humidity, expected):
+    assert float(heat_index(temperature, humidity)) == pytest.approx(expected, abs=1)
+
+
+def test_heat_index_is_elementwise():
+    temperature = np.array([[90, 100], [80, 86]])
+    humidity = np.array([[50, 40], [40, 90]])
+    expected = [[heat_index(t, h) for t, h in zip(*rows)] for rows in zip(temperature, humidity)]
+    np.testing.assert_allclose(heat_index(temperature, humidity), expected, rtol=1e-6)
+
+
+def test_dew_point():
+    # 30 °C at 50% relative humidity has an 18.4 °C dew point
+    assert float(dew_point(fahrenheit(30), 50)) == pytest.approx(fahrenheit(18.4), abs=0.2)
+
+
+def test_humidex_matches_environment_canada():
+    # 30 °C air with a 15 °C dew point has a humidex of 34
+    humidity = 100 * np.exp(17.625 * 15 / (243.04 + 15) - 17.625 * 30 / (243.04 + 30))
+    assert float(humidex(fahrenheit(30), humidity)) == pytest.approx(fahrenheit(34), abs=0.5)
+
+
+def test_discomfort_index_dispatch():
+    assert discomfort_index(100, 40, 'heat_index') == pytest.approx(heat_index(100, 40))
+    assert discomfort_index(100, 40, 'humidex') == pytest.approx(humidex(100, 40))
+    with pytest.raises(ValueError):
+        discomfort_index(100, 40, 'wet_bulb')
+
+
+def test_climatology_derives_the_configured_index(climate):
+    variables = {name: climate.variables[name][:2] for name in ('tmax', 'tmin', 'wind', 'precip', 'rh')}
+    for method in ('heat_index', 'humidex'):
+        derived = Climatology(climate.lat, climate.lon, climate.years[:2], dict(variables), discomfort=method)
+        np.testing.assert_allclose(derived.variables['heat_index'],
+                                   discomfort_index(variables['tmax'], variables['rh'], method), rtol=1e-6)
@@ -0,0 +1,74 @@
+"""The ECDF index must agree with scanning the daily record at any threshold"""
+
+import numpy as np
+import pytest
+
+import main
+from climatology import CONDITIONS
+from ecdf_index import build_ecdf_index
+
+ANALYSIS = {'location': '40.7, -74.0', 'date': '2021-07-04', 'timeRange': 'month', 'conditions': ['hot', 'wet']}
+
+
+@pytest.fixture(scope='module')
+def ecdf(climate):
+    return build_ecdf_index(climate)
+
+
+def test_default_thresholds_match_scan(climate, ecdf, windows):
+    for lat, lon, day, time_range in windows:
+        expected = climate.exceedance_probabilities(lat, lon, day, time_range, CONDITIONS)
+        result = ecdf.lookup(lat, lon, day, time_range, CONDITIONS)
+        for condition, entry in expected.items():
+            assert result[condition]['count'] == entry['count']
+            assert result[condition]['samples'] == entry['samples']
+            assert result[condition]['threshold'] == CONDITIONS[condition][2]
+
+
+def test_custom_thresholds_match_scan(ecdf, windows, scan):
+    rng = np.random.default_rng(13)
+    for lat, lon, day, time_range in windows:
+        thresholds = {'hot': float(rng.uniform(40, 110)), 'cold': float(rng.uniform(0, 60)),
+                      'wet': float(rng.choice([0.0, 0.25, 1.0]))}
+        result = ecdf.lookup(lat, lon, day, time_range, list(thresholds), thresholds)
+        for condition, threshold in thresholds.items():
+            name, compare, _ = CONDITIONS[condition]
+            samples = scan(name, lat, lon, day, time_range)
+            valid = ~np.isnan(samples)
+            assert result[condition]['count'] == int((compare(samples, threshold) & valid).sum())
+            assert result[condition]['samples'] == int(valid.sum())
+
+
+def test_thresholds_at_sample_values(ecdf, scan):
+    # Strict comparisons must exclude samples equal to the threshold
+    samples = scan('tmax', 10.0, 20.0, '2021-03-01', 'week')
+    threshold = float(samples[2, 3])
+    result = ecdf.lookup(10.0, 20.0, '2021-03-01', 'week', ['hot'], {'hot': threshold})['hot']
+    assert result['count'] == int((samples > threshold).sum())
+
+
+def test_all_windows_match_window_counts(ecdf):
+    hits, valid = ecdf.all_windows(17, 30, 'hot', 85.0)
+    for start in (0, 200, 350, 365):
+        assert (hits[start], valid[start]) == ecdf.window_counts(17, start, 30, 'hot', 85.0)
+
+
+def test_analyze_with_custom_thresholds(client, ecdf):
+    response = client.post('/api/analyze', json=dict(ANALYSIS, thresholds={'hot': 75, 'wet': 0.5}))
+    assert response.status_code == 200
+    expected = ecdf.lookup(40.7, -74.0, '2021-07-04', 'month', ['hot', 'wet'], {'hot': 75.0, 'wet': 0.5})
+    for entry in response.json['probabilities']:
+        assert entry['threshold'] == expected[entry['condition']]['threshold']
+        assert entry['probability'] == round(expected[entry['condition']]['probability'])
+
+
+@pytest.mark.parametrize('thresholds', [{'hot': 'warm'}, {'hot': float('nan')}, {'sunny': 3}, [75]])
+def test_analyze_rejects_bad_thresholds(client, thresholds):
+    assert client.post('/api/analyze', json=dict(ANALYSIS, thresholds=thresholds)).status_code == 400
+
+
+def test_analysis_key_keeps_full_precision_thresholds(client):
+    index = main.get_exceedance_index()
+    keys = {main.analysis_key(index, 40.7, -74.0, '2021-07-04', 'month', ['hot'], {'hot': value})
+            for value in (75.0, 75.0000001, 75.0000002)}
+    assert len(keys) == 3
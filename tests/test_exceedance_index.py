@@ -0,0 +1,72 @@
+"""The exceedance index must agree with scanning the daily record"""
+
+import numpy as np
+import pytest
+
+from climatology import CONDITIONS, Climatology, DAYS_PER_YEAR, window_bounds
+from exceedance_index import append_years, build_index, load_index
+
+TIME_RANGES = ('day', 'week', 'month', 'season')
+
+
+@pytest.fixture(scope='module')
+def index(climate):
+    return build_index(climate)
+
+
+def test_windows_wrap_past_december(windows):
+    wrapping = [w for w in windows if sum(window_bounds(w[2], w[3])) > DAYS_PER_YEAR]
+    assert len(wrapping) >= len(windows) // 5
+
+
+def test_lookup_matches_scan(climate, index, windows):
+    for lat, lon, day, time_range in windows:
+        expected = climate.exceedance_probabilities(lat, lon, day, time_range, CONDITIONS)
+        assert index.lookup(lat, lon, day, time_range, CONDITIONS) == expected
+
+
+def test_samples_follow_each_condition(climate, windows):
+    # Precipitation missing where temperature is not, e.g. IMERG gaps under MERRA-2
+    gaps = np.random.default_rng(6).random(climate.variables['precip'].shape) < 0.3
+    variables = dict(climate.variables, precip=np.where(gaps, np.nan, climate.variables['precip']))
+    patchy = Climatology(climate.lat, climate.lon, climate.years, variables)
+    index = build_index(patchy)
+    assert index.samples.shape == index.counts.shape
+    fewer = 0
+    for lat, lon, day, time_range in windows[:40]:
+        expected = patchy.exceedance_probabilities(lat, lon, day, time_range, CONDITIONS)
+        assert index.lookup(lat, lon, day, time_range, CONDITIONS) == expected
+        fewer += expected['wet']['samples'] < expected['hot']['samples']
+    assert fewer > 20
+
+
+def test_lookup_many_matches_lookup(index, windows):
+    lats, lons = np.array([w[0] for w in windows]), np.array([w[1] for w in windows])
+    for time_range in TIME_RANGES:
+        starts = np.array([window_bounds(w[2], time_range)[0] for w in windows])
+        length = window_bounds(windows[0][2], time_range)[1]
+        probabilities, samples = index.lookup_many(lats, lons, starts, length, ['hot', 'wet'])
+        for k, (lat, lon, day, _) in enumerate(windows):
+            single = index.lookup(lat, lon, day, time_range, ['hot', 'wet'])
+            assert probabilities[0, k] == pytest.approx(single['hot']['probability'])
+            assert probabilities[1, k] == pytest.approx(single['wet']['probability'])
+            assert samples[k] == min(single['hot']['samples'], single['wet']['samples'])
+
+
+def test_save_and_load(index, tmp_path):
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    loaded = load_index(path)
+    assert tuple(loaded.conditions) == tuple(index.conditions)
+    np.testing.assert_array_equal(loaded.counts, index.counts)
+    np.testing.assert_array_equal(loaded.samples, index.samples)
+
+
+def test_append_years_matches_full_build(climate, index):
+    first = Climatology(climate.lat, climate.lon, climate.years[:5],
+                        {name: values[:5] for name, values in climate.variables.items()})
+    appended = append_years(build_index(first), climate)
+    np.testing.assert_array_equal(appended.years, index.years)
+    np.testing.assert_array_equal(appended.counts, index.counts)
+    np.testing.assert_array_equal(appended.samples, index.samples)
+    assert append_years(appended, climate) is appended
@@ -0,0 +1,78 @@
+"""CSV downloads streamed a chunk at a time"""
+
+import csv
+import io
+
+import pytest
+
+import main
+
+ANALYSIS = {'location': '40.7, -74.0', 'date': '2021-07-04', 'timeRange': 'week', 'conditions': ['hot', 'wet']}
+BATCH = {'locations': [[40.7, -74.0], '10, 20'], 'dates': ['2021-07-04', '2021-12-30'],
+         'timeRange': 'month', 'conditions': ['hot', 'wet']}
+
+
+def read_csv(response):
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'].startswith('attachment; filename=')
+    return list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+
+
+def test_stream_csv_yields_chunks(monkeypatch):
+    monkeypatch.setattr(main, 'CSV_CHUNK_ROWS', 2)
+    chunks = list(main.stream_csv([[i, 'x'] for i in range(5)]))
+    assert len(chunks) == 3
+    assert b''.join(chunks).decode().splitlines() == [f'{i},x' for i in range(5)]
+
+
+def test_report_download(client):
+    result = client.post('/api/analyze', json=ANALYSIS).json
+    rows = read_csv(client.post('/api/download/csv', json=result))
+    assert rows[1] == ['Location', result['location']]
+    labels = [row[0] for row in rows[6:6 + len(result['probabilities'])]]
+    assert labels == [prob['label'] for prob in result['probabilities']]
+    assert len(rows) == 9 + len(result['probabilities']) + len(result['historicalData']['labels'])
+
+
+@pytest.mark.parametrize('body', [
+    {'location': 'x'},
+    {'location': 'x', 'date': 'd', 'timeRange': 'week', 'probabilities': [{'label': 'Hot'}],
+     'historicalData': {'labels': [], 'temperature': [], 'precipitation': []}},
+    {'location': 'x', 'date': 'd', 'timeRange': 'week', 'probabilities': [],
+     'historicalData': {'labels': ['a', 'b'], 'temperature': [1], 'precipitation': [1]}},
+    ['not', 'an', 'object']
+])
+def test_report_download_rejects_malformed_results(client, body):
+    assert client.post('/api/download/csv', json=body).status_code == 400
+
+
+def test_report_download_rejects_non_json(client):
+    response = client.post('/api/download/csv', data='not json', content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_batch_download_matches_batch_analysis(client, monkeypatch):
+    monkeypatch.setattr(main, 'EXPORT_CHUNK_ROWS', 3)
+    columns = client.post('/api/analyze/batch', json=BATCH).json['columns']
+    rows = read_csv(client.post('/api/download/batch', json=BATCH))
+    assert rows[0] == ['location', 'date', 'samples', 'hot', 'wet']
+    assert len(rows) == 5
+    assert [row[1] for row in rows[1:]] == BATCH['dates'] * 2
+    assert [int(row[2]) for row in rows[1:]] == columns['samples']
+    assert [int(row[3]) for row in rows[1:]] == columns['hot']
+    assert [int(row[4]) for row in rows[1:]] == columns['wet']
+
+
+def test_batch_download_rejects_malformed_payloads(client):
+    payload = dict(BATCH, conditions=['sunny'])
+    assert client.post('/api/download/batch', json=payload).status_code == 400
+
+
+def test_series_download(client):
+    query = 'location=40.7,-74.0&date=2021-07-04&timeRange=week&variables=tmax,precip'
+    series = client.get(f'/api/series?{query}').json
+    rows = read_csv(client.get(f'/api/download/series?{query}'))
+    assert rows[0] == ['Year', 'tmax (°F)', 'precip (inches)']
+    assert [int(row[0]) for row in rows[1:1 + len(series['years'])]] == series['years']
+    assert rows[-2][0] == 'Trend per decade' and rows[-1][0] == 'p-value'
+    assert client.get('/api/download/series?location=40.7,-74.0&variables=tmax').status_code == 400
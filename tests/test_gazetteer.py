@@ -0,0 +1,73 @@
+"""Offline gazetteer search and resolution"""
+
+import numpy as np
+import pytest
+
+from gazetteer import MAX_RESULTS, Gazetteer, load_gazetteer, normalize
+
+
+@pytest.fixture(scope='module')
+def synthetic():
+    """A few thousand places sharing long prefixes, with aliases"""
+    rng = np.random.default_rng(19)
+    syllables = ['san', 'ta', 'ma', 'ri', 'a', 'no', 'ber', 'lin', 'port', 'o']
+    names = [''.join(rng.choice(syllables, rng.integers(2, 5))).title() for _ in range(3000)]
+    population = rng.integers(1000, 10_000_000, len(names))
+    aliases = [(k, name) for k, name in enumerate(names)] + [(k, name.upper()) for k, name in enumerate(names)]
+    return Gazetteer(names, ['XX'] * len(names), [''] * len(names), rng.uniform(-90, 90, len(names)),
+                     rng.uniform(-180, 180, len(names)), population, aliases)
+
+
+def test_search_ranks_prefix_matches_by_population(synthetic):
+    for prefix in ('s', 'sa', 'san', 'santa', 'mari', 'berlinpo', 'Zz'):
+        matches = [k for k, name in enumerate(synthetic.names) if normalize(name).startswith(normalize(prefix))]
+        expected = sorted(matches, key=lambda k: -synthetic.population[k])[:10]
+        assert [place['population'] for place in synthetic.search(prefix)] == \
+            [int(synthetic.population[k]) for k in expected]
+
+
+def test_search_limit_is_clamped(synthetic):
+    assert len(synthetic.search('sa', limit=0)) == 1
+    assert len(synthetic.search('san', limit=1000)) == MAX_RESULTS
+    assert synthetic.search('   ') == []
+
+
+def test_resolve_bundled_dump():
+    gazetteer = load_gazetteer()
+    assert gazetteer.resolve('new york')['name'] == 'New York City'
+    assert gazetteer.resolve('NYC')['name'] == 'New York City'
+    assert gazetteer.resolve('Paris, FR')['country'] == 'FR'
+    assert gazetteer.resolve('Paris, ZZ') is None
+    assert gazetteer.resolve('Atlantis') is None
+
+
+def test_resolve_country_names(tmp_path):
+    gazetteer = load_gazetteer()
+    assert gazetteer.resolve('Paris, France')['country'] == 'FR'
+    assert gazetteer.resolve('paris, fra')['country'] == 'FR'
+    assert gazetteer.resolve('London, United Kingdom')['country'] == 'GB'
+    assert gazetteer.resolve('Paris, Germany') is None
+    codes_only = load_gazetteer(countries_path=str(tmp_path / 'missing.tsv'))
+    assert codes_only.resolve('Paris, France') is None
+    assert codes_only.resolve('Paris, FR')['country'] == 'FR'
+
+
+def test_normalize_strips_accents():
+    assert normalize('  Zürich ') == normalize('zurich') == 'zurich'
+
+
+def test_geocode_endpoint(client):
+    response = client.get('/api/geocode?q=Par&limit=3')
+    assert response.status_code == 200
+    place = response.json['results'][0]
+    assert place['name'] == 'Paris' and place['country'] == 'FR'
+    assert np.hypot(place['lat'] - 48.85, place['lon'] - 2.35) < 0.1
+
+
+def test_analyze_resolves_place_names(client):
+    payload = {'date': '2021-07-04', 'timeRange': 'week', 'conditions': ['hot']}
+    by_name = client.post('/api/analyze', json=dict(payload, location='Paris')).json
+    by_point = client.post('/api/analyze', json=dict(payload, location='48.85341, 2.3488')).json
+    assert by_name['probabilities'] == by_point['probabilities']
+    qualified = client.post('/api/analyze', json=dict(payload, location='Paris, France'))
+    assert qualified.status_code == 200 and qualified.json['probabilities'] == by_point['probabilities']
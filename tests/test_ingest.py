@@ -0,0 +1,67 @@
+"""Ingest into the point-major store: equivalence with the record and resuming"""
+
+import os
+
+import numpy as np
+import pytest
+
+from climatology import VARIABLES
+from ingest import ingest, pending_blocks
+from point_store import PointStore, block_path
+
+# Uneven blocks, so the last row and column of blocks are partial
+BLOCK = (5, 7)
+
+
+@pytest.fixture(scope='module')
+def source(climate, tmp_path_factory):
+    path = tmp_path_factory.mktemp('record') / 'record.npz'
+    climate.save(str(path))
+    return ('climatology', str(path))
+
+
+@pytest.fixture(scope='module')
+def store(source, tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('store'))
+    ingest(source, root, BLOCK, workers=2)
+    return root
+
+
+def test_point_store_matches_the_record(climate, store):
+    points = PointStore(store)
+    np.testing.assert_array_equal(points.years, climate.years)
+    assert points.variables == VARIABLES
+    for name in VARIABLES:
+        for i in range(len(climate.lat)):
+            for j in range(len(climate.lon)):
+                np.testing.assert_array_equal(points.cell_series(name, i, j), climate.cell_series(name, i, j))
+
+
+def test_series_snaps_to_the_nearest_cell(climate, store):
+    points = PointStore(store)
+    i, j = climate.cell_index(48.85, 2.35)
+    np.testing.assert_array_equal(points.series('tmax', 48.85, 2.35), climate.cell_series('tmax', i, j))
+
+
+def test_resume_only_writes_missing_blocks(source, store, tmp_path):
+    assert pending_blocks(store) == []
+    removed = block_path(store, 'precip', 1, 2)
+    kept = block_path(store, 'tmax', 0, 0)
+    before = os.stat(kept).st_mtime_ns
+    os.remove(removed)
+    # An interrupted write leaves only a temporary file behind
+    with open(f'{removed}.tmp999', 'wb') as f:
+        f.write(b'partial')
+    assert pending_blocks(store) == [(1, 2)]
+
+    assert ingest(source, store, BLOCK, workers=1) == 1
+    assert os.path.exists(removed)
+    assert os.stat(kept).st_mtime_ns == before
+    assert ingest(source, store, BLOCK, workers=1) == 0
+
+
+def test_resume_rejects_other_options(source, store):
+    with pytest.raises(ValueError):
+        ingest(source, store, (4, 4), workers=1)
+    with pytest.raises(ValueError):
+        ingest(source, store, BLOCK, workers=1, discomfort='humidex')
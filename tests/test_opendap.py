@@ -0,0 +1,114 @@
+"""OPeNDAP hyperslab fetching, offline against the stand-in server"""
+
+import threading
+import urllib.request
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from chunk_cache import ChunkCache
+from climatology import date_to_doy
+from opendap import Hyperslab, OpendapFetcher, aiohttp, parse_dods
+from opendap_standin import StandInHandler, start_standin
+
+needs_aiohttp = pytest.mark.skipif(aiohttp is None, reason='fetching needs aiohttp')
+
+SLAB = Hyperslab('T2MMAX', (2, 5), (10, 14))
+
+
+@pytest.fixture(scope='module')
+def standin(climate):
+    server, base_url = start_standin(climate=climate)
+    yield server, base_url + '/%Y%m%d.nc4'
+    server.shutdown()
+
+
+def expected(climate, day, slab):
+    """The slab as the stand-in cuts it from the climatology"""
+    y = climate.years.tolist().index(day.year)
+    return climate.variables['tmax'][y, date_to_doy(day), slab.lat[0]:slab.lat[1] + 1,
+                                     slab.lon[0]:slab.lon[1] + 1][None]
+
+
+def test_constraint():
+    assert SLAB.constraint() == 'T2MMAX[0:0][2:5][10:14]'
+    assert SLAB.chunk() == (0, 0, 2, 5, 10, 14)
+
+
+def test_parse_dods(climate, standin):
+    _, template = standin
+    day = date(int(climate.years[1]), 7, 4)
+    with urllib.request.urlopen(f'{day.strftime(template)}.dods?{SLAB.constraint()}') as response:
+        values = parse_dods(response.read())
+    assert values.shape == (1, 4, 5)
+    np.testing.assert_array_equal(values, expected(climate, day, SLAB))
+    with pytest.raises(ValueError):
+        parse_dods(b'Dataset {\n} x;\n')
+
+
+@needs_aiohttp
+def test_fetch_range(climate, standin):
+    _, template = standin
+    fetcher = OpendapFetcher(template, dataset='standin', max_concurrency=4)
+    first = date(int(climate.years[0]), 12, 25)
+    values = fetcher.fetch_range(first, first + timedelta(days=13), SLAB)
+    assert values.shape == (14, 4, 5)
+    for n in (0, 6, 7, 13):
+        np.testing.assert_array_equal(values[n:n + 1], expected(climate, first + timedelta(days=n), SLAB))
+    assert fetcher.stats['requests'] == 14 and fetcher.stats['retries'] == 0
+
+
+@needs_aiohttp
+def test_chunk_cache_skips_repeat_requests(climate, standin, tmp_path):
+    _, template = standin
+    cache = ChunkCache(str(tmp_path))
+    first = date(int(climate.years[2]), 3, 1)
+    fetched = OpendapFetcher(template, dataset='standin', cache=cache)
+    values = fetched.fetch_range(first, first + timedelta(days=4), SLAB)
+    cached = OpendapFetcher(template, dataset='standin', cache=cache)
+    np.testing.assert_array_equal(cached.fetch_range(first, first + timedelta(days=4), SLAB), values)
+    assert cached.stats['requests'] == 0
+    assert cache.stats['hits'] == 5
+
+
+class FlakyHandler(StandInHandler):
+    """Answers 503 to the first request for every granule"""
+
+    def do_GET(self):
+        with self.server.lock:
+            first = self.path not in self.server.seen
+            self.server.seen.add(self.path)
+        if first:
+            return self._send(503, b'Busy')
+        return super().do_GET()
+
+
+@pytest.fixture
+def flaky(climate):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    server.daemon_threads = True
+    server.climate, server.seen, server.lock = climate, set(), threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/%Y%m%d.nc4'
+    server.shutdown()
+
+
+@needs_aiohttp
+def test_transient_errors_are_retried(climate, flaky):
+    fetcher = OpendapFetcher(flaky, dataset='standin', backoff=0.01)
+    first = date(int(climate.years[0]), 6, 1)
+    values = fetcher.fetch_range(first, first + timedelta(days=2), SLAB)
+    np.testing.assert_array_equal(values[1:2], expected(climate, first + timedelta(days=1), SLAB))
+    assert fetcher.stats['retries'] == 3 and fetcher.stats['requests'] == 6
+
+
+@needs_aiohttp
+def test_missing_granules_fail_without_retrying(climate, standin):
+    _, template = standin
+    fetcher = OpendapFetcher(template, dataset='standin', backoff=0.01)
+    missing = date(int(climate.years[-1]) + 1, 1, 1)
+    with pytest.raises(aiohttp.ClientResponseError):
+        fetcher.fetch_range(missing, missing, SLAB)
+    assert fetcher.stats['retries'] == 0
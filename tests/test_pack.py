@@ -0,0 +1,79 @@
+"""Pack files round-trip the climatology and its indexes"""
+
+import numpy as np
+import pytest
+
+from climatology import CONDITIONS, VARIABLES
+from climatology_pack import open_pack, write_pack
+from cooccurrence import build_cooccurrence
+from exceedance_index import build_index
+from window_sums import build_window_sums
+
+
+@pytest.fixture(scope='module')
+def pack(climate, tmp_path_factory):
+    path = tmp_path_factory.mktemp('pack') / 'climatology.pack'
+    write_pack(str(path), climate)
+    return open_pack(str(path))
+
+
+def test_axes_round_trip(climate, pack):
+    restored = pack.climatology()
+    np.testing.assert_array_equal(restored.lat, climate.lat)
+    np.testing.assert_array_equal(restored.lon, climate.lon)
+    np.testing.assert_array_equal(restored.years, climate.years)
+    assert restored.source == climate.source
+    assert restored.discomfort == climate.discomfort
+
+
+@pytest.mark.parametrize('name', VARIABLES)
+def test_variables_within_quantization_step(climate, pack, name):
+    original = climate.variables[name]
+    stored = pack.variable(name)
+    restored = stored[:]
+    np.testing.assert_array_equal(np.isnan(restored), np.isnan(original))
+    # Half a quantization step, plus float32 rounding of the dequantized value
+    assert np.nanmax(np.abs(restored - original)) <= stored.scale * 0.51
+
+
+def test_variable_slices_match_full_reads(pack):
+    stored = pack.variable('tmax')
+    np.testing.assert_array_equal(stored[:, 10:20, 3, 4], stored[:][:, 10:20, 3, 4])
+
+
+def test_exceedance_index_round_trips(climate, pack):
+    index, restored = build_index(climate), pack.exceedance_index()
+    assert tuple(restored.conditions) == tuple(index.conditions)
+    np.testing.assert_array_equal(restored.counts, index.counts)
+    np.testing.assert_array_equal(restored.samples, index.samples)
+
+
+def test_window_sums_round_trip(climate, pack):
+    sums, restored = build_window_sums(climate), pack.window_sums()
+    assert restored.variables == sums.variables
+    for array in ('sums', 'sums_sq', 'counts'):
+        np.testing.assert_array_equal(getattr(restored, array), getattr(sums, array))
+
+
+def test_pack_ecdf_matches_pack_climatology(pack):
+    # Quantization is monotonic, so the stored sorted samples answer like the stored record
+    restored, ecdf = pack.climatology(), pack.ecdf_index()
+    for lat, lon, day in ((40.0, -100.0, '2021-07-01'), (-30.0, 150.0, '2021-12-20'), (70.0, 20.0, '2021-02-27')):
+        expected = restored.exceedance_probabilities(lat, lon, day, 'month', CONDITIONS)
+        result = ecdf.lookup(lat, lon, day, 'month', CONDITIONS)
+        for condition, entry in expected.items():
+            assert (result[condition]['count'], result[condition]['samples']) == (entry['count'], entry['samples'])
+
+
+def test_cooccurrence_round_trips(climate, pack):
+    bits, restored = build_cooccurrence(climate), pack.cooccurrence()
+    assert tuple(restored.conditions) == tuple(bits.conditions)
+    np.testing.assert_array_equal(restored.bits, bits.bits)
+    np.testing.assert_array_equal(restored.valid, bits.valid)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'not.pack'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        open_pack(str(path))
@@ -0,0 +1,70 @@
+"""Pre-compressed static bodies and the index page"""
+
+import gzip
+
+from flask import Flask, request
+
+from precompressed import MIN_COMPRESS_BYTES, PrecompressedBody
+
+BODY = '<p>' + 'weather ' * 200 + '</p>'
+
+
+def respond(body, headers=None):
+    app = Flask(__name__)
+    with app.test_request_context(headers=headers or {}):
+        return body.response(request)
+
+
+def test_negotiates_gzip():
+    body = PrecompressedBody(BODY, 'text/html')
+    response = respond(body, {'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == BODY.encode()
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['Cache-Control'] == 'public, max-age=0, must-revalidate'
+
+
+def test_identity_without_accept_encoding():
+    response = respond(PrecompressedBody(BODY, 'text/html'))
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == BODY.encode()
+
+
+def test_small_and_incompressible_bodies_stay_identity():
+    assert set(PrecompressedBody('x' * (MIN_COMPRESS_BYTES - 1), 'text/plain').encodings) == {'identity'}
+    assert set(PrecompressedBody(BODY, 'image/png', compress=False).encodings) == {'identity'}
+
+
+def test_gzip_is_deterministic():
+    assert PrecompressedBody(BODY, 'text/html').encodings['gzip'] == \
+        PrecompressedBody(BODY, 'text/html').encodings['gzip']
+
+
+def test_revalidation():
+    body = PrecompressedBody(BODY, 'text/html')
+    etag = respond(body).headers['ETag']
+    response = respond(body, {'If-None-Match': etag})
+    assert response.status_code == 304 and response.get_data() == b''
+    assert respond(body, {'If-None-Match': '"stale"'}).status_code == 200
+    assert PrecompressedBody(BODY + ' ', 'text/html').etag != body.etag
+
+
+def test_each_encoding_has_its_own_etag():
+    body = PrecompressedBody(BODY, 'text/html')
+    identity = respond(body).headers['ETag']
+    compressed = respond(body, {'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert identity == f'"{body.etag}"' and compressed == f'"{body.etag}-gzip"'
+    for etag in (identity, compressed):
+        assert respond(body, {'If-None-Match': etag, 'Accept-Encoding': 'gzip'}).status_code == 304
+        assert respond(body, {'If-None-Match': etag}).status_code == 304
+    revalidated = respond(body, {'If-None-Match': identity, 'Accept-Encoding': 'gzip'})
+    assert revalidated.headers['ETag'] == compressed
+
+
+def test_index_page(client):
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and response.mimetype == 'text/html'
+    assert response.headers['Content-Encoding'] in ('gzip', 'br')
+    revalidated = client.get('/', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
@@ -0,0 +1,132 @@
+"""Region rasterization against brute-force point-in-polygon tests"""
+
+import numpy as np
+import pytest
+
+from regions import RegionMaskCache, points_in_polygon, rasterize
+from spatial import make_grid
+
+LAT = np.arange(-88.75, 90, 2.5)
+LON = np.arange(-178.75, 180, 2.5)
+
+
+@pytest.fixture(params=['regular', 'irregular'])
+def grid(request):
+    if request.param == 'regular':
+        return make_grid(LAT, LON)
+    # Latitudes bunched towards the poles, as on a Gaussian grid
+    return make_grid(np.degrees(np.arcsin(np.linspace(-0.999, 0.999, 72))), LON)
+
+
+def cell_centers(grid):
+    return grid.cell_centers(np.arange(grid.size))
+
+
+def crossings(ring, x, y):
+    """Edges of a closed ring crossed by a ray from (x, y) towards +x"""
+    count = 0
+    for (x0, y0), (x1, y1) in zip(ring[:-1], ring[1:]):
+        if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+            count += 1
+    return count
+
+
+def brute_force(grid, rings):
+    """Cells whose centre is inside the rings by the even-odd rule, one at a time"""
+    lats, lons = cell_centers(grid)
+    rings = [np.asarray(ring, dtype=float) for ring in rings]
+    return np.array([k for k in range(grid.size)
+                     if sum(crossings(ring, lons[k], lats[k]) for ring in rings) % 2], dtype=np.intp)
+
+
+def test_bbox_covers_cell_centres_inside(grid):
+    mask = rasterize(grid, {'bbox': [-10, 35, 30, 60]})
+    lats, lons = cell_centers(grid)
+    expected = np.flatnonzero((lats >= 35) & (lats <= 60) & (lons >= -10) & (lons <= 30))
+    np.testing.assert_array_equal(mask.cells, expected)
+    assert mask.kind == 'polygon'
+    assert mask.weights.sum() == pytest.approx(1)
+    # Area weights shrink towards the pole
+    assert mask.weights[np.argmax(lats[mask.cells])] < mask.weights[np.argmin(lats[mask.cells])]
+
+
+def test_polygon_with_hole_matches_brute_force(grid):
+    outer = [[-120, 20], [-60, 15], [-70, 55], [-110, 50], [-120, 20]]
+    hole = [[-100, 30], [-80, 30], [-90, 40], [-100, 30]]
+    mask = rasterize(grid, {'type': 'Polygon', 'coordinates': [outer, hole]})
+    expected = brute_force(grid, [outer, hole])
+    np.testing.assert_array_equal(mask.cells, expected)
+
+
+def test_multipolygon_feature_is_the_union_of_its_parts(grid):
+    first = [[0, 0], [20, 0], [20, 20], [0, 0]]
+    second = [[100, -40], [140, -40], [120, -10], [100, -40]]
+    feature = {'type': 'Feature', 'properties': {},
+               'geometry': {'type': 'MultiPolygon', 'coordinates': [[first], [second]]}}
+    mask = rasterize(grid, feature)
+    expected = np.union1d(brute_force(grid, [first]), brute_force(grid, [second]))
+    np.testing.assert_array_equal(mask.cells, expected)
+
+
+def test_points_in_polygon_blocks_agree():
+    rng = np.random.default_rng(3)
+    ring = np.array([[0, 0], [10, 0], [10, 10], [5, 4], [0, 10], [0, 0]], dtype=float)
+    lons, lats = rng.uniform(-2, 12, 5000), rng.uniform(-2, 12, 5000)
+    inside = points_in_polygon([ring], lons, lats)
+    expected = np.array([crossings(ring, x, y) % 2 == 1 for x, y in zip(lons, lats)])
+    np.testing.assert_array_equal(inside, expected)
+
+
+def test_small_polygon_uses_the_cell_below_it(grid):
+    mask = rasterize(grid, {'type': 'Polygon', 'coordinates': [[[2.1, 2.1], [2.2, 2.1], [2.2, 2.2], [2.1, 2.1]]]})
+    assert mask.cells.tolist() == [int(grid.nearest(2.133, 2.167))]
+
+
+def test_route_weights_follow_its_length(grid):
+    # Two legs along the equator, the second twice as long
+    mask = rasterize(grid, {'type': 'LineString', 'coordinates': [[0, 0.1], [10, 0.1], [30, 0.1]]})
+    assert mask.kind == 'line'
+    assert mask.weights.sum() == pytest.approx(1)
+    lats, lons = grid.cell_centers(mask.cells)
+    assert lons.min() < 2.5 and lons.max() > 27.5
+    assert np.abs(lats).max() < 2 * grid.resolution
+    assert mask.centroid[1] == pytest.approx(15, abs=grid.resolution)
+
+
+@pytest.mark.parametrize('region', [
+    {'bbox': [10, 0, 0, 10]},
+    {'bbox': [0, 0, 10]},
+    {'bbox': 'everywhere'},
+    {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 1]]]},
+    {'type': 'LineString', 'coordinates': [[0, 0]]},
+    {'type': 'Point', 'coordinates': [0, 0]},
+    {'type': 'Feature', 'geometry': 'nowhere'},
+    [0, 0, 10, 10]
+])
+def test_malformed_regions_raise_value_error(grid, region):
+    with pytest.raises(ValueError):
+        rasterize(grid, region)
+
+
+def test_mask_cache_is_keyed_by_geometry():
+    grid = make_grid(LAT, LON)
+    cache = RegionMaskCache(max_entries=2)
+    first = cache.get(grid, {'bbox': [0, 0, 10, 10]})
+    assert cache.get(grid, {'bbox': [0, 0, 10, 10]}) is first
+    cache.get(grid, {'bbox': [0, 0, 20, 20]})
+    cache.get(grid, {'bbox': [0, 0, 30, 30]})
+    assert cache.get(grid, {'bbox': [0, 0, 10, 10]}) is not first
+    assert cache.stats == {'hits': 1, 'misses': 4}
+
+
+def test_analyze_region(client):
+    request = {'date': '2021-07-04', 'timeRange': 'week', 'conditions': ['hot', 'wet']}
+    response = client.post('/api/analyze', json=dict(request, region={'bbox': [-100, 30, -70, 50]}))
+    assert response.status_code == 200
+    region = response.json['region']
+    assert region['type'] == 'polygon' and region['cells'] > 1
+    for entry in response.json['probabilities']:
+        assert 0 <= entry['probability'] <= entry['max'] <= 100
+    route = {'type': 'LineString', 'coordinates': [[-74, 40.7], [-87.6, 41.9]]}
+    assert client.post('/api/analyze', json=dict(request, region=route)).json['region']['type'] == 'line'
+    assert client.post('/api/analyze', json=dict(request, region={'bbox': [10, 0, 0]})).status_code == 400
@@ -0,0 +1,76 @@
+"""Float32 frames and MessagePack responses"""
+
+import json
+import struct
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import MIMEAccept
+
+from response_encoding import (FLOAT32_FRAME, JSON, MSGPACK, encode, encode_frame, json_bytes, msgpack,
+                               negotiate)
+
+ANALYSIS = {'location': '40.7, -74.0', 'date': '2021-07-04', 'timeRange': 'week', 'conditions': ['hot', 'wet']}
+PATHS = [('historicalData', 'temperature'), ('historicalData', 'precipitation')]
+
+
+def decode_frame(body):
+    """Header with each series replaced by its float32 values"""
+    (length,) = struct.unpack('<I', body[:4])
+    assert (4 + length) % 4 == 0
+    header = json.loads(body[4:4 + length])
+    for key in ('temperature', 'precipitation'):
+        entry = header['historicalData'][key]
+        assert entry['dtype'] == 'float32' and entry['offset'] % 4 == 0
+        header['historicalData'][key] = np.frombuffer(body, '<f4', entry['length'], entry['offset'])
+    return header
+
+
+@pytest.mark.parametrize('n', [0, 1, 7, 3000])
+def test_frame_round_trip(n):
+    rng = np.random.default_rng(n)
+    data = {'location': 'x', 'historicalData': {'labels': list(range(n)), 'temperature': rng.random(n).tolist(),
+                                                'precipitation': rng.random(n).tolist()}}
+    original = json.loads(json.dumps(data))
+    decoded = decode_frame(encode_frame(data, PATHS))
+    assert data == original
+    assert decoded['location'] == 'x' and decoded['historicalData']['labels'] == list(range(n))
+    for key in ('temperature', 'precipitation'):
+        np.testing.assert_array_equal(decoded['historicalData'][key], np.float32(data['historicalData'][key]))
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('', JSON),
+    ('application/json', JSON),
+    ('application/x-float32-frame', FLOAT32_FRAME),
+    ('application/json;q=0.5, application/x-float32-frame', FLOAT32_FRAME),
+    ('text/html', JSON)
+])
+def test_negotiate(accept, expected):
+    values = [(value.split(';')[0].strip(), float(value.split('q=')[1]) if 'q=' in value else 1)
+              for value in accept.split(',') if value]
+    assert negotiate(MIMEAccept(values)) == expected
+
+
+def test_json_bytes():
+    assert json.loads(json_bytes({'a': [1.5, 2]})) == {'a': [1.5, 2]}
+    assert json.loads(encode({'a': [1]}, JSON)) == {'a': [1]}
+
+
+@pytest.mark.skipif(msgpack is None, reason='MessagePack needs msgpack')
+def test_msgpack():
+    assert negotiate(MIMEAccept([('application/x-msgpack', 1)])) == MSGPACK
+    data = {'historicalData': {'temperature': [1.5, 2.5], 'precipitation': [0.25]}}
+    body = msgpack.unpackb(encode(data, MSGPACK, PATHS), raw=False)
+    np.testing.assert_array_equal(np.frombuffer(body['historicalData']['temperature'], '<f4'), [1.5, 2.5])
+
+
+def test_analyze_as_frame(client):
+    expected = client.post('/api/analyze', json=ANALYSIS).json
+    response = client.post('/api/analyze', json=ANALYSIS, headers={'Accept': FLOAT32_FRAME})
+    assert response.status_code == 200 and response.mimetype == FLOAT32_FRAME
+    assert response.headers['Vary'] == 'Accept'
+    decoded = decode_frame(response.data)
+    assert decoded['probabilities'] == expected['probabilities']
+    for key in ('temperature', 'precipitation'):
+        np.testing.assert_allclose(decoded['historicalData'][key], expected['historicalData'][key], rtol=1e-6)
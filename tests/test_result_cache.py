@@ -0,0 +1,95 @@
+"""ResultCache LRU/TTL eviction, the SQLite tier and grid-snapped analysis keys"""
+
+import types
+
+import pytest
+
+import main
+import result_cache
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable stand-in for the time module used by the cache"""
+    now = types.SimpleNamespace(value=1000.0)
+    fake = types.SimpleNamespace(monotonic=lambda: now.value, time=lambda: now.value)
+    monkeypatch.setattr(result_cache, 'time', fake)
+    return now
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now least recently used
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats['evictions'] == 1
+
+
+def test_ttl_expiry(clock):
+    cache = ResultCache(ttl=10)
+    cache.put('a', {'probability': 12.5})
+    clock.value += 9
+    assert cache.get('a') == {'probability': 12.5}
+    clock.value += 2
+    assert cache.get('a') is None
+    assert cache.stats['expirations'] == 1
+
+
+def test_uncounted_gets_leave_the_counters_alone():
+    cache = ResultCache()
+    cache.put('a', 1)
+    cache.get('a', count=False)
+    cache.get('b', count=False)
+    assert cache.stats['hits'] == cache.stats['misses'] == 0
+    cache.get('a')
+    cache.get('b')
+    snapshot = cache.snapshot()
+    assert (snapshot['hits'], snapshot['misses'], snapshot['size'], snapshot['hitRatio']) == (1, 1, 1, 0.5)
+
+
+def test_disk_tier_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'results.db')
+    first, second = ResultCache(disk_path=path), ResultCache(max_entries=1, disk_path=path)
+    first.put('a', {'values': [1.5, 2.5]})
+    assert second.get('a') == {'values': [1.5, 2.5]}
+    assert second.stats['diskHits'] == 1
+    # Evicted from memory, still on disk
+    second.put('b', 2)
+    assert second.get('a') == {'values': [1.5, 2.5]}
+    first.clear()
+    assert ResultCache(disk_path=path).get('a') is None
+
+
+def test_disk_entries_expire(tmp_path, clock):
+    path = str(tmp_path / 'results.db')
+    ResultCache(ttl=10, disk_path=path).put('a', 1)
+    clock.value += 11
+    assert ResultCache(ttl=10, disk_path=path).get('a') is None
+
+
+def test_nearby_clicks_share_an_analysis(client, climate):
+    request = {'date': '2021-07-04', 'timeRange': 'week', 'conditions': ['hot', 'wet']}
+    # Two points inside the same 15-degree cell, then one in the next cell
+    lat, lon = float(climate.lat[8]), float(climate.lon[10])
+    main.analysis_cache.clear()
+    before = dict(main.analysis_cache.stats)
+    for location in (f'{lat}, {lon}', f'{lat + 2}, {lon - 3}', f'{lat + 15}, {lon}'):
+        assert client.post('/api/analyze', json=dict(request, location=location)).status_code == 200
+    assert main.analysis_cache.stats['hits'] - before['hits'] == 1
+    assert main.analysis_cache.stats['misses'] - before['misses'] == 2
+    stats = client.get('/api/cache/stats').json
+    assert stats['size'] == 2 and 'singleFlight' in stats
+
+
+@pytest.mark.parametrize('date', [None, 20210704, '2021-13-01', 'July 4th'])
+def test_analyze_rejects_malformed_dates(client, date):
+    request = {'location': '40.7, -74.0', 'timeRange': 'week', 'conditions': ['hot']}
+    if date is not None:
+        request['date'] = date
+    response = client.post('/api/analyze', json=request)
+    assert response.status_code == 400
+    assert response.json == {'error': 'Date must be formatted as YYYY-MM-DD'}
@@ -0,0 +1,48 @@
+"""Stored results under content-derived ids"""
+
+import pytest
+
+ANALYSIS = {'location': '40.7, -74.0', 'date': '2021-07-04', 'timeRange': 'week', 'conditions': ['hot', 'wet']}
+BATCH = {'locations': [[40.7, -74.0], '10, 20'], 'dates': ['2021-07-04', '2021-12-30'],
+         'timeRange': 'month', 'conditions': ['hot', 'wet']}
+
+
+def test_repeat_analysis_reuses_its_result(client):
+    first = client.post('/api/analyze', json=ANALYSIS).json
+    second = client.post('/api/analyze', json=ANALYSIS).json
+    assert first['resultId'] == second['resultId']
+    other = client.post('/api/analyze', json=dict(ANALYSIS, date='2021-07-05')).json
+    assert other['resultId'] != first['resultId']
+
+
+def test_analysis_exports(client):
+    result = client.post('/api/analyze', json=ANALYSIS).json
+    assert set(result['exports']) >= {'csv', 'json'}
+    response = client.get(result['exports']['csv'])
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    assert response.get_data(as_text=True).startswith('Weather Analysis Report')
+    response = client.get(result['exports']['json'])
+    assert 'attachment' in response.headers['Content-Disposition']
+    assert response.json['probabilities'] == result['probabilities']
+
+
+def test_batch_exports(client):
+    result = client.post('/api/analyze/batch', json=BATCH).json
+    assert client.post('/api/analyze/batch', json=BATCH).json['resultId'] == result['resultId']
+    assert client.get(result['exports']['json']).json['columns'] == result['columns']
+    lines = client.get(result['exports']['csv']).get_data(as_text=True).strip().splitlines()
+    assert len(lines) == 1 + result['rows']
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'json'])
+def test_exports_revalidate(client, fmt):
+    url = client.post('/api/analyze', json=ANALYSIS).json['exports'][fmt]
+    response = client.get(url)
+    assert response.headers['Cache-Control'].startswith('private, max-age=')
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_unknown_results(client):
+    result_id = client.post('/api/analyze', json=ANALYSIS).json['resultId']
+    assert client.get('/api/results/00000000000000000000.csv').status_code == 404
+    assert client.get(f'/api/results/{result_id}.xlsx').status_code == 404
@@ -0,0 +1,74 @@
+"""/api/series year-by-year values and trends"""
+
+import numpy as np
+import pytest
+
+import main
+from ingest import ingest
+from point_store import PointStore
+from trends import linear_trend, t_test_pvalue
+
+QUERY = 'location=40.7,-74.0&date=2021-12-20&timeRange=month&variables=tmax,precip'
+
+
+@pytest.mark.parametrize('t, dof, expected', [
+    (2.306, 8, 0.05),    # Two-sided critical values of Student's t
+    (2.228, 10, 0.05),
+    (3.169, 10, 0.01),
+    (1.96, 10_000, 0.05),
+    (0.0, 5, 1.0)
+])
+def test_t_test_pvalue(t, dof, expected):
+    assert t_test_pvalue(t, dof) == pytest.approx(expected, abs=2e-4)
+
+
+def test_linear_trend_matches_polyfit():
+    rng = np.random.default_rng(4)
+    x = np.arange(1990, 2020, dtype=np.float64)
+    values = np.vstack([0.3 * x + rng.standard_normal(len(x)), rng.standard_normal(len(x))])
+    values[1, [3, 7]] = np.nan
+    trend = linear_trend(x, values)
+    for k in range(2):
+        valid = ~np.isnan(values[k])
+        slope, intercept = np.polyfit(x[valid], values[k, valid], 1)
+        assert trend['slope'][k] == pytest.approx(slope)
+        assert trend['intercept'][k] == pytest.approx(intercept)
+        assert trend['n'][k] == valid.sum()
+        assert trend['rSquared'][k] == pytest.approx(np.corrcoef(x[valid], values[k, valid])[0, 1] ** 2)
+    assert trend['pValue'][0] < 0.05
+    assert np.isnan(linear_trend(x[:2], values[:, :2])['slope']).all()
+
+
+def test_series_matches_scan(client, scan):
+    response = client.get(f'/api/series?{QUERY}')
+    assert response.status_code == 200
+    body = response.json
+    tmax = scan('tmax', 40.7, -74.0, '2021-12-20', 'month')
+    precip = scan('precip', 40.7, -74.0, '2021-12-20', 'month')
+    np.testing.assert_allclose(body['series']['tmax'], np.nanmean(tmax, axis=1), atol=0.006)
+    np.testing.assert_allclose(body['series']['precip'], np.nanmean(precip, axis=1) * precip.shape[1], atol=0.006)
+    slope = np.polyfit(body['years'], np.nanmean(tmax, axis=1), 1)[0]
+    assert body['trends']['tmax']['slopePerDecade'] == pytest.approx(10 * slope, abs=1e-3)
+    assert len(body['trends']['tmax']['fitted']) == len(body['years'])
+    assert body['metadata']['source'] == 'climatology'
+
+
+def test_series_from_the_point_store(client, climate, tmp_path, monkeypatch):
+    path = tmp_path / 'record.npz'
+    climate.save(str(path))
+    ingest(('climatology', str(path)), str(tmp_path / 'store'), (6, 6), workers=1)
+    expected = client.get(f'/api/series?{QUERY}').json
+    monkeypatch.setattr(main, 'point_store', PointStore(str(tmp_path / 'store')))
+    body = client.get(f'/api/series?{QUERY}').json
+    assert body['metadata']['source'] == 'point store'
+    assert body['series'] == expected['series'] and body['trends'] == expected['trends']
+
+
+@pytest.mark.parametrize('query', [
+    'location=40.7,-74.0&variables=tmax',
+    'location=40.7,-74.0&date=2021-13-01',
+    'location=40.7,-74.0&date=2021-07-04&variables=snow',
+    'location=Atlantis&date=2021-07-04'
+])
+def test_series_rejects_malformed_queries(client, query):
+    assert client.get(f'/api/series?{query}').status_code == 400
@@ -0,0 +1,96 @@
+"""Single-flight coalescing of concurrent calls"""
+
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight, fcntl
+
+CALLERS = 8
+
+
+def run_concurrently(flight, key, fn, callers=CALLERS):
+    """Results (or raised errors) of callers all calling flight.do at once"""
+    results = [None] * callers
+    barrier = threading.Barrier(callers)
+
+    def call(k):
+        barrier.wait()
+        try:
+            results[k] = flight.do(key, fn)
+        except Exception as error:
+            results[k] = error
+
+    threads = [threading.Thread(target=call, args=(k,)) for k in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def slow(calls, result):
+    """Function that records its calls and takes long enough for everyone to pile up"""
+    def fn():
+        calls.append(threading.get_ident())
+        time.sleep(0.2)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return fn
+
+
+def test_concurrent_callers_share_one_computation():
+    flight, calls = SingleFlight(), []
+    results = run_concurrently(flight, 'cell-42', slow(calls, {'hot': 12.5}))
+    assert len(calls) == 1
+    assert results == [{'hot': 12.5}] * CALLERS
+    assert all(result is results[0] for result in results)
+    assert flight.snapshot() == {'leaders': 1, 'coalesced': CALLERS - 1, 'inFlight': 0, 'crossProcess': False}
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    flight, calls = SingleFlight(), []
+    error = RuntimeError('dataset unavailable')
+    assert run_concurrently(flight, 'k', slow(calls, error)) == [error] * CALLERS
+    assert flight.do('k', lambda: 'recovered') == 'recovered'
+    assert len(calls) == 1
+
+
+def test_distinct_keys_run_independently():
+    flight, calls = SingleFlight(), []
+    threads = [threading.Thread(target=flight.do, args=(key, slow(calls, key))) for key in ('a', 'b', 'c')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert len(calls) == 3
+    assert flight.stats == {'leaders': 3, 'coalesced': 0}
+
+
+def _locked_increment(lock_dir, path):
+    """Read-modify-write of a counter file under the key's lock, in another process"""
+    def increment():
+        with open(path) as f:
+            value = int(f.read())
+        time.sleep(0.05)
+        with open(path, 'w') as f:
+            f.write(str(value + 1))
+    SingleFlight(lock_dir).do('same-key', increment)
+
+
+@pytest.mark.skipif(fcntl is None, reason='cross-process locking needs fcntl')
+def test_lock_files_serialize_workers(tmp_path):
+    path = tmp_path / 'counter'
+    path.write_text('0')
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_locked_increment, args=(str(tmp_path / 'locks'), str(path)))
+               for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=20)
+    assert path.read_text() == '4'
+    assert SingleFlight(str(tmp_path / 'locks')).snapshot()['crossProcess']
@@ -0,0 +1,81 @@
+"""Nearest-cell lookup and interpolation weights on regular and uneven grids"""
+
+import numpy as np
+import pytest
+
+from spatial import IrregularGrid, RegularGrid, interpolate, make_grid
+
+LON = np.arange(-177.5, 180, 5.0)
+
+
+def great_circle_nearest(lat_axis, lon_axis, lats, lons):
+    """Flat ids of the nearest (lat, lon) axis pairs by central angle"""
+    cell_lats, cell_lons = (a.ravel() for a in np.meshgrid(lat_axis, lon_axis, indexing='ij'))
+    lat1, lat2 = np.radians(lats)[:, None], np.radians(cell_lats)[None]
+    dlon = np.radians(lons[:, None] - cell_lons[None])
+    cosine = np.sin(lat1) * np.sin(lat2) + np.cos(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.argmax(cosine, axis=1)
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(11)
+    # Keep clear of the poles, where every column is about equally near
+    return rng.uniform(-80, 80, 2000), rng.uniform(-180, 180, 2000)
+
+
+def test_make_grid_picks_the_grid_type():
+    assert isinstance(make_grid(np.arange(-87.5, 90, 5.0), LON), RegularGrid)
+    gaussian = np.degrees(np.arcsin(np.linspace(-0.99, 0.99, 36)))
+    grid = make_grid(gaussian, LON)
+    assert isinstance(grid, IrregularGrid)
+    assert grid.shape == (36, len(LON))
+    with pytest.raises(ValueError):
+        make_grid(np.zeros((3, 3)), LON)
+
+
+def test_regular_grid_rejects_uneven_axes():
+    with pytest.raises(ValueError):
+        RegularGrid(np.array([0.0, 1.0, 3.0, 6.0]), LON)
+
+
+def test_regular_grid_nearest_wraps_longitude(points):
+    lat_axis = np.arange(-87.5, 90, 5.0)
+    grid = make_grid(lat_axis, LON)
+    lats, lons = points
+    rows, columns = grid.nearest_rows_columns(lats, lons)
+    np.testing.assert_array_equal(rows, np.argmin(np.abs(lats[:, None] - lat_axis), axis=1))
+    distance = np.abs((lons[:, None] - LON + 180) % 360 - 180)
+    np.testing.assert_array_equal(columns, np.argmin(distance, axis=1))
+    assert grid.nearest(0.0, 181.0) == grid.nearest(0.0, -179.0)
+    assert grid.nearest(0.0, 359.0) == grid.nearest(0.0, -1.0)
+
+
+def test_irregular_grid_nearest_matches_great_circle(points):
+    lat_axis = np.degrees(np.arcsin(np.linspace(-0.99, 0.99, 36)))
+    grid = make_grid(lat_axis, LON)
+    lats, lons = points
+    np.testing.assert_array_equal(grid.nearest(lats, lons), great_circle_nearest(lat_axis, LON, lats, lons))
+    rows, columns = grid.nearest_rows_columns(lats, lons)
+    np.testing.assert_array_equal(rows * len(LON) + columns, grid.nearest(lats, lons))
+
+
+@pytest.mark.parametrize('method', ['bilinear', 'idw'])
+def test_interpolation_of_a_latitude_field(method):
+    grid = make_grid(np.arange(-87.5, 90, 5.0), LON)
+    lat_field = np.repeat(grid.lat, len(LON))
+    _, weights = grid.weights(np.array([10.0, -33.3]), np.array([20.0, 100.0]), method)
+    np.testing.assert_allclose(weights.sum(axis=-1), 1)
+    values = interpolate(grid, lat_field, np.array([10.0, -33.3]), np.array([20.0, 100.0]), method)
+    if method == 'bilinear':
+        np.testing.assert_allclose(values, [10.0, -33.3])
+    else:
+        # Within the span of the surrounding cell centres
+        assert np.all(np.abs(values - [10.0, -33.3]) <= 5.0)
+
+
+def test_contains():
+    grid = make_grid(np.arange(22.5, 50, 5.0), np.arange(-122.5, -70, 5.0))
+    assert grid.contains(35.0, -100.0)
+    assert not grid.contains(-10.0, -100.0)
+    assert not grid.contains(35.0, 40.0)
@@ -0,0 +1,99 @@
+"""PNG encoding and probability tiles"""
+
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from climatology import Climatology
+from exceedance_index import build_index
+from tiles import COLORMAP, TILE_SIZE, TileRenderer, colorize, encode_png, tile_lat_lon, valid_tile
+
+
+def decode_png(png):
+    """(height, width, 4) array of an RGBA PNG written with filter type 0"""
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks, offset = {}, 8
+    while offset < len(png):
+        length, kind = struct.unpack('>I4s', png[offset:offset + 8])
+        data = png[offset + 8:offset + 8 + length]
+        crc, = struct.unpack('>I', png[offset + 8 + length:offset + 12 + length])
+        assert crc == zlib.crc32(kind + data)
+        chunks[kind] = chunks.get(kind, b'') + data
+        offset += 12 + length
+    width, height, depth, color_type = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+    assert (depth, color_type) == (8, 6)
+    assert b'IEND' in chunks
+    scanlines = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(height, -1)
+    assert not scanlines[:, 0].any()
+    return scanlines[:, 1:].reshape(height, width, 4)
+
+
+@pytest.fixture(scope='module')
+def renderer(climate):
+    return TileRenderer(build_index(climate))
+
+
+def test_encode_png_round_trip():
+    rgba = np.random.default_rng(5).integers(0, 256, (3, 7, 4), dtype=np.uint8)
+    np.testing.assert_array_equal(decode_png(encode_png(rgba)), rgba)
+
+
+def test_colorize():
+    rgba = colorize(np.array([0.0, 40.0, 100.0, np.nan]))
+    np.testing.assert_array_equal(rgba[:3], COLORMAP[[0, 102, 255]])
+    assert not rgba[3].any()
+
+
+def test_tile_bounds():
+    lats, lons = tile_lat_lon(0, 0, 0)
+    assert lats[0] == pytest.approx(85.05, abs=0.5) and lats[-1] == pytest.approx(-85.05, abs=0.5)
+    assert lons[0] == pytest.approx(-180, abs=1) and lons[-1] == pytest.approx(180, abs=1)
+    assert valid_tile(2, 3, 3) and not valid_tile(2, 4, 0) and not valid_tile(-1, 0, 0)
+
+
+def test_field_matches_index_lookup(climate, renderer):
+    field = renderer.field('hot', 180, 7)
+    lat, lon = 32.5, -97.5
+    expected = renderer.index.lookup(lat, lon, '2021-06-29', 'week', ['hot'])['hot']['probability']
+    assert field[renderer.index.grid.nearest(lat, lon)] == pytest.approx(expected)
+
+
+def test_tile_pixels_follow_the_field(renderer):
+    rgba = decode_png(renderer.render('hot', 180, 7, 1, 0, 0))
+    assert rgba.shape == (TILE_SIZE, TILE_SIZE, 4)
+    lats, lons = tile_lat_lon(1, 0, 0)
+    field = renderer.field('hot', 180, 7)
+    for row, column in ((0, 0), (100, 200), (255, 128)):
+        cell = renderer.index.grid.nearest(lats[row], lons[column])
+        np.testing.assert_array_equal(rgba[row, column], colorize(field[[cell]])[0])
+
+
+def test_tile_cache(climate, tmp_path):
+    renderer = TileRenderer(build_index(climate), str(tmp_path))
+    first = renderer.tile('wet', 10, 1, 2, 1, 1)
+    assert renderer.tile('wet', 10, 1, 2, 1, 1) == first
+    assert renderer.stats == {'rendered': 1, 'cacheHits': 1}
+    assert len(list(tmp_path.rglob('*.png'))) == 1
+
+
+def test_cache_version_follows_the_index(climate):
+    variables = {name: climate.variables[name] for name in ('tmax', 'tmin', 'wind', 'precip', 'rh')}
+    humidex = Climatology(climate.lat, climate.lon, climate.years, variables, discomfort='humidex')
+    version = TileRenderer(build_index(climate)).version
+    assert TileRenderer(build_index(climate)).version == version
+    assert TileRenderer(build_index(humidex)).version != version
+    assert version.startswith(f'{climate.years[0]}-{climate.years[-1]}-')
+
+
+def test_tile_route(client):
+    response = client.get('/api/tiles/hot/180/2/1/1.png?timeRange=week')
+    assert response.status_code == 200 and response.mimetype == 'image/png'
+    assert decode_png(response.data).shape == (TILE_SIZE, TILE_SIZE, 4)
+    assert 'max-age' in response.headers['Cache-Control']
+    assert client.get('/api/tiles/hot/180/2/1/1.png?interpolation=bilinear').status_code == 200
+    assert client.get('/api/tiles/sunny/180/2/1/1.png').status_code == 404
+    assert client.get('/api/tiles/hot/180/2/4/1.png').status_code == 404
+    assert client.get('/api/tiles/hot/400/2/1/1.png').status_code == 404
+    assert client.get('/api/tiles/hot/180/2/1/1.png?interpolation=cubic').status_code == 404
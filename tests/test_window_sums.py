@@ -0,0 +1,42 @@
+"""Window sums and the chart series built from them must agree with raw scans"""
+
+import numpy as np
+import pytest
+
+import main
+from climatology import window_bounds
+from window_sums import build_window_sums
+
+
+@pytest.fixture(scope='module')
+def sums(climate):
+    return build_window_sums(climate)
+
+
+def test_mean_and_variance_match_scan(sums, windows, scan):
+    for lat, lon, day, time_range in windows:
+        cell = sums.cell(lat, lon)
+        start, length = window_bounds(day, time_range)
+        for name in sums.variables:
+            samples = scan(name, lat, lon, day, time_range)
+            assert sums.mean(name, cell, start, length) == pytest.approx(np.nanmean(samples), rel=1e-6)
+            assert sums.variance(name, cell, start, length) == pytest.approx(np.nanvar(samples), rel=1e-4, abs=1e-6)
+
+
+def test_vectorized_windows_match_single_windows(sums):
+    starts, lengths = np.array([0, 100, 350, 365]), np.array([7, 30, 30, 2])
+    means = sums.mean('tmax', 7, starts, lengths)
+    for k, (start, length) in enumerate(zip(starts, lengths)):
+        assert means[k] == pytest.approx(sums.mean('tmax', 7, start, length))
+
+
+def test_chart_periods_match_scan(client, climate, scan):
+    data = main.generate_historical_data('2021-12-20', 'month', 40.7, -74.0)
+    assert len(data['temperature']) == len(data['labels']) == 4
+    tmax, tmin = scan('tmax', 40.7, -74.0, '2021-12-20', 'month'), scan('tmin', 40.7, -74.0, '2021-12-20', 'month')
+    precip = scan('precip', 40.7, -74.0, '2021-12-20', 'month')
+    edges = np.cumsum([0] + list(main.period_sizes(tmax.shape[1], 4)))
+    for k, (first, last) in enumerate(zip(edges[:-1], edges[1:])):
+        expected = (np.nanmean(tmax[:, first:last]) + np.nanmean(tmin[:, first:last])) / 2
+        assert data['temperature'][k] == pytest.approx(expected, abs=0.05)
+        assert data['precipitation'][k] == pytest.approx(np.nanmean(precip[:, first:last]) * (last - first), abs=0.005)
@@ -0,0 +1,240 @@
+"""
+XYZ probability tiles for the map overlay
+Renders 256x256 Web Mercator PNG tiles of the exceedance probability of one
+condition for a day-of-year window, straight from the exceedance index. The
+colormap and PNG encoding are vectorized NumPy (no imaging library needed).
+Tiles are written to a disk cache shared by all workers; pre-seed the low
+zoom levels across a process pool with:
+
+    python tiles.py seed --output tile_cache/ --max-zoom 3 --workers 8
+"""
+
+import argparse
+import hashlib
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from climatology import CONDITIONS, DAYS_PER_YEAR, load_dataset
+from climatology_pack import open_pack
+from exceedance_index import build_index, load_index
+from spatial import interpolate
+
+TILE_SIZE = 256
+MAX_ZOOM = 12
+
+# Probability fields kept in memory per (condition, day, length, interpolation)
+FIELD_CACHE_SIZE = 64
+
+# Colour stops from 0% to 100%: transparent, then green, amber and red
+_STOPS = np.array([
+    [0, 16, 185, 129, 0],
+    [5, 16, 185, 129, 90],
+    [40, 245, 158, 11, 150],
+    [70, 239, 68, 68, 190],
+    [100, 153, 27, 27, 220]
+], dtype=np.float64)
+
+COLORMAP = np.stack([
+    np.interp(np.linspace(0, 100, 256), _STOPS[:, 0], _STOPS[:, channel])
+    for channel in range(1, 5)
+], axis=-1).round().astype(np.uint8)
+
+
+def tile_lat_lon(z, x, y, size=TILE_SIZE):
+    """Latitudes of the pixel rows and longitudes of the pixel columns of a tile"""
+    world = size * 2 ** z
+    pixels = np.arange(size) + 0.5
+    lons = (x * size + pixels) / world * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y * size + pixels) / world))))
+    return lats, lons
+
+
+def colorize(probabilities):
+    """Map percentages (NaN for no data) onto RGBA through the colormap"""
+    levels = np.clip(np.nan_to_num(probabilities) * 2.55, 0, 255).round().astype(np.uint8)
+    rgba = COLORMAP[levels]
+    rgba[np.isnan(probabilities)] = 0
+    return rgba
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def encode_png(rgba):
+    """Encode an (height, width, 4) uint8 array as an RGBA PNG"""
+    height, width = rgba.shape[:2]
+    # Every scanline starts with filter type 0 (None)
+    scanlines = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = rgba.reshape(height, -1)
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', header) +
+            _png_chunk(b'IDAT', zlib.compress(scanlines.tobytes(), 6)) + _png_chunk(b'IEND', b''))
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def index_digest(index):
+    """Short hash of an index's conditions and counts"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(','.join(index.conditions).encode())
+    for counts in (index.counts, index.samples):
+        digest.update(np.ascontiguousarray(counts))
+    return digest.hexdigest()
+
+
+class TileRenderer:
+    """Render and cache probability tiles for one exceedance index
+
+    With a cache root, tiles are stored as
+    <root>/<version>/<condition>/<length>/<interpolation>/<day>/<z>/<x>/<y>.png
+    where the version is the index's year range and a hash of its counts, so
+    a rebuilt index (other years, a new discomfort method or fresh data)
+    never serves stale tiles.
+    """
+
+    def __init__(self, index, cache_root=None):
+        self.index = index
+        self.cache_root = cache_root
+        self.version = f'{index.years[0]}-{index.years[-1]}-{index_digest(index)}'
+        self._fields = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'rendered': 0, 'cacheHits': 0}
+
+    def field(self, condition, doy, length):
+        """Probability of a condition in every grid cell, NaN without samples"""
+        key = (condition, doy, length)
+        with self._lock:
+            if key in self._fields:
+                self._fields.move_to_end(key)
+                return self._fields[key]
+        cells = np.arange(self.index.grid.size)
+        hits, total = self.index.window_counts(cells, np.full(cells.shape, doy), length)
+        row = self.index.conditions.index(condition)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            field = np.where(total[row] > 0, 100.0 * hits[row] / total[row], np.nan)
+        with self._lock:
+            self._fields[key] = field
+            while len(self._fields) > FIELD_CACHE_SIZE:
+                self._fields.popitem(last=False)
+        return field
+
+    def render(self, condition, doy, length, z, x, y, interpolation='nearest'):
+        """PNG bytes of one tile"""
+        grid = self.index.grid
+        lats, lons = tile_lat_lon(z, x, y)
+        lats, lons = np.meshgrid(lats, lons, indexing='ij')
+        field = self.field(condition, doy, length)
+        if interpolation == 'nearest':
+            values = field[grid.nearest(lats, lons)]
+        else:
+            values = interpolate(grid, field, lats, lons, interpolation)
+        values[~grid.contains(lats, lons)] = np.nan
+        return encode_png(colorize(values))
+
+    def _path(self, condition, doy, length, z, x, y, interpolation):
+        return os.path.join(self.cache_root, self.version, condition, str(length), interpolation,
+                            str(doy), str(z), str(x), f'{y}.png')
+
+    def tile(self, condition, doy, length, z, x, y, interpolation='nearest'):
+        """Cached tile, rendering and storing it on a miss"""
+        path = None
+        if self.cache_root:
+            path = self._path(condition, doy, length, z, x, y, interpolation)
+            try:
+                with open(path, 'rb') as f:
+                    png = f.read()
+                with self._lock:
+                    self.stats['cacheHits'] += 1
+                return png
+            except FileNotFoundError:
+                pass
+
+        png = self.render(condition, doy, length, z, x, y, interpolation)
+        with self._lock:
+            self.stats['rendered'] += 1
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.tmp{os.getpid()}.{threading.get_ident()}'
+            with open(tmp_path, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        return png
+
+
+def open_index(pack=None, index=None, dataset=None):
+    """Exceedance index from a pack, a saved index or a dataset, as main.py loads it"""
+    pack = pack or os.environ.get('CLIMATOLOGY_PACK')
+    index = index or os.environ.get('EXCEEDANCE_INDEX_PATH')
+    if pack:
+        return open_pack(pack).exceedance_index()
+    if index and os.path.exists(index):
+        return load_index(index)
+    return build_index(load_dataset(dataset))
+
+
+# Renderer of the current seeding worker, set by _init_worker
+_renderer = None
+
+
+def _init_worker(sources, cache_root):
+    global _renderer
+    _renderer = TileRenderer(open_index(*sources), cache_root)
+
+
+def _seed_zoom(condition, doy, length, z, interpolation):
+    for x in range(2 ** z):
+        for y in range(2 ** z):
+            _renderer.tile(condition, doy, length, z, x, y, interpolation)
+    return 4 ** z
+
+
+def seed(sources, cache_root, conditions, days, length=1, max_zoom=3,
+         interpolation='nearest', workers=None):
+    """Render every tile up to max_zoom for the given conditions and days"""
+    jobs = [(condition, int(doy), length, z, interpolation)
+            for condition in conditions for doy in days for z in range(max_zoom + 1)]
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(sources, cache_root)) as pool:
+        futures = [pool.submit(_seed_zoom, *job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            rendered += future.result()
+            if done % 100 == 0 or done == len(futures):
+                print(f'[{done}/{len(futures)}] {rendered} tiles')
+    return rendered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pre-seed the probability tile cache')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_command = commands.add_parser('seed', help='Render low zoom levels into the tile cache')
+    seed_command.add_argument('--output', required=True, help='Tile cache directory (TILE_CACHE_DIR)')
+    seed_command.add_argument('--pack', help='Climatology pack (default: CLIMATOLOGY_PACK)')
+    seed_command.add_argument('--index', help='Exceedance index (default: EXCEEDANCE_INDEX_PATH)')
+    seed_command.add_argument('--dataset', help='Dataset to index when neither is given')
+    seed_command.add_argument('--conditions', nargs='+', default=list(CONDITIONS))
+    seed_command.add_argument('--every', type=int, default=1, help='Seed every Nth day-of-year')
+    seed_command.add_argument('--window', type=int, default=1, help='Window length in days')
+    seed_command.add_argument('--max-zoom', type=int, default=3)
+    seed_command.add_argument('--interpolation', choices=('nearest', 'bilinear', 'idw'), default='nearest')
+    seed_command.add_argument('--workers', type=int, default=None)
+
+    args = parser.parse_args(argv)
+    days = range(0, DAYS_PER_YEAR, max(args.every, 1))
+    count = seed((args.pack, args.index, args.dataset), args.output, args.conditions, days,
+                 args.window, min(args.max_zoom, MAX_ZOOM), args.interpolation, args.workers)
+    print(f'Seeded {count} tiles into {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Year-by-year window series and their linear trends
+Reduces a cell's (years, 366) record to one value per year for a
+day-of-year window, then fits an ordinary least-squares trend to every
+series at once and tests the slope against zero with a t-test.
+"""
+
+import math
+
+import numpy as np
+
+try:
+    from scipy.special import betainc
+except ImportError:  # Continued-fraction fallback below
+    betainc = None
+
+# Variables summed over the window (mean daily value x window length);
+# all others are averaged
+TOTAL_VARIABLES = ('precip',)
+
+UNITS = {
+    'tmax': '°F',
+    'tmin': '°F',
+    'heat_index': '°F',
+    'wind': 'mph',
+    'precip': 'inches',
+    'rh': '%'
+}
+
+# Two-sided p-value below which a trend is reported as significant
+SIGNIFICANCE_LEVEL = 0.05
+
+
+def window_aggregate(series, days, name):
+    """One value per year of a (years, 366) series over the given days
+
+    Missing days (Feb 29 of non-leap years, gaps) are skipped; years with no
+    valid day are NaN.
+    """
+    values = np.asarray(series[:, days], dtype=np.float64)
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=1)
+    mean = np.where(valid, values, 0).sum(axis=1) / np.maximum(count, 1)
+    mean[count == 0] = np.nan
+    return mean * len(days) if name in TOTAL_VARIABLES else mean
+
+
+def _continued_fraction(a, b, x):
+    """Lentz evaluation of the incomplete beta continued fraction"""
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1.0) < 1e-12:
+            break
+    return result
+
+
+def _regularized_beta(a, b, x):
+    if betainc is not None:
+        return float(betainc(a, b, x))
+    if x <= 0 or x >= 1:
+        return float(x >= 1)
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                     + a * math.log(x) + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _continued_fraction(a, b, x) / a
+    return 1.0 - front * _continued_fraction(b, a, 1 - x) / b
+
+
+def t_test_pvalue(t, dof):
+    """Two-sided p-value of Student's t with dof degrees of freedom"""
+    if not np.isfinite(dof) or dof < 1 or np.isnan(t):
+        return float('nan')
+    if np.isinf(t):
+        return 0.0
+    return _regularized_beta(dof / 2, 0.5, dof / (dof + t * t))
+
+
+def linear_trend(x, values):
+    """OLS slope, intercept, r^2, p-value and sample size of each row of values
+
+    x is (n,) and values (rows, n) with NaN for missing points; every row is
+    fitted in the same vectorized pass.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    valid = ~np.isnan(y)
+    n = valid.sum(axis=1)
+    safe_n = np.maximum(n, 1)
+    x_mean = (valid * x).sum(axis=1) / safe_n
+    y_mean = np.where(valid, y, 0).sum(axis=1) / safe_n
+    dx = np.where(valid, x - x_mean[:, None], 0)
+    dy = np.where(valid, y - y_mean[:, None], 0)
+    sxx = (dx * dx).sum(axis=1)
+    syy = (dy * dy).sum(axis=1)
+    sxy = (dx * dy).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        residual = np.maximum(syy - slope * sxy, 0)
+        r_squared = np.where(syy > 0, 1 - residual / syy, np.nan)
+        stderr = np.sqrt(residual / (n - 2) / sxx)
+        t = np.where(stderr > 0, slope / stderr, np.sign(slope) * np.inf)
+    too_few = n < 3
+    slope[too_few] = intercept[too_few] = r_squared[too_few] = t[too_few] = np.nan
+    p_value = np.array([t_test_pvalue(t_k, n_k - 2) for t_k, n_k in zip(t, n)])
+    return {
+        'slope': slope,
+        'intercept': intercept,
+        'rSquared': r_squared,
+        'pValue': p_value,
+        'n': n
+    }
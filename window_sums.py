@@ -0,0 +1,82 @@
+"""
+Prefix sums along the day-of-year axis
+Cumulative sums, sums of squares and valid counts (over all years) per grid
+cell, so the mean, variance or total of any window is O(1) whatever its
+start date and length.
+"""
+
+import numpy as np
+
+from climatology import DAYS_PER_YEAR
+from spatial import make_grid
+
+SUM_VARIABLES = ('tmax', 'tmin', 'precip')
+
+
+class WindowSums:
+    """sums[v, d, cell] is the sum of variable v over all years and days < d
+
+    sums_sq holds the same for squared values and counts[v, d, cell] the
+    number of valid samples. All carry a leading zero row.
+    """
+
+    def __init__(self, variables, lat, lon, years, sums, sums_sq, counts, grid=None):
+        self.variables = tuple(variables)
+        self.years = np.asarray(years, dtype=np.int32)
+        self.grid = grid or make_grid(lat, lon)
+        self.sums = sums.reshape(sums.shape[:2] + (-1,))
+        self.sums_sq = sums_sq.reshape(sums_sq.shape[:2] + (-1,))
+        self.counts = counts.reshape(counts.shape[:2] + (-1,))
+        self._position = {name: k for k, name in enumerate(self.variables)}
+
+    def _window(self, array, cells, starts, length):
+        """Window totals of a (367, cells) cumulative array, wrapping past Dec 31"""
+        starts = np.asarray(starts)
+        ends = starts + length
+        wrap = ends > DAYS_PER_YEAR
+        ends = np.where(wrap, ends - DAYS_PER_YEAR, ends)
+        total = array[ends, cells].astype(np.float64) - array[starts, cells]
+        return total + np.where(wrap, array[DAYS_PER_YEAR, cells], 0)
+
+    def window(self, name, cells, starts, length):
+        """(sum, sum of squares, count) of a variable over windows [start, start + length)"""
+        k = self._position[name]
+        return tuple(self._window(array[k], cells, starts, length)
+                     for array in (self.sums, self.sums_sq, self.counts))
+
+    def mean(self, name, cells, starts, length):
+        total, _, count = self.window(name, cells, starts, length)
+        return total / np.maximum(count, 1)
+
+    def variance(self, name, cells, starts, length):
+        total, total_sq, count = self.window(name, cells, starts, length)
+        count = np.maximum(count, 1)
+        return np.maximum(total_sq / count - (total / count) ** 2, 0)
+
+    def cell(self, lat, lon):
+        return int(self.grid.nearest(lat, lon))
+
+
+def _cumulative(daily, dtype=np.float64):
+    result = np.zeros((daily.shape[0], DAYS_PER_YEAR + 1) + daily.shape[2:], dtype=dtype)
+    np.cumsum(daily, axis=1, dtype=dtype, out=result[:, 1:])
+    return result
+
+
+def build_window_sums(climate, variables=SUM_VARIABLES):
+    """Accumulate per-day totals over years, then prefix-sum along the day axis"""
+    shape = (len(variables), DAYS_PER_YEAR) + climate.grid.shape
+    sums = np.zeros(shape)
+    sums_sq = np.zeros(shape)
+    counts = np.zeros(shape, dtype=np.uint32)
+    # One year at a time keeps peak memory at a single (366, lat, lon) slice
+    for y in range(len(climate.years)):
+        for k, name in enumerate(variables):
+            values = climate.variables[name][y].astype(np.float64)
+            valid = ~np.isnan(values)
+            values[~valid] = 0
+            sums[k] += values
+            sums_sq[k] += values * values
+            counts[k] += valid
+    return WindowSums(variables, climate.lat, climate.lon, climate.years,
+                      _cumulative(sums), _cumulative(sums_sq), _cumulative(counts, np.uint32))